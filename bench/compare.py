@@ -0,0 +1,79 @@
+#-*- coding: utf-8 -*-
+#
+# Gedcom 5.5 Parser
+#
+# Copyright (C) 2010 Nikola Škorić (nskoric [ at ] gmail.com)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# Please see the GPL license at http://www.gnu.org/licenses/gpl.txt
+#
+# To contact the author, see http://github.com/dijxtra/simplepyged
+
+""" Compare two result files of bench/run.py
+
+Usage: python bench/compare.py [-t THRESHOLD] old.json new.json
+
+Prints every measurement of both runs side by side. Exits with status
+1 if some measurement got worse by more than the threshold (a
+fraction, 0.1 by default).
+"""
+
+import sys
+import json
+from optparse import OptionParser
+
+MEASUREMENTS = ('parse_seconds', 'tree_rss_kb', 'peak_rss_kb',
+                'match_seconds', 'path_seconds')
+
+
+def compare(old, new, threshold):
+    """ Return list of (individuals, measurement, old value, new value, regression) """
+    before = dict((r['individuals'], r) for r in old['results'])
+    rows = []
+    for result in new['results']:
+        size = result['individuals']
+        if size not in before:
+            continue
+        for name in MEASUREMENTS:
+            (a, b) = (before[size].get(name), result.get(name))
+            if a is None or b is None:
+                continue
+            rows.append((size, name, a, b, a > 0 and (b - a) / float(a) > threshold))
+    return rows
+
+def main():
+    parser = OptionParser(usage = "%prog [options] old.json new.json")
+    parser.add_option('-t', '--threshold', type = 'float', default = 0.1,
+                      help = "allowed relative growth of a measurement [%default]")
+    (options, args) = parser.parse_args()
+    if len(args) != 2:
+        parser.error("two result files are needed")
+
+    (old, new) = [json.load(open(name)) for name in args]
+    print "old: %s (Python %s)" % (old.get('commit'), old.get('python'))
+    print "new: %s (Python %s)" % (new.get('commit'), new.get('python'))
+
+    regressions = 0
+    for (size, name, a, b, regression) in compare(old, new, options.threshold):
+        change = (b - a) / float(a) * 100 if a else 0.0
+        print "%9d %-14s %12.3f %12.3f %+7.1f%%%s" % (size, name, a, b, change,
+                                                      '  REGRESSION' if regression else '')
+        regressions += regression
+
+    sys.exit(1 if regressions else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#-*- coding: utf-8 -*-
+#
+# Gedcom 5.5 Parser
+#
+# Copyright (C) 2010 Nikola Škorić (nskoric [ at ] gmail.com)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# Please see the GPL license at http://www.gnu.org/licenses/gpl.txt
+#
+# To contact the author, see http://github.com/dijxtra/simplepyged
+
+""" Quality and speed of duplicate detection (dedup.py) on a synthetic tree
+
+Usage: python bench/dedup.py [options]
+
+A synthetic file with injected duplicates is generated (see
+synthetic.write(duplicates = ...)), and its _DUPL lines are taken as
+the truth. Reported are:
+
+* candidate pairs, and their share of all pairs
+* pair completeness - share of true duplicates which share a
+  blocking key (the best recall the scoring could get)
+* precision and recall of pairs found at each threshold
+* seconds taken and pairs scored per second, with one process and
+  with a pool of processes
+"""
+
+import io
+import os
+import sys
+import time
+from optparse import OptionParser
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'simplepyged'))
+
+import synthetic
+import dedup
+from gedcom import Gedcom
+
+THRESHOLDS = (0.75, 0.8, 0.85, 0.9, 0.95)
+
+
+def truth(g):
+    """ Return set of pairs of xrefs of duplicates, from _DUPL lines """
+    pairs = set()
+    for i in g.individual_list():
+        for e in i.children_tags('_DUPL'):
+            pairs.add(frozenset((i.xref(), e.value())))
+    return pairs
+
+def main():
+    parser = OptionParser(usage = "%prog [options]")
+    parser.add_option('-n', '--individuals', type = 'int', default = 20000,
+                      help = "number of individuals (without duplicates) [%default]")
+    parser.add_option('-d', '--duplicates', type = 'float', default = 0.05,
+                      help = "share of individuals with a duplicate [%default]")
+    parser.add_option('-p', '--processes', type = 'int', default = 4,
+                      help = "size of the process pool [%default]")
+    (options, args) = parser.parse_args()
+
+    data = io.BytesIO()
+    synthetic.write(data, individuals = options.individuals, duplicates = options.duplicates)
+    data.seek(0)
+    g = Gedcom(data)
+    individuals = g.individual_list()
+    expected = truth(g)
+    print "%d individuals, %d duplicates" % (len(individuals), len(expected))
+
+    features = [dedup._features(i) for i in individuals]
+    t = time.time()
+    pairs = dedup.candidates(features)
+    blocking = time.time() - t
+    found = set(frozenset((individuals[i].xref(), individuals[j].xref())) for (i, j) in pairs)
+    total = len(individuals) * (len(individuals) - 1) / 2
+    print "%d candidate pairs (%.4f%% of %d) in %.2f s, pair completeness %.3f" % (
+        len(pairs), 100.0 * len(pairs) / total, total, blocking,
+        len(expected & found) / float(len(expected) or 1))
+
+    for processes in (1, options.processes):
+        t = time.time()
+        result = dedup.find_duplicates(individuals, threshold = min(THRESHOLDS), processes = processes)
+        seconds = time.time() - t
+        print "%d process(es): %.2f s, %d pairs/s" % (processes, seconds, len(pairs) / seconds)
+
+    print "%9s %9s %9s %9s" % ('threshold', 'pairs', 'precision', 'recall')
+    for threshold in THRESHOLDS:
+        got = set(frozenset((a.xref(), b.xref())) for (s, a, b) in result if s >= threshold)
+        right = len(got & expected)
+        print "%9.2f %9d %9.3f %9.3f" % (threshold, len(got), right / float(len(got) or 1),
+                                         right / float(len(expected) or 1))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#-*- coding: utf-8 -*-
+#
+# Gedcom 5.5 Parser
+#
+# Copyright (C) 2010 Nikola Škorić (nskoric [ at ] gmail.com)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# Please see the GPL license at http://www.gnu.org/licenses/gpl.txt
+#
+# To contact the author, see http://github.com/dijxtra/simplepyged
+
+
+""" Memory shared with forked workers by a frozen tree (Gedcom.freeze())
+
+Usage: python bench/freeze.py [file]
+
+A GEDCOM file (test/wright.ged by default) is parsed, then a worker
+is forked which runs queries touching every individual. Reported is
+the growth of private dirty memory of the worker (memory copied from
+the parent), for a tree which is not frozen and for a frozen one.
+
+Needs fork() and /proc/self/smaps_rollup (Linux). Before Python 3.7
+(which has gc.freeze()) full garbage collections write to every object
+of the tree, so frozen and plain trees are copied about as much.
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'simplepyged'))
+
+from gedcom import Gedcom
+from matches import MatchList
+
+
+def memory():
+    """ Return memory of this process from /proc/self/smaps_rollup, in kB """
+    result = {}
+    for line in open('/proc/self/smaps_rollup'):
+        fields = line.split()
+        if fields[-1] == 'kB':
+            result[fields[0].rstrip(':')] = int(fields[1])
+    return result
+
+def query(g):
+    """ Run queries which touch every individual of g """
+    for i in g.individual_list():
+        i.parents()
+        i.children()
+        list(i.iter_ancestors())
+    MatchList(g.individual_list()).criteria_match("birthrange=1800-1900")
+
+def worker_growth(g):
+    """ Return growth of private dirty memory (kB) of a forked process while it runs query(g) """
+    (r, w) = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(r)
+            before = memory()
+            query(g)
+            after = memory()
+            os.write(w, '%d' % (after['Private_Dirty'] - before['Private_Dirty']))
+        finally:
+            os._exit(0)
+    os.close(w)
+    growth = int(os.read(r, 100))
+    os.close(r)
+    os.waitpid(pid, 0)
+    return growth
+
+def main():
+    if not hasattr(os, 'fork') or not os.path.exists('/proc/self/smaps_rollup'):
+        sys.exit("needs fork() and /proc/self/smaps_rollup (Linux)")
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(ROOT, 'test', 'wright.ged')
+
+    plain = worker_growth(Gedcom(path))
+    frozen = worker_growth(Gedcom(path).freeze())
+    print "%s: worker copied %d kB of a plain tree, %d kB of a frozen one" % (os.path.basename(path), plain, frozen)
+
+if __name__ == '__main__':
+    main()
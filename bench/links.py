@@ -0,0 +1,92 @@
+#-*- coding: utf-8 -*-
+#
+# Gedcom 5.5 Parser
+#
+# Copyright (C) 2010 Nikola Škorić (nskoric [ at ] gmail.com)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# Please see the GPL license at http://www.gnu.org/licenses/gpl.txt
+#
+# To contact the author, see http://github.com/dijxtra/simplepyged
+
+""" Cached links between records (Individual._links())
+
+Usage: python bench/links.py [options] [file]
+
+For a GEDCOM file (test/wright.ged by default), reported are:
+
+* seconds taken to parse the file
+* seconds of a loop calling children(), parents(), father(),
+  mother() and marriages() of every individual, with links cached,
+  and with the cache made stale before each call (so links are
+  resolved on every call, as they were before they were cached)
+"""
+
+import os
+import sys
+import time
+from optparse import OptionParser
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'simplepyged'))
+
+from gedcom import Gedcom
+
+ACCESSORS = ('children', 'parents', 'father', 'mother', 'marriages')
+
+
+def accessors(g, stale, passes):
+    """ Call all accessors of all individuals passes times; return number of calls """
+    records = g.record_dict()
+    calls = 0
+    for n in xrange(passes):
+        for i in g.individual_list():
+            for name in ACCESSORS:
+                if stale:
+                    records.epoch += 1
+                getattr(i, name)()
+                calls += 1
+    return calls
+
+def best(function, repeat):
+    """ Return the shortest time of repeat calls of function """
+    times = []
+    for n in xrange(repeat):
+        t = time.time()
+        function()
+        times.append(time.time() - t)
+    return min(times)
+
+def main():
+    parser = OptionParser(usage = "%prog [options] [file]")
+    parser.add_option('-r', '--repeat', type = 'int', default = 5,
+                      help = "number of runs, the best one is reported [%default]")
+    parser.add_option('-p', '--passes', type = 'int', default = 20,
+                      help = "passes over all individuals in one run of the accessor loop [%default]")
+    (options, args) = parser.parse_args()
+    path = args[0] if args else os.path.join(ROOT, 'test', 'wright.ged')
+
+    parse = best(lambda: Gedcom(path), options.repeat)
+    g = Gedcom(path)
+    calls = accessors(g, False, options.passes)
+    print "%s: parsed in %.3f s" % (os.path.basename(path), parse)
+
+    cached = best(lambda: accessors(g, False, options.passes), options.repeat)
+    stale = best(lambda: accessors(g, True, options.passes), options.repeat)
+    print "%d accessor calls: cached %.3f s, resolved on every call %.3f s" % (calls, cached, stale)
+
+if __name__ == '__main__':
+    main()
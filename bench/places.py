@@ -0,0 +1,97 @@
+#-*- coding: utf-8 -*-
+#
+# Gedcom 5.5 Parser
+#
+# Copyright (C) 2010 Nikola Škorić (nskoric [ at ] gmail.com)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# Please see the GPL license at http://www.gnu.org/licenses/gpl.txt
+#
+# To contact the author, see http://github.com/dijxtra/simplepyged
+
+""" Building and querying the place index (places.py)
+
+Usage: python bench/places.py [options] [file]
+
+For a GEDCOM file (test/wright.ged by default), reported are:
+
+* seconds taken to build Gedcom.place_index(), and number of places
+* seconds per query of events in each top level place, through the
+  index and by looking at the place of every event (what a program
+  had to do without the index)
+"""
+
+import os
+import sys
+import time
+from optparse import OptionParser
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'simplepyged'))
+
+from gedcom import Gedcom
+from places import PlaceIndex, header_form, _events
+
+
+def scan(records, place):
+    """ Return list of (record, event) of events in place, looking at every event """
+    wanted = _parts(place)
+    result = []
+    for record in records:
+        for event in _events(record):
+            if event.place:
+                parts = _parts(event.place)
+                if parts[len(parts) - len(wanted):] == wanted:
+                    result.append((record, event))
+    return result
+
+def _parts(place):
+    parts = [u' '.join(p.lower().split()) for p in place.split(u',')]
+    return [p for p in parts if p]
+
+def best(function, repeat):
+    """ Return the shortest time of repeat calls of function """
+    times = []
+    for n in xrange(repeat):
+        t = time.time()
+        function()
+        times.append(time.time() - t)
+    return min(times)
+
+def main():
+    parser = OptionParser(usage = "%prog [options] [file]")
+    parser.add_option('-r', '--repeat', type = 'int', default = 20,
+                      help = "number of runs, the best one is reported [%default]")
+    (options, args) = parser.parse_args()
+    path = args[0] if args else os.path.join(ROOT, 'test', 'wright.ged')
+
+    g = Gedcom(path)
+    records = g.individual_list() + g.family_list()
+    form = header_form(g.line_list()[0])
+    build = best(lambda: PlaceIndex(records, form), options.repeat)
+    index = g.place_index()
+    print "%s: %d places, index built in %.2f ms" % (os.path.basename(path), len(index), build * 1000)
+
+    places = [p.full_name() for p in index.top()] + [c.full_name() for p in index.top() for c in p.children()]
+    for (p, expected) in ((p, scan(records, p)) for p in places):
+        assert sorted(map(id, (e for (r, e) in index.events_in(p)))) == sorted(map(id, (e for (r, e) in expected)))
+    indexed = best(lambda: [index.events_in(p) for p in places], options.repeat)
+    scanned = best(lambda: [scan(records, p) for p in places], max(1, options.repeat / 10))
+    print "%d queries: index %.3f ms, scan %.1f ms per query" % (
+        len(places), indexed * 1000 / len(places), scanned * 1000 / len(places))
+
+if __name__ == '__main__':
+    main()
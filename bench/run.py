@@ -0,0 +1,175 @@
+#-*- coding: utf-8 -*-
+#
+# Gedcom 5.5 Parser
+#
+# Copyright (C) 2010 Nikola Škorić (nskoric [ at ] gmail.com)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# Please see the GPL license at http://www.gnu.org/licenses/gpl.txt
+#
+# To contact the author, see http://github.com/dijxtra/simplepyged
+
+""" Scaling benchmarks of simplepyged on synthetic files
+
+Usage: python bench/run.py [options]
+
+For every size, a synthetic file is generated (once, and kept in the
+data directory) and measured in a fresh process, so that peak memory
+of one size does not leak into the next:
+
+* parse_seconds - Gedcom() of the file
+* peak_rss_kb, tree_rss_kb - peak memory of the process, and memory
+  taken by the parsed tree
+* match_seconds - MatchList criteria queries over all individuals
+* path_seconds - path_to_relative() between relatives
+
+Results are written as JSON (see --output), to be compared with
+bench/compare.py.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import resource
+import platform
+import subprocess
+from optparse import OptionParser
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'simplepyged'))
+
+import synthetic
+from gedcom import Gedcom
+from matches import MatchList
+
+SIZES = (1000, 10000, 100000)
+
+CRITERIA = ("surname=Wright",
+            "name=Mary:birthrange=1550-1650",
+            "deathrange=1600-1700",
+            "surname=Smith:marriagerange=1560-1600")
+
+# Number of relationship paths looked up
+PATHS = 20
+
+
+def measure(path):
+    """ Run all benchmarks on one file, in this process """
+    result = {}
+    start = _rss()
+
+    t = time.time()
+    g = Gedcom(path)
+    result['parse_seconds'] = time.time() - t
+    result['tree_rss_kb'] = _rss() - start
+
+    individuals = g.individual_list()
+    t = time.time()
+    for criteria in CRITERIA:
+        MatchList(individuals).criteria_match(criteria)
+    result['match_seconds'] = time.time() - t
+
+    pairs = _relatives(individuals, random.Random(0))
+    t = time.time()
+    for (a, b) in pairs:
+        a.path_to_relative(b)
+    result['path_seconds'] = time.time() - t
+    result['paths'] = len(pairs)
+
+    result['peak_rss_kb'] = _rss()
+    return result
+
+def _relatives(individuals, rand):
+    """ Pick pairs of relatives: up a few generations, and down again """
+    pairs = []
+    for n in xrange(PATHS * 10):
+        if len(pairs) == PATHS:
+            break
+        person = rand.choice(individuals)
+        ancestors = [a for (a, g) in person.iter_ancestors(rand.randint(1, 4))]
+        if not ancestors:
+            continue
+        descendants = [d for (d, g) in rand.choice(ancestors).iter_descendants(4) if d is not person]
+        if descendants:
+            pairs.append((person, rand.choice(descendants)))
+    return pairs
+
+def _rss():
+    """ Peak resident memory of this process, in kB """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def _commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd = ROOT,
+                                       stderr = open(os.devnull, 'w')).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _data_file(directory, size):
+    """ Return path of the synthetic file with given size, generating it if needed """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    path = os.path.join(directory, 'synthetic-%d.ged' % size)
+    if not os.path.exists(path):
+        synthetic.write(path + '.tmp', individuals = size)
+        os.rename(path + '.tmp', path)
+    return path
+
+
+def main():
+    parser = OptionParser(usage = "%prog [options]")
+    parser.add_option('-s', '--sizes', default = ','.join(map(str, SIZES)),
+                      help = "comma separated numbers of individuals [%default]")
+    parser.add_option('-o', '--output', default = None,
+                      help = "file to write JSON results to [standard output]")
+    parser.add_option('-d', '--data', default = os.path.join(ROOT, 'bench', 'data'),
+                      help = "directory for generated files [%default]")
+    parser.add_option('--measure', default = None, help = "(internal) measure one file")
+    (options, args) = parser.parse_args()
+
+    if options.measure is not None:
+        json.dump(measure(options.measure), sys.stdout)
+        return
+
+    results = []
+    for size in [int(s) for s in options.sizes.split(',')]:
+        path = _data_file(options.data, size)
+        output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--measure', path])
+        result = json.loads(output)
+        result['individuals'] = size
+        result['file_bytes'] = os.path.getsize(path)
+        results.append(result)
+        sys.stderr.write("%(individuals)9d individuals: parse %(parse_seconds).2f s, "
+                         "tree %(tree_rss_kb)d kB, match %(match_seconds).3f s, "
+                         "path %(path_seconds).3f s\n" % result)
+
+    report = {'commit': _commit(),
+              'python': platform.python_version(),
+              'platform': platform.platform(),
+              'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'results': results}
+
+    if options.output is None:
+        json.dump(report, sys.stdout, indent = 2, sort_keys = True)
+        sys.stdout.write('\n')
+    else:
+        with open(options.output, 'w') as f:
+            json.dump(report, f, indent = 2, sort_keys = True)
+
+if __name__ == '__main__':
+    main()
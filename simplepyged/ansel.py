@@ -0,0 +1,255 @@
+#-*- coding: utf-8 -*-
+#
+# Gedcom 5.5 Parser
+#
+# Copyright (C) 2010 Nikola Škorić (nskoric [ at ] gmail.com)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# Please see the GPL license at http://www.gnu.org/licenses/gpl.txt
+#
+# To contact the author, see http://github.com/dijxtra/simplepyged
+
+""" ANSEL (ANSI Z39.47) codec, as used by GEDCOM 5.5
+
+Importing this module registers codec 'ansel', so that
+data.decode('ansel') and codecs.getincrementaldecoder('ansel') work.
+
+ANSEL puts combining diacritics before the letter they belong to,
+while Unicode puts them after it. Decoding moves them behind the
+letter and composes the result (NFC), encoding does the opposite.
+
+Decoding is table driven: bytes are widened with the latin-1 codec
+and mapped with unicode.translate(), and only runs of diacritics are
+handled with a regular expression. ASCII data is returned right away.
+"""
+
+# Global imports
+import codecs
+import re
+import unicodedata
+
+# Spacing characters (ANSEL code: Unicode character)
+CHARACTERS = {
+    0xA1: u'Ł', # capital L with stroke
+    0xA2: u'Ø', # capital O with stroke
+    0xA3: u'Đ', # capital D with stroke
+    0xA4: u'Þ', # capital thorn
+    0xA5: u'Æ', # capital AE
+    0xA6: u'Œ', # capital OE
+    0xA7: u'ʹ', # modifier prime
+    0xA8: u'·', # middle dot
+    0xA9: u'♭', # music flat sign
+    0xAA: u'®', # registered sign
+    0xAB: u'±', # plus-minus sign
+    0xAC: u'Ơ', # capital O with horn
+    0xAD: u'Ư', # capital U with horn
+    0xAE: u'ʼ', # modifier apostrophe
+    0xB0: u'ʻ', # modifier turned comma
+    0xB1: u'ł', # small l with stroke
+    0xB2: u'ø', # small o with stroke
+    0xB3: u'đ', # small d with stroke
+    0xB4: u'þ', # small thorn
+    0xB5: u'æ', # small ae
+    0xB6: u'œ', # small oe
+    0xB7: u'ʺ', # modifier double prime
+    0xB8: u'ı', # small dotless i
+    0xB9: u'£', # pound sign
+    0xBA: u'ð', # small eth
+    0xBC: u'ơ', # small o with horn
+    0xBD: u'ư', # small u with horn
+    0xBE: u'□', # empty box (GEDCOM)
+    0xBF: u'■', # black box (GEDCOM)
+    0xC0: u'°', # degree sign
+    0xC1: u'ℓ', # script small l
+    0xC2: u'℗', # sound recording copyright
+    0xC3: u'©', # copyright sign
+    0xC4: u'♯', # music sharp sign
+    0xC5: u'¿', # inverted question mark
+    0xC6: u'¡', # inverted exclamation mark
+    0xC7: u'ß', # sharp s
+    0xC8: u'€', # euro sign
+    0xCD: u'e', # midline e (GEDCOM)
+    0xCE: u'o', # midline o (GEDCOM)
+    0xCF: u'ß', # sharp s (GEDCOM)
+    }
+
+# Combining diacritics (ANSEL code: Unicode combining character)
+DIACRITICS = {
+    0xE0: u'\u0309', # hook above
+    0xE1: u'\u0300', # grave
+    0xE2: u'\u0301', # acute
+    0xE3: u'\u0302', # circumflex
+    0xE4: u'\u0303', # tilde
+    0xE5: u'\u0304', # macron
+    0xE6: u'\u0306', # breve
+    0xE7: u'\u0307', # dot above
+    0xE8: u'\u0308', # diaeresis
+    0xE9: u'\u030c', # caron
+    0xEA: u'\u030a', # ring above
+    0xEB: u'\ufe20', # ligature, left half
+    0xEC: u'\ufe21', # ligature, right half
+    0xED: u'\u0315', # comma above right
+    0xEE: u'\u030b', # double acute
+    0xEF: u'\u0310', # candrabindu
+    0xF0: u'\u0327', # cedilla
+    0xF1: u'\u0328', # ogonek
+    0xF2: u'\u0323', # dot below
+    0xF3: u'\u0324', # diaeresis below
+    0xF4: u'\u0325', # ring below
+    0xF5: u'\u0333', # double low line
+    0xF6: u'\u0332', # low line
+    0xF7: u'\u0326', # comma below
+    0xF8: u'\u031c', # left half ring below
+    0xF9: u'\u032e', # breve below
+    0xFA: u'\ufe22', # double tilde, left half
+    0xFB: u'\ufe23', # double tilde, right half
+    0xFE: u'\u0313', # comma above
+    }
+
+_DECODING_TABLE = dict(CHARACTERS)
+_DECODING_TABLE.update(DIACRITICS)
+
+_UNMAPPED_BYTES = [b for b in xrange(0x80, 0x100) if b not in _DECODING_TABLE]
+_REPLACING_TABLE = dict(_DECODING_TABLE)
+_REPLACING_TABLE.update((b, u'\ufffd') for b in _UNMAPPED_BYTES)
+_IGNORING_TABLE = dict(_DECODING_TABLE)
+_IGNORING_TABLE.update((b, None) for b in _UNMAPPED_BYTES)
+
+_ENCODING_TABLE = dict((c, chr(b)) for (b, c) in CHARACTERS.items() if c >= u'\x80')
+_ENCODING_TABLE.update((c, chr(b)) for (b, c) in DIACRITICS.items())
+
+_MARKS = u''.join(DIACRITICS.values())
+_HIGH = re.compile('[\x80-\xff]')
+_UNMAPPED = re.compile('[%s]' % ''.join(re.escape(chr(b)) for b in _UNMAPPED_BYTES))
+_BEFORE_BASE = re.compile(u'([%s]+)(.)' % _MARKS, re.S)
+_AFTER_BASE = re.compile(u'(.)([%s]+)' % _MARKS, re.S)
+_TRAILING_MARKS = re.compile('[\xe0-\xfe]+$')
+
+
+def decode(data, errors = 'strict'):
+    """ Decode ANSEL data into a unicode string """
+    return _decode(data, errors)
+
+def encode(text, errors = 'strict'):
+    """ Encode unicode string into ANSEL """
+    try:
+        return text.encode('ascii')
+    except UnicodeEncodeError:
+        pass
+
+    text = _AFTER_BASE.sub(lambda m: m.group(2) + m.group(1), unicodedata.normalize('NFD', text))
+    result = []
+    for (n, c) in enumerate(text):
+        if c < u'\x80':
+            result.append(str(c))
+        elif c in _ENCODING_TABLE:
+            result.append(_ENCODING_TABLE[c])
+        elif errors == 'strict':
+            raise UnicodeEncodeError('ansel', text, n, n + 1, 'character can not be encoded in ANSEL')
+        elif errors == 'replace':
+            result.append('?')
+        elif errors != 'ignore':
+            raise ValueError("unsupported error handling: %s" % errors)
+    return ''.join(result)
+
+def _decode(data, errors):
+    if not _HIGH.search(data):
+        return data.decode('ascii')
+
+    if errors == 'strict':
+        unmapped = _UNMAPPED.search(data)
+        if unmapped:
+            n = unmapped.start()
+            raise UnicodeDecodeError('ansel', data, n, n + 1, 'byte is not an ANSEL character')
+        table = _DECODING_TABLE
+    elif errors == 'replace':
+        table = _REPLACING_TABLE
+    elif errors == 'ignore':
+        table = _IGNORING_TABLE
+    else:
+        raise ValueError("unsupported error handling: %s" % errors)
+
+    text = data.decode('latin-1').translate(table)
+
+    if _BEFORE_BASE.search(text):
+        text = unicodedata.normalize('NFC', _BEFORE_BASE.sub(lambda m: m.group(2) + m.group(1), text))
+    return text
+
+
+class Codec(codecs.Codec):
+
+    def encode(self, text, errors = 'strict'):
+        return (encode(text, errors), len(text))
+
+    def decode(self, data, errors = 'strict'):
+        return (decode(data, errors), len(data))
+
+
+class IncrementalEncoder(codecs.IncrementalEncoder):
+
+    def encode(self, text, final = False):
+        return encode(text, self.errors)
+
+
+class IncrementalDecoder(codecs.IncrementalDecoder):
+    """ Decoder which keeps diacritics at the end of a chunk until their letter arrives """
+
+    def __init__(self, errors = 'strict'):
+        codecs.IncrementalDecoder.__init__(self, errors)
+        self._pending = ''
+
+    def decode(self, data, final = False):
+        data = self._pending + data
+        self._pending = ''
+        if not final:
+            marks = _TRAILING_MARKS.search(data)
+            if marks:
+                self._pending = data[marks.start():]
+                data = data[:marks.start()]
+        return _decode(data, self.errors)
+
+    def reset(self):
+        self._pending = ''
+
+    def getstate(self):
+        return (self._pending, 0)
+
+    def setstate(self, state):
+        self._pending = state[0]
+
+
+class StreamWriter(Codec, codecs.StreamWriter):
+    pass
+
+
+class StreamReader(Codec, codecs.StreamReader):
+    pass
+
+
+def _search(name):
+    if name.replace('-', '_').lower() != 'ansel':
+        return None
+    return codecs.CodecInfo(
+        name='ansel',
+        encode=Codec().encode,
+        decode=Codec().decode,
+        incrementalencoder=IncrementalEncoder,
+        incrementaldecoder=IncrementalDecoder,
+        streamwriter=StreamWriter,
+        streamreader=StreamReader,
+        )
+
+codecs.register(_search)
@@ -0,0 +1,388 @@
+#-*- coding: utf-8 -*-
+#
+# Gedcom 5.5 Parser
+#
+# Copyright (C) 2010 Nikola Škorić (nskoric [ at ] gmail.com)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# Please see the GPL license at http://www.gnu.org/licenses/gpl.txt
+#
+# To contact the author, see http://github.com/dijxtra/simplepyged
+
+""" Loading and querying GEDCOM files without blocking the caller
+
+Parsing a big file takes seconds, which is too long to block a server
+which answers other requests meanwhile. AsyncGedcom.open() parses the
+file in a pool of threads and returns a future right away:
+
+.. code-block:: python
+
+    opening = AsyncGedcom.open(path)
+    opening.add_done_callback(lambda f: serve(f.result()))
+    ...
+    gedcom = opening.result()
+    people = gedcom.match("surname=Wright:birthrange=1800-1850").result()
+
+Futures are Future objects of this module, which work like those of
+concurrent.futures. Given an asyncio (or trollius) event loop, work
+runs in the executor of the loop instead, and futures are those of
+the loop, so in a coroutine:
+
+.. code-block:: python
+
+    gedcom = await AsyncGedcom.open(path, loop = loop)
+    people = await gedcom.match("surname=Wright:birthrange=1800-1850")
+
+Opens of a file which is still being parsed share that parse.
+
+The parsed tree is frozen (see Gedcom.freeze()), so queries never
+write into it and any number of them can run at the same time. Quick
+lookups (get_individual() and the like) are done right away,
+searches run in the executor.
+"""
+
+# Global imports
+import os
+import sys
+import threading
+import Queue
+
+from gedcom import Gedcom
+from matches import MatchList
+
+try:
+    import asyncio
+except ImportError:
+    try:
+        import trollius as asyncio
+    except ImportError:
+        asyncio = None
+
+# Number of threads of the executor used when none is given
+WORKERS = 4
+
+
+class CancelledError(Exception):
+    """ Raised by Future.result() of a cancelled future """
+    pass
+
+
+class Future:
+    """ Result of a function which runs in another thread
+
+    Same methods as concurrent.futures.Future: result() and
+    exception() wait for the function to finish, callbacks added with
+    add_done_callback() are called with the future once it is done
+    (in the thread which finished it).
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._state = 'pending'
+        self._result = None
+        self._exception = None
+        self._callbacks = []
+
+    def cancel(self):
+        """ Cancel the future unless it is running or done; return True if it is cancelled """
+        with self._condition:
+            if self._state == 'cancelled':
+                return True
+            if self._state != 'pending':
+                return False
+            self._state = 'cancelled'
+            self._condition.notify_all()
+        self._call_back()
+        return True
+
+    def cancelled(self):
+        return self._state == 'cancelled'
+
+    def running(self):
+        return self._state == 'running'
+
+    def done(self):
+        return self._state in ('cancelled', 'finished')
+
+    def result(self, timeout = None):
+        """ Return result of the function, or raise its exception """
+        self._wait(timeout)
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def exception(self, timeout = None):
+        """ Return exception raised by the function, or None """
+        self._wait(timeout)
+        return self._exception
+
+    def add_done_callback(self, function):
+        with self._condition:
+            if not self.done():
+                self._callbacks.append(function)
+                return
+        function(self)
+
+    def set_running_or_notify_cancel(self):
+        """ Mark the future as running; return False if it was cancelled """
+        with self._condition:
+            if self._state == 'cancelled':
+                return False
+            self._state = 'running'
+            return True
+
+    def set_result(self, result):
+        self._finish(result, None)
+
+    def set_exception(self, exception):
+        self._finish(None, exception)
+
+    def _finish(self, result, exception):
+        with self._condition:
+            self._result = result
+            self._exception = exception
+            self._state = 'finished'
+            self._condition.notify_all()
+        self._call_back()
+
+    def _call_back(self):
+        with self._condition:
+            callbacks = self._callbacks
+            self._callbacks = []
+        for function in callbacks:
+            function(self)
+
+    def _wait(self, timeout):
+        with self._condition:
+            if timeout is None:
+                while not self.done():
+                    self._condition.wait()
+            elif not self.done():
+                self._condition.wait(timeout)
+            if self._state == 'cancelled':
+                raise CancelledError()
+            if not self.done():
+                raise RuntimeError("Future is not done after %s seconds" % timeout)
+
+
+class ThreadExecutor:
+    """ Pool of threads which run functions, like concurrent.futures.ThreadPoolExecutor
+
+    Threads are started on first use, and are daemon threads, so they
+    do not keep a program from exiting.
+    """
+
+    def __init__(self, workers = WORKERS):
+        self._workers = workers
+        self._queue = Queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, function, *args):
+        """ Return a Future of function(*args), which is called in one of the threads """
+        future = Future()
+        self._queue.put((future, function, args))
+        with self._lock:
+            if len(self._threads) < self._workers:
+                thread = threading.Thread(target = self._work)
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+        return future
+
+    def shutdown(self, wait = True):
+        """ Stop the threads once they have run everything submitted so far """
+        with self._lock:
+            threads = self._threads
+            self._threads = []
+        for thread in threads:
+            self._queue.put(None)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            (future, function, args) = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = function(*args)
+            except Exception:
+                future.set_exception(sys.exc_info()[1])
+            else:
+                future.set_result(result)
+
+
+class AsyncGedcom:
+    """ Read-only view of a Gedcom whose searches run in an executor
+
+    Use AsyncGedcom.open() to create one. Methods which may take long
+    return futures, the rest return their results.
+    """
+
+    # (loop, path, encoding): future of a Gedcom which is being parsed
+    _opening = {}
+    _opening_lock = threading.RLock()
+
+    def __init__(self,gedcom,loop=None,executor=None):
+        self._gedcom = gedcom
+        self._loop = loop
+        self._executor = executor
+
+    @classmethod
+    def open(cls,file,encoding=None,loop=None,executor=None):
+        """ Return a future of an AsyncGedcom for file
+
+        File and encoding are the same as for Gedcom. The file is
+        parsed in executor: anything with submit() (such as
+        ThreadExecutor), or, with an asyncio event loop, an executor
+        of the loop. If None, a shared ThreadExecutor (or the default
+        executor of the loop) is used. If the same path is opened
+        again while it is being parsed, both futures get the same
+        Gedcom.
+        """
+        if hasattr(file, 'read'):
+            parsing = _submit(loop, executor, _parse, file, encoding)
+        else:
+            key = (loop, os.path.abspath(file), encoding)
+            with cls._opening_lock:
+                parsing = cls._opening.get(key)
+                if parsing is None:
+                    parsing = _submit(loop, executor, _parse, file, encoding)
+                    cls._opening[key] = parsing
+                    parsing.add_done_callback(lambda f: cls._forget(key, f))
+
+        # every caller gets a future of its own, so that cancelling
+        # one of them does not cancel the parse for the others
+        return _chain(loop, parsing, lambda gedcom: cls(gedcom, loop, executor))
+
+    @classmethod
+    def _forget(cls, key, parsing):
+        with cls._opening_lock:
+            if cls._opening.get(key) is parsing:
+                del cls._opening[key]
+
+    def gedcom(self):
+        """ Return the underlying (frozen) Gedcom """
+        return self._gedcom
+
+    def get_record(self,key):
+        """ Return record with given xref or integer id """
+        return self._gedcom.get_record(key)
+
+    def get_individual(self,xref):
+        """ Return an object of class Individual identified by xref """
+        return self._gedcom.get_individual(xref)
+
+    def get_family(self,xref):
+        """ Return an object of class Family identified by xref """
+        return self._gedcom.get_family(xref)
+
+    def individual_list(self):
+        """ Return a list of all individuals """
+        return self._gedcom.individual_list()
+
+    def family_list(self):
+        """ Return a list of all families """
+        return self._gedcom.family_list()
+
+    def run(self,function,*args):
+        """ Return a future of function(gedcom, *args), which is called in the executor """
+        return _submit(self._loop, self._executor, function, self._gedcom, *args)
+
+    def match(self,criteria):
+        """ Return a future of a list of individuals matching criteria (see MatchIndividual.criteria_match()) """
+        return self.match_list().criteria_match(criteria)
+
+    def match_list(self,record_list=None):
+        """ Return an AsyncMatchList of record_list (all individuals if None) """
+        if record_list is None:
+            record_list = self._gedcom.individual_list()
+        return AsyncMatchList(record_list, self._loop, self._executor)
+
+
+class AsyncMatchList:
+    """ MatchList whose methods return futures
+
+    Every method of MatchList is available, and runs in the executor.
+    """
+
+    def __init__(self,record_list,loop=None,executor=None):
+        self._match_list = MatchList(record_list)
+        self._loop = loop
+        self._executor = executor
+
+    def __getattr__(self,name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        method = getattr(self._match_list, name)
+
+        def product(*args):
+            return _submit(self._loop, self._executor, method, *args)
+        return product
+
+
+# Executor used when neither an executor nor a loop is given
+_executor = None
+_executor_lock = threading.Lock()
+
+def _default_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadExecutor()
+        return _executor
+
+def _parse(file, encoding):
+    """ Parse and freeze a file, so that queries from many threads never write into it """
+    return Gedcom(file, encoding).freeze()
+
+def _submit(loop, executor, function, *args):
+    """ Return a future of function(*args), run in executor or in an executor of loop """
+    if loop is not None:
+        return loop.run_in_executor(executor, function, *args)
+    if executor is None:
+        executor = _default_executor()
+    return executor.submit(function, *args)
+
+def _chain(loop, source, transform):
+    """ Return a new future which gets transform(result) of source """
+    if loop is None:
+        target = Future()
+    elif hasattr(loop, 'create_future'):
+        target = loop.create_future()
+    else:
+        target = asyncio.Future(loop=loop)
+
+    def done(source):
+        if target.cancelled():
+            return
+        if source.cancelled():
+            target.cancel()
+        elif source.exception() is not None:
+            target.set_exception(source.exception())
+        else:
+            try:
+                target.set_result(transform(source.result()))
+            except Exception as e:
+                target.set_exception(e)
+
+    source.add_done_callback(done)
+    return target
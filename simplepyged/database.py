@@ -0,0 +1,432 @@
+#-*- coding: utf-8 -*-
+#
+# Gedcom 5.5 Parser
+#
+# Copyright (C) 2010 Nikola Škorić (nskoric [ at ] gmail.com)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# Please see the GPL license at http://www.gnu.org/licenses/gpl.txt
+#
+# To contact the author, see http://github.com/dijxtra/simplepyged
+
+""" GEDCOM files stored in an SQLite database
+
+Trees which are too big to be kept in memory as Line objects can be
+loaded into a database file once and read from it afterwards. Records
+are built from the database when they are asked for, and links to
+other records are followed only when they are used.
+
+Tables of the database:
+
+* lines: id (line number), parent, record, level, xref, tag, value
+* records: id (see Record.id()), line, xref, tag
+* individuals: record, xref, given, surname, sex, birth_year, death_year
+* families: record, xref, husband, wife
+* events: id, record, line, tag, date, year, place
+* links: line, record, tag, target (pointer lines only)
+
+Years which are not known are stored as -1 in individuals (as
+Individual.birth_year() returns them) and as NULL in events.
+"""
+
+# Global imports
+import sqlite3
+from records import *
+from gedcom import split_line, trim_values, GedcomParseError
+from streams import open_input, decode_lines
+
+# Number of rows inserted at once while loading
+BATCH_SIZE = 10000
+
+_TABLES = """
+DROP TABLE IF EXISTS lines;
+DROP TABLE IF EXISTS records;
+DROP TABLE IF EXISTS individuals;
+DROP TABLE IF EXISTS families;
+DROP TABLE IF EXISTS events;
+DROP TABLE IF EXISTS links;
+CREATE TABLE lines (id INTEGER PRIMARY KEY, parent INTEGER, record INTEGER,
+                    level INTEGER, xref TEXT, tag TEXT, value TEXT);
+CREATE TABLE records (id INTEGER PRIMARY KEY, line INTEGER, xref TEXT, tag TEXT);
+CREATE TABLE individuals (record INTEGER PRIMARY KEY, xref TEXT, given TEXT,
+                          surname TEXT, sex TEXT, birth_year INTEGER, death_year INTEGER);
+CREATE TABLE families (record INTEGER PRIMARY KEY, xref TEXT, husband TEXT, wife TEXT);
+CREATE TABLE events (id INTEGER PRIMARY KEY, record INTEGER, line INTEGER,
+                     tag TEXT, date TEXT, year INTEGER, place TEXT);
+CREATE TABLE links (line INTEGER PRIMARY KEY, record INTEGER, tag TEXT, target TEXT);
+"""
+
+# Indexes are created after the data is loaded, which is a lot faster
+# than keeping them up to date during the load
+_INDEXES = """
+CREATE INDEX lines_record ON lines (record);
+CREATE INDEX lines_tag ON lines (tag);
+CREATE INDEX records_xref ON records (xref);
+CREATE INDEX records_tag ON records (tag);
+CREATE INDEX individuals_surname ON individuals (surname);
+CREATE INDEX individuals_birth_year ON individuals (birth_year);
+CREATE INDEX individuals_death_year ON individuals (death_year);
+CREATE INDEX events_record ON events (record, tag);
+CREATE INDEX events_year ON events (year);
+CREATE INDEX links_record ON links (record, tag);
+CREATE INDEX links_target ON links (target);
+"""
+
+_INSERTS = {
+    'lines': "INSERT INTO lines VALUES (?, ?, ?, ?, ?, ?, ?)",
+    'records': "INSERT INTO records VALUES (?, ?, ?, ?)",
+    'individuals': "INSERT INTO individuals VALUES (?, ?, ?, ?, ?, ?, ?)",
+    'families': "INSERT INTO families VALUES (?, ?, ?, ?)",
+    'events': "INSERT INTO events (record, line, tag, date, year, place) VALUES (?, ?, ?, ?, ?, ?)",
+    'links': "INSERT INTO links VALUES (?, ?, ?, ?)",
+    }
+
+# Condition on marriage events of families in which an individual is a spouse
+_MARRIAGE = """record IN (SELECT l.record FROM links l
+                          JOIN records r ON r.xref = l.target
+                          JOIN events e ON e.record = r.id
+                          WHERE l.tag = 'FAMS' AND e.tag = 'MARR' AND %s)"""
+
+
+class GedcomDB:
+    """ GEDCOM file stored in an SQLite database
+
+    database is a path of the database file (or ':memory:'). If file
+    is given, it is loaded into the database, replacing whatever was
+    there before; otherwise the database must have been loaded
+    earlier. File and encoding are the same as for Gedcom.
+
+    Records are built from the database on demand and cached, so
+    that every record is read only once. Individuals and families
+    returned have the same API as those of Gedcom.
+    """
+
+    def __init__(self,database,file=None,encoding=None):
+        self._db = sqlite3.connect(database)
+        self._record_dict = _DatabaseRecordDict(self)
+        self._records = {}
+        if file is not None:
+            self._load(file, encoding)
+
+    def close(self):
+        """ Close the database """
+        self._db.close()
+
+    def connection(self):
+        """ Return sqlite3 connection to the database, for queries of your own """
+        return self._db
+
+    def record_dict(self):
+        """ Return a dictionary of records keyed by xref
+
+        The dictionary reads records from the database when they are
+        asked for, so it only holds records which were used so far.
+        """
+        return self._record_dict
+
+    def get_record(self,key):
+        """ Return record with given xref or integer id (see Record.id()) """
+        if isinstance(key, (int, long)):
+            return self._record(key)
+        return self._record_dict[key]
+
+    def get_individual(self,xref):
+        """ Return an object of class Individual identified by xref """
+        record = self._record_dict.get(xref)
+        if record is not None and record.type() == 'Individual':
+            return record
+        return None
+
+    def get_family(self,xref):
+        """ Return an object of class Family identified by xref """
+        record = self._record_dict.get(xref)
+        if record is not None and record.type() == 'Family':
+            return record
+        return None
+
+    def individual_list(self):
+        """ Return a list of all individuals in the database """
+        return self._select("SELECT record FROM individuals ORDER BY record")
+
+    def family_list(self):
+        """ Return a list of all families in the database """
+        return self._select("SELECT record FROM families ORDER BY record")
+
+    def match(self,criteria):
+        """ Return a list of individuals matching criteria
+
+        Criteria are the same as for MatchIndividual.criteria_match(),
+        but they are evaluated by the database, so only individuals
+        which match are read from it. Marriage dates which do not end
+        with a year are skipped. Malformed criteria match nobody.
+        """
+        conditions = []
+        parameters = []
+        try:
+            for crit in criteria.split(':'):
+                key,value = crit.split('=')
+                if key == "surname":
+                    conditions.append("instr(surname, ?) > 0")
+                    parameters.append(value)
+                elif key == "name":
+                    conditions.append("instr(given, ?) > 0")
+                    parameters.append(value)
+                elif key in ("birth", "death"):
+                    conditions.append("%s_year = ?" % key)
+                    parameters.append(int(value))
+                elif key in ("birthrange", "deathrange"):
+                    conditions.append("%s_year BETWEEN ? AND ?" % key[:-5])
+                    parameters.extend(_range(value))
+                elif key == "marriage":
+                    conditions.append(_MARRIAGE % "e.year = ?")
+                    parameters.append(int(value))
+                elif key == "marriagerange":
+                    conditions.append(_MARRIAGE % "e.year BETWEEN ? AND ?")
+                    parameters.extend(_range(value))
+        except ValueError:
+            return []
+
+        query = "SELECT record FROM individuals"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        return self._select(query + " ORDER BY record", parameters)
+
+    def _select(self,query,parameters=()):
+        """ Return list of records whose ids are returned by query """
+        return [self._record(id) for (id,) in self._db.execute(query, parameters)]
+
+    def _record(self,id,xref=None):
+        """ Return record with given id, building it from the database unless it is cached """
+        try:
+            return self._records[id]
+        except KeyError:
+            pass
+
+        rows = self._db.execute("SELECT level, xref, tag, value FROM lines WHERE record = ? ORDER BY id", (id,))
+        record = None
+        stack = []
+        for (level, lxref, tag, value) in rows:
+            if level == 0:
+                line = _CLASSES.get(tag, Record)(level,lxref,tag,value,self._record_dict)
+                record = line
+            else:
+                line = Line(level,lxref,tag,value,self._record_dict)
+                del stack[level:]
+                stack[-1]._children_lines.append(line)
+                line.add_parent_line(stack[-1])
+            stack.append(line)
+
+        if record is None:
+            raise KeyError(id)
+
+        record._id = id
+        self._records[id] = record
+        if record.xref() != '':
+            dict.__setitem__(self._record_dict, record.xref(), record)
+        return record
+
+    def _find(self,xref):
+        """ Return record with given xref, or None """
+        row = self._db.execute("SELECT id FROM records WHERE xref = ?", (xref,)).fetchone()
+        if row is None:
+            return None
+        return self._record(row[0])
+
+    def _load(self,file,encoding):
+        """ Load a GEDCOM file into the database in a single pass """
+        db = self._db
+        db.execute("PRAGMA synchronous = OFF")
+        db.execute("PRAGMA journal_mode = MEMORY")
+        db.executescript(_TABLES)
+
+        rows = dict((table, []) for table in _INSERTS)
+        stack = []
+        lines = []
+        record = -1
+
+        stream = open_input(file)
+        try:
+            tokens = ((number, split_line(number, text))
+                      for (number, text) in enumerate(decode_lines(stream, encoding), 1))
+            for (number, (l, p, t, v)) in trim_values(tokens):
+                if l > len(stack):
+                    raise GedcomParseError("Gedcom format error on line %d: Structure of GEDCOM file is corrupted" % number)
+                del stack[l:]
+
+                if l == 0:
+                    self._derive(record, lines, rows)
+                    record += 1
+                    lines = []
+                    rows['records'].append((record, number, p or None, t))
+                    parent = None
+                else:
+                    parent = stack[-1]
+                stack.append(number)
+                lines.append((number, l, p, t, v))
+                rows['lines'].append((number, parent, record, l, p, t, v))
+                if v.startswith('@') and v.endswith('@') and len(v) > 2 and ' ' not in v:
+                    rows['links'].append((number, record, t, v))
+
+                if len(rows['lines']) >= BATCH_SIZE:
+                    self._flush(rows)
+            self._derive(record, lines, rows)
+        finally:
+            stream.close()
+
+        self._flush(rows)
+        db.executescript(_INDEXES)
+        db.commit()
+        self._records.clear()
+        dict.clear(self._record_dict)
+
+    def _flush(self,rows):
+        """ Insert collected rows into the database """
+        for (table, values) in rows.items():
+            if values:
+                self._db.executemany(_INSERTS[table], values)
+                del values[:]
+
+    def _derive(self,record,lines,rows):
+        """ Collect rows of individuals, families and events from lines of a record
+
+        The record is built on its own (links to other records are
+        not resolved), so that the values come from the same methods
+        which Gedcom uses.
+        """
+        if not lines or lines[0][3] not in ("INDI", "FAM"):
+            return
+
+        numbers = {}
+        stack = []
+        for (number, l, p, t, v) in lines:
+            if l == 0:
+                line = RECORD_CLASSES[t](l,p,t,v,RecordDict())
+            else:
+                line = Line(l,p,t,v,None)
+                del stack[l:]
+                stack[-1]._children_lines.append(line)
+                line.add_parent_line(stack[-1])
+            numbers[id(line)] = number
+            stack.append(line)
+
+        line = stack[0]
+        line._init()
+        xref = line.xref() or None
+        if line.tag() == "INDI":
+            (given, surname) = line.name()
+            rows['individuals'].append((record, xref, given, surname, line.sex(),
+                                        line.birth_year(), line.death_year()))
+            events = line.birth_events + line.death_events + line.other_events
+        else:
+            husband = line.children_tags("HUSB")
+            wife = line.children_tags("WIFE")
+            rows['families'].append((record, xref,
+                                     husband[0].value() if husband else None,
+                                     wife[0].value() if wife else None))
+            events = line.marriage_events + line.other_events
+
+        for event in events:
+            rows['events'].append((record, numbers[id(event.line)], event.tag,
+                                   event.date, _year(event.date), event.place))
+
+
+class _DatabaseRecordDict(RecordDict):
+    """ Dictionary of records which reads missing records from a GedcomDB """
+
+    def __init__(self,database):
+        RecordDict.__init__(self)
+        self._database = database
+
+    def __missing__(self,xref):
+        record = self._database._find(xref)
+        if record is None:
+            raise KeyError(xref)
+        return record
+
+    def get(self,xref,default=None):
+        try:
+            return self[xref]
+        except KeyError:
+            return default
+
+    def __contains__(self,xref):
+        return self.get(xref) is not None
+
+    def referrers(self,record):
+        """ Implementing RecordDict.referrers(), pointers are looked up in the links table """
+        xref = record.xref()
+        result = []
+        if not xref:
+            return result
+        rows = self._database._db.execute(
+            "SELECT DISTINCT record FROM links WHERE target = ? ORDER BY record", (xref,))
+        for (id,) in rows.fetchall():
+            referrer = self._database._record(id)
+            stack = [referrer]
+            while stack:
+                e = stack.pop()
+                if e.value() == xref:
+                    result.append((referrer, e))
+                stack.extend(reversed(e.children_lines()))
+        return result
+
+
+class _Lazy:
+    """ Mixin for records read from a database
+
+    Links to other records are initialised (by _init()) the first time
+    they are used, instead of right after the record is read, so that
+    reading one record does not read the whole tree.
+    """
+
+    def __getattr__(self,name):
+        if name in self._LAZY and not self.__dict__.get('_initialised'):
+            self.__dict__['_initialised'] = True
+            self._init()
+            self._linked = True
+            return getattr(self, name)
+        raise AttributeError(name)
+
+    def type(self):
+        """ Implementing Line.type(), return name of the class this one stands in for """
+        return self.__class__.__bases__[-1].__name__
+
+
+class _Individual(_Lazy, Individual):
+    _LAZY = frozenset(['_parent_families', '_families', '_links_epoch',
+                       'birth_events', 'death_events', 'other_events'])
+
+
+class _Family(_Lazy, Family):
+    _LAZY = frozenset(['_husband', '_wife', '_children',
+                       'marriage_events', 'other_events'])
+
+
+_CLASSES = dict(RECORD_CLASSES)
+_CLASSES.update({'INDI': _Individual, 'FAM': _Family})
+
+
+def _year(date):
+    """ Return year at the end of a date, or None """
+    try:
+        return int(date.split()[-1])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+def _range(value):
+    """ Return (year1, year2) from 'year1-year2' """
+    year1,year2 = value.split('-')
+    return (int(year1), int(year2))
@@ -0,0 +1,285 @@
+#-*- coding: utf-8 -*-
+#
+# Gedcom 5.5 Parser
+#
+# Copyright (C) 2010 Nikola Škorić (nskoric [ at ] gmail.com)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# Please see the GPL license at http://www.gnu.org/licenses/gpl.txt
+#
+# To contact the author, see http://github.com/dijxtra/simplepyged
+
+""" Detection of duplicate individuals
+
+Comparing every individual with every other one takes time which
+grows with the square of their number. Instead, each individual gets
+a few blocking keys, and only individuals which share a key are
+compared:
+
+* surname (by Soundex) and birth year, in buckets of five years (two
+  bucketings, shifted against each other, so that years no more than
+  two apart always share a bucket)
+* surname and given names of both parents
+* surname, given name and birth place
+* surname and given name, for individuals without a birth year
+
+Keys shared by more than max_block individuals are left out, as they
+say too little about a pair to be worth comparing it.
+
+Each candidate pair gets a score between 0 and 1: a weighted average
+of similarities of given names, surnames, birth and death years,
+birth places and names of parents (see WEIGHTS). Fields which are
+not known for both individuals are left out, as records merged from
+another file are often shorter. Individuals of different sex get 0.
+
+.. code-block:: python
+
+    for (score, a, b) in find_duplicates(g.individual_list(), processes = 4):
+        print score, a.xref(), b.xref()
+"""
+
+# Global imports
+import unicodedata
+from multiprocessing import Pool
+
+# Weights of fields in the score of a pair
+WEIGHTS = {'given': 0.25,
+           'surname': 0.25,
+           'year': 0.2,
+           'place': 0.1,
+           'father': 0.1,
+           'mother': 0.1,
+           'death': 0.2}
+
+# Blocking keys shared by more individuals than this are not used
+MAX_BLOCK = 500
+
+# Pairs scored by one task of the process pool
+CHUNK = 20000
+
+SOUNDEX_CODES = {'b': '1', 'f': '1', 'p': '1', 'v': '1',
+                 'c': '2', 'g': '2', 'j': '2', 'k': '2', 'q': '2', 's': '2', 'x': '2', 'z': '2',
+                 'd': '3', 't': '3',
+                 'l': '4',
+                 'm': '5', 'n': '5',
+                 'r': '6'}
+
+
+def find_duplicates(individuals, threshold = 0.85, processes = 1,
+                    weights = WEIGHTS, max_block = MAX_BLOCK):
+    """ Return list of (score, a, b) of likely duplicates among individuals
+
+    Pairs with score of at least threshold are returned, best first.
+    With processes other than 1, pairs are scored by a pool of that
+    many processes (None for one process per CPU).
+    """
+    individuals = list(individuals)
+    features = [_features(i) for i in individuals]
+    pairs = candidates(features, max_block)
+
+    if processes == 1:
+        scored = _score_pairs(features, weights, threshold, pairs)
+    else:
+        pool = Pool(processes, _start_worker, (features, weights, threshold))
+        try:
+            scored = []
+            for result in pool.imap_unordered(_score_chunk, _chunks(pairs, CHUNK)):
+                scored.extend(result)
+        finally:
+            pool.close()
+            pool.join()
+
+    scored.sort(key = lambda item: (-item[0], item[1], item[2]))
+    return [(score, individuals[i], individuals[j]) for (score, i, j) in scored]
+
+def candidates(features, max_block = MAX_BLOCK):
+    """ Return sorted list of pairs (i, j) of indexes of features which share a blocking key """
+    blocks = {}
+    for (n, f) in enumerate(features):
+        for key in blocking_keys(f):
+            blocks.setdefault(key, []).append(n)
+
+    pairs = set()
+    for block in blocks.itervalues():
+        if len(block) < 2 or len(block) > max_block:
+            continue
+        for (n, i) in enumerate(block):
+            for j in block[n + 1:]:
+                pairs.add((i, j))
+    return sorted(pairs)
+
+def blocking_keys(features):
+    """ Return list of blocking keys of an individual, given its features (see _features()) """
+    (given, surname, sex, year, place, father, mother, death) = features
+    surname = soundex(surname)
+    given = soundex(given)
+    keys = []
+    if year is not None:
+        keys.append(('year', surname, year // 5))
+        keys.append(('year+2', surname, (year + 2) // 5))
+    elif given:
+        keys.append(('name', surname, given))
+    if father or mother:
+        keys.append(('parents', surname, soundex(father), soundex(mother)))
+    if place and given:
+        keys.append(('place', surname, given, place.split(u',')[0]))
+    return keys
+
+def score(a, b, weights = WEIGHTS):
+    """ Return similarity (between 0 and 1) of two individuals, given their features """
+    return _score(a, b, weights, jaro_winkler)
+
+def _score(a, b, weights, names):
+    """ Implementation of score(), with names the similarity of names """
+    if a[2] and b[2] and a[2] != b[2]:
+        return 0.0
+    similarities = (('given', a[0], b[0], names),
+                    ('surname', a[1], b[1], names),
+                    ('year', a[3], b[3], _year_similarity),
+                    ('place', a[4], b[4], _place_similarity),
+                    ('father', a[5], b[5], names),
+                    ('mother', a[6], b[6], names),
+                    ('death', a[7], b[7], _year_similarity))
+    total = 0.0
+    weight = 0.0
+    for (field, x, y, similarity) in similarities:
+        if x is None or y is None:
+            continue
+        weight += weights[field]
+        total += weights[field] * similarity(x, y)
+    if weight == 0.0:
+        return 0.0
+    return total / weight
+
+def soundex(name):
+    """ Return Soundex code of (the first word of) a name, or '' for no name """
+    words = (_normalize(name) or u'').split()
+    letters = [c for c in words[0] if c.isalpha()] if words else []
+    if not letters:
+        return ''
+    code = letters[0].upper()
+    last = SOUNDEX_CODES.get(letters[0], '')
+    for c in letters[1:]:
+        digit = SOUNDEX_CODES.get(c, '')
+        if digit and digit != last:
+            code += digit
+            if len(code) == 4:
+                break
+        if c not in 'hw':
+            last = digit
+    return (code + '000')[:4]
+
+def jaro_winkler(a, b):
+    """ Return Jaro-Winkler similarity of two strings (1 for equal strings) """
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    window = max(0, max(len(a), len(b)) // 2 - 1)
+    used = [False] * len(b)
+    matches = []
+    for (i, c) in enumerate(a):
+        for j in xrange(max(0, i - window), min(len(b), i + window + 1)):
+            if not used[j] and b[j] == c:
+                used[j] = True
+                matches.append(c)
+                break
+    m = len(matches)
+    if m == 0:
+        return 0.0
+    other = [c for (j, c) in enumerate(b) if used[j]]
+    transpositions = sum(1 for (x, y) in zip(matches, other) if x != y) / 2.0
+    jaro = (m / float(len(a)) + m / float(len(b)) + (m - transpositions) / m) / 3.0
+
+    prefix = 0
+    for (x, y) in zip(a[:4], b[:4]):
+        if x != y:
+            break
+        prefix += 1
+    return jaro + prefix * 0.1 * (1.0 - jaro)
+
+
+def _features(individual):
+    """ Return fields of an individual which are compared, as a tuple of plain values
+
+    (given name, surname, sex, birth year, birth place, father's
+    given name, mother's given name, death year), with names and
+    places in lower case and without accents; unknown fields are
+    None. Features are sent to the processes of the pool instead of
+    records. """
+    (given, surname) = individual.name()
+    year = individual.birth_year()
+    death = individual.death_year()
+    birth = individual.birth()
+    father = mother = None
+    parents = individual.parents()
+    if len(parents) >= 2:
+        father = parents[0] and parents[0].given_name()
+        mother = parents[1] and parents[1].given_name()
+    return (_normalize(given), _normalize(surname), individual.sex(),
+            year if year != -1 else None, _normalize(birth and birth.place),
+            _normalize(father), _normalize(mother), death if death != -1 else None)
+
+def _normalize(text):
+    """ Return text in lower case, without accents and extra spaces (None for no text) """
+    if not text:
+        return None
+    if isinstance(text, str):
+        text = text.decode('utf-8', 'replace')
+    text = unicodedata.normalize('NFKD', text)
+    text = u''.join(c for c in text if not unicodedata.combining(c))
+    return u' '.join(text.lower().split()) or None
+
+def _year_similarity(x, y):
+    return max(0.0, 1.0 - abs(x - y) / 5.0)
+
+def _place_similarity(x, y):
+    x = set(x.replace(u',', u' ').split())
+    y = set(y.replace(u',', u' ').split())
+    return len(x & y) / float(len(x | y))
+
+def _score_pairs(features, weights, threshold, pairs):
+    """ Return list of (score, i, j) of pairs which score at least threshold """
+    # the same names are compared over and over again
+    cache = {}
+    def names(x, y):
+        try:
+            return cache[x, y]
+        except KeyError:
+            similarity = cache[x, y] = jaro_winkler(x, y)
+            return similarity
+
+    result = []
+    for (i, j) in pairs:
+        s = _score(features[i], features[j], weights, names)
+        if s >= threshold:
+            result.append((s, i, j))
+    return result
+
+def _chunks(items, size):
+    for n in xrange(0, len(items), size):
+        yield items[n:n + size]
+
+# Features and options of find_duplicates() in a process of the pool
+_worker = None
+
+def _start_worker(features, weights, threshold):
+    global _worker
+    _worker = (features, weights, threshold)
+
+def _score_chunk(pairs):
+    (features, weights, threshold) = _worker
+    return _score_pairs(features, weights, threshold, pairs)
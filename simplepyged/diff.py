@@ -0,0 +1,155 @@
+#-*- coding: utf-8 -*-
+#
+# Gedcom 5.5 Parser
+#
+# Copyright (C) 2010 Nikola Škorić (nskoric [ at ] gmail.com)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# Please see the GPL license at http://www.gnu.org/licenses/gpl.txt
+#
+# To contact the author, see http://github.com/dijxtra/simplepyged
+
+""" Differences between two versions of a GEDCOM file
+
+Records of both files are matched by xref (records without xref, such
+as HEAD, by tag) and compared by content hash (see
+Line.content_hash()). Only records whose hashes differ are looked
+into, and within them only sub-lines whose hashes differ, so that the
+time taken grows with the size of the files and not with the number
+of lines which would have to be compared with each other.
+
+.. code-block:: python
+
+    for difference in diff(Gedcom('old.ged'), Gedcom('new.ged')):
+        print difference
+        for line in difference.lines:
+            print '   ', line
+"""
+
+# Global imports
+from gedcom import keyed_records
+
+
+class Difference:
+    """ A record or line which is not the same in both files
+
+    * kind - 'added', 'removed' or 'changed'
+    * path - xref of the record (or its tag, if it has no xref)
+      followed by tags of lines down to this line, for example
+      ('@I1@', 'BIRT', 'DATE')
+    * old - the record or line in the first file (None if added)
+    * new - the record or line in the second file (None if removed)
+    * lines - for changed records, list of Difference of their lines
+
+    A changed line whose value is the same has sub-lines in a
+    different order (see records.ORDERED_TAGS).
+    """
+
+    def __init__(self, kind, path, old, new):
+        self.kind = kind
+        self.path = path
+        self.old = old
+        self.new = new
+        self.lines = []
+
+    def __str__(self):
+        """ Format the difference as '+', '-' or '~', path and value(s) """
+        result = {'added': u'+ ', 'removed': u'- ', 'changed': u'~ '}[self.kind] + u' '.join(self.path)
+        if self.kind == 'changed':
+            (old, new) = (self.old.full_value(), self.new.full_value())
+            if old != new:
+                result += u' %s -> %s' % (old, new)
+            elif self.old.tag() != self.new.tag():
+                result += u' %s -> %s' % (self.old.tag(), self.new.tag())
+        else:
+            value = (self.old or self.new).full_value()
+            if value != u'':
+                result += u' ' + value
+        return result
+
+
+def diff(a, b):
+    """ Return list of Difference of records of Gedcom a and Gedcom b
+
+    Added and changed records come in the order of b, followed by
+    removed records in the order of a. """
+    keyed = keyed_records(a.records())
+    old = dict(keyed)
+    result = []
+    for (key, record) in keyed_records(b.records()):
+        path = (key[0],)
+        other = old.pop(key, None)
+        if other is None:
+            result.append(Difference('added', path, None, record))
+        elif other._digest() != record._digest():
+            difference = Difference('changed', path, other, record)
+            # digests of all lines of both records, each hashed once
+            digests = {}
+            other._digest(digests)
+            record._digest(digests)
+            _compare(other, record, path, difference.lines, digests)
+            result.append(difference)
+
+    for (key, record) in keyed:
+        if key in old:
+            result.append(Difference('removed', (key[0],), record, None))
+    return result
+
+def _compare(old, new, path, result, digests):
+    """ Add differences between lines old and new (whose digests differ) to result
+
+    Digests of all sub-lines are looked up in digests (see Line._digest()). """
+    count = len(result)
+    changed = old.tag() != new.tag() or old.full_value() != new.full_value()
+    if changed:
+        result.append(Difference('changed', path, old, new))
+
+    # sub-lines which are the same in both are matched by digest
+    same = {}
+    for c in _content(old):
+        same.setdefault(digests[id(c)], []).append(c)
+    added = []
+    for c in _content(new):
+        matches = same.get(digests[id(c)])
+        if matches:
+            matches.pop()
+        else:
+            added.append(c)
+    left = set(id(c) for matches in same.values() for c in matches)
+
+    # the rest is paired by tag, in order
+    removed = {}
+    for c in _content(old):
+        if id(c) in left:
+            removed.setdefault(c.tag(), []).append(c)
+    for c in added:
+        others = removed.get(c.tag())
+        if others:
+            _compare(others.pop(0), c, path + (c.tag(),), result, digests)
+        else:
+            result.append(Difference('added', path + (c.tag(),), None, c))
+    left = set(id(c) for others in removed.values() for c in others)
+    for c in _content(old):
+        if id(c) in left:
+            result.append(Difference('removed', path + (c.tag(),), c, None))
+
+    if len(result) == count:
+        # only the order of sub-lines differs
+        result.append(Difference('changed', path, old, new))
+
+def _content(line):
+    """ Return sub-lines of line, without CONC and CONT lines (which are part of its value) """
+    return [c for c in line.children_lines() if c.tag() != 'CONC' and c.tag() != 'CONT']
@@ -28,7 +28,18 @@
 
 # Global imports
 import string
+import io
+import gc
+import codecs
+import hashlib
 from records import *
+from graph import FamilyGraph
+from streams import open_input, open_output, decode_lines, character_set
+from profiling import LoadStats, TimedReader, clock, count_containers
+from memory import memory_report
+from places import PlaceIndex, header_form
+from timeline import Timeline
+import stats
 
 class Gedcom:
     """ Gedcom parser
@@ -46,18 +57,70 @@ class Gedcom:
 
     """
 
-    def __init__(self,file):
+    def __init__(self,file,encoding=None,profile=False,keep_line_list=True,keep_parent_links=True,
+                 record_types=None,tags=None,keep_skipped=False):
         """ Initialize a Gedcom parser. You must supply a Gedcom file.
+
+        File can be a path or a binary stream. Files compressed with
+        gzip, bzip2 or xz are decompressed while they are parsed.
+
+        Unless encoding is given, it is taken from the byte order mark
+        or from CHAR line of the header (UTF-8, UTF-16, ANSEL, ANSI
+        and a few others are recognised).
+
+        If profile is True, time spent in each phase of loading is
+        measured (see load_stats()). Profile can also be a function,
+        which is then called with the LoadStats object once the file
+        is loaded (to pass it on to a metrics system, for example).
+
+        Read-only programs can save memory by dropping structures which
+        are only needed while the file is parsed. With keep_line_list
+        False, the list of all lines is not kept (line_list() then
+        walks the tree every time it is called). With
+        keep_parent_links False, lines do not remember their parent
+        lines (parent_line() returns None, and lines added below
+        level 1 no longer refresh links of their record).
+
+        Programs which need only some of the data can have the rest
+        skipped. If record_types is given (for example set(['INDI',
+        'FAM'])), only records with these tags are parsed; lines of
+        other records are passed over without being split. If tags is
+        given, lines (below level 0) with other tags are skipped
+        together with their sub-lines (CONC and CONT lines are always
+        kept). With keep_skipped, skipped records and lines are kept
+        as text (RawRecord and RawLine objects), so write() still
+        writes the whole file.
         """
-        self._record_dict = {}
+        self._record_dict = RecordDict()
         self._line_list = []
+        self._dangling = []
         self._individual_list = []
         self._family_list = []
         self._line_top = Line(-1,"","TOP","",self._record_dict)
-        self._current_level = -1
-        self._current_line = self._line_top
+        # lines which can still get children, by level (top line first)
+        self._open = [self._line_top]
         self._individuals = 0
-        self._parse(file)
+        self._load_stats = None
+        self._frozen = False
+        self._keep_parent_links = keep_parent_links
+        self._record_types = frozenset(record_types) if record_types is not None else None
+        self._tags = frozenset(tags) if tags is not None else None
+        self._keep_skipped = keep_skipped
+        # digests of the text of records, by key (see update_from())
+        self._hashes = None
+        # (RecordDict.epoch, PlaceIndex) of place_index()
+        self._places = None
+        # (RecordDict.epoch, Timeline) of timeline()
+        self._timeline = None
+        if profile:
+            self._parse_profiled(file, encoding)
+        else:
+            self._parse(file, encoding)
+        del self._open
+        if not keep_line_list:
+            self._line_list = None
+        if callable(profile):
+            profile(self._load_stats)
 
     def record_dict(self):
         """ Return a dictionary of records from the Gedcom file.  Only
@@ -70,8 +133,23 @@ class Gedcom:
         """ Return a list of all the lines in the Gedcom file.  The
         lines are in the same order as they appeared in the file.
         """
+        if self._line_list is None:
+            return self._walk()
         return self._line_list
 
+    def keeps_line_list(self):
+        """ Return True if the list of all lines is kept (see
+        keep_line_list), so that line_list() does not walk the tree.
+        """
+        return self._line_list is not None
+
+    def records(self):
+        """ Return a list of all the records in the Gedcom file, HEAD
+        and TRLR included.  The records are in the same order as they
+        appeared in the file.
+        """
+        return self._line_top.children_lines()
+
     def individual_list(self):
         """ Return a list of all the individuals in the Gedcom file.  The
         individuals are in the same order as they appeared in the file.
@@ -85,7 +163,18 @@ class Gedcom:
         return self._family_list
 
     def get_record(self, xref):
-        """ Return an object of class Record (or it's subclass) identified by xref """
+        """ Return an object of class Record (or it's subclass) identified by xref
+
+        Instead of xref, integer id of a record can be used (see
+        Record.id()), which saves a dictionary lookup. Unknown ids (and
+        ids of records removed by update_from()) raise KeyError, as
+        unknown xrefs do.
+        """
+        if isinstance(xref, (int, long)):
+            records = self._record_dict.records
+            if 0 <= xref < len(records) and records[xref] is not None:
+                return records[xref]
+            raise KeyError(xref)
         return self.record_dict()[xref]
 
     def get_individual(self, xref):
@@ -104,132 +193,883 @@ class Gedcom:
         else:
             return None
 
+    def write(self, file, encoding = 'utf-8', newline = '\n', compression = None):
+        """ Write all records to a GEDCOM file
+
+        File can be a path or a stream. Streams which do not accept
+        unicode strings (anything but io.TextIOBase) are written to
+        through an encoder for given encoding.
+
+        CHAR line of the header is written with the GEDCOM name of the
+        output encoding (or of the encoding of a text stream, if it
+        has one), so the file can be read back. Encodings without a
+        GEDCOM name raise ValueError.
+
+        Output is compressed if compression is 'gzip', 'bz2' or
+        'xz'. For paths, compression is guessed from the extension
+        (.gz, .bz2, .xz) unless given.
+        """
+        records = self._line_top.children_lines()
+        if isinstance(file, io.TextIOBase):
+            _write_records(file, newline, records, None, _text_character_set(file))
+            return
+
+        char = character_set(encoding)
+        f = open_output(file, compression)
+        try:
+            _write_records(codecs.getwriter(encoding)(f), newline, records, None, char)
+        finally:
+            f.close()
+
+    def extract(self, individual, file, ancestors = None, descendants = None, spouses = True,
+                encoding = 'utf-8', newline = '\n', compression = None):
+        """ Write an individual with relatives, and records they need, to a GEDCOM file of its own
+
+        Individual can be an Individual or its xref. Records which are
+        written are those of closure() (with the header and the
+        trailer), in the order of the file. Pointers to individuals
+        and families which are left out (FAMS of a spouse's other
+        marriage, for example) are dropped together with their
+        sub-lines, so the new file has no dangling pointers of its
+        own. File, encoding, newline and compression are as for
+        write().
+
+        Only the extracted records are visited, so the time taken does
+        not grow with the size of the whole tree. Returns the number of
+        records written.
+        """
+        (records, skip) = self._closure(individual, ancestors, descendants, spouses)
+        top = self._line_top.children_lines()
+        if top and top[-1].tag() == 'TRLR':
+            records.append(top[-1])
+
+        if isinstance(file, io.TextIOBase):
+            _write_records(file, newline, records, skip, _text_character_set(file))
+        else:
+            char = character_set(encoding)
+            f = open_output(file, compression)
+            try:
+                _write_records(codecs.getwriter(encoding)(f), newline, records, skip, char)
+            finally:
+                f.close()
+        return len(records)
+
+    def closure(self, individual, ancestors = None, descendants = None, spouses = True):
+        """ Return list of records of an individual with relatives, in the order of the file
+
+        Included are:
+
+        * the individual, ancestors up to ancestors generations and
+          descendants up to descendants generations (None for all,
+          0 for none; see Individual.iter_ancestors())
+        * with spouses, spouses of the individual and of descendants
+        * families with at least two of these people as members
+        * every record (source, note, multimedia object, repository,
+          submitter...) pointed to from any of the above, or from
+          records included this way
+
+        Records added by update_from() come after the others.
+        """
+        return self._closure(individual, ancestors, descendants, spouses)[0]
+
+    def _closure(self, individual, ancestors, descendants, spouses):
+        """ Implementation of closure(), also returns set of id()s of pointer lines extract() drops """
+        if not isinstance(individual, Record):
+            individual = self.get_individual(individual)
+        people = set([individual])
+        people.update(a for (a, generation) in individual.iter_ancestors(ancestors))
+        line = [individual] + [d for (d, generation) in individual.iter_descendants(descendants)]
+        people.update(line)
+        if spouses:
+            for person in line:
+                for family in person.families():
+                    people.update(p for p in family.parents() if p is not None)
+
+        families = set()
+        for person in people:
+            for family in person.parent_families() + person.families():
+                if family not in families and \
+                        len([m for m in family.parents() + list(family.children()) if m in people]) >= 2:
+                    families.add(family)
+
+        # records pointed to, and pointers to individuals and families which are left out
+        records = self._record_dict.records
+        chosen = dict((r._id, r) for r in people | families)
+        top = self._line_top.children_lines()
+        if top and top[0].tag() == 'HEAD':
+            chosen[top[0]._id] = top[0]
+        skip = set()
+        stack = list(chosen.values())
+        while stack:
+            e = stack.pop()
+            if e._ref is not None and e._ref not in chosen:
+                target = records[e._ref]
+                if isinstance(target, (Individual, Family)):
+                    skip.add(id(e))
+                    continue
+                if target is not None:
+                    chosen[target._id] = target
+                    stack.append(target)
+            stack.extend(e.children_lines())
+
+        return (sorted(chosen.values(), key = lambda r: r._id), skip)
+
+    def place_index(self):
+        """ Return places of events of all individuals and families, as an object of class PlaceIndex
+
+        The index is built on first use, with jurisdictions from the
+        PLAC FORM of the header, and again once records have changed.
+        """
+        if self._places is None or self._places[0] != self._record_dict.epoch:
+            top = self._line_top.children_lines()
+            form = None
+            if top and top[0].tag() == 'HEAD':
+                form = header_form(top[0])
+            records = self._individual_list + self._family_list
+            self._places = (self._record_dict.epoch, PlaceIndex(records, form))
+        return self._places[1]
+
+    def timeline(self):
+        """ Return events of all individuals and families sorted by date, as an object of class Timeline
+
+        Like place_index(), the timeline is built on first use and
+        again once records have changed.
+        """
+        if self._timeline is None or self._timeline[0] != self._record_dict.epoch:
+            self._timeline = (self._record_dict.epoch, Timeline(self._individual_list + self._family_list))
+        return self._timeline[1]
+
+    def statistics(self, aggregates = stats.DEFAULT, processes = 1):
+        """ Return aggregate statistics of individuals and families, computed in one pass
+
+        See stats.statistics() for aggregates and processes.
+        """
+        return stats.statistics(self, aggregates, processes)
+
+    def load_stats(self):
+        """ Return LoadStats of loading the file, or None if it was not profiled """
+        return self._load_stats
+
+    def memory_report(self):
+        """ Return an estimate of memory taken by the tree, as an object of class MemoryReport
+
+        Memory is broken down by kind of structure, by record type and
+        by tag (see memory.py). Every object is visited once, so this
+        is fast enough for big trees.
+        """
+        return memory_report(self)
+
+    def dangling_pointers(self):
+        """ Return a list of lines whose values point to records which do not exist """
+        return self._dangling
+
+    def family_graph(self):
+        """ Return parent/child links of all individuals as an object of class FamilyGraph """
+        return FamilyGraph(self.individual_list())
+
+    def find_cycles(self):
+        """ Return a list of groups of individuals who are their own ancestors
+
+        Each group is a list of xrefs. A correct file has no such
+        groups, so an empty list is returned.
+        """
+        graph = self.family_graph()
+        return [map(graph.xref_of, cycle) for cycle in graph.cycles()]
+
+    def freeze(self):
+        """ Make the tree read-only, to share it with forked processes
+
+        A server can parse a file, freeze it and then fork workers,
+        which use the memory of the tree together for as long as
+        nobody writes to it (copy-on-write). Freezing fills all caches
+        of relatives at once, so that queries no longer write into
+        records, turns lists of lines and records into tuples and
+        shares equal tags and xrefs between lines. Adding lines
+        afterwards raises TypeError.
+
+        Sharing memory with workers needs Python 3.7 or newer: there
+        the objects of the tree are moved out of reach of the garbage
+        collector (gc.freeze()). On older versions each full
+        collection writes to every object, so workers end up with
+        copies of most pages anyway; the tree is still read-only.
+        bench/freeze.py measures the memory copied by a worker.
+
+        Returns the Gedcom itself.
+        """
+        if self.frozen():
+            return self
+
+        strings = {}
+        for e in self.line_list():
+            e._freeze(strings)
+        self._line_top._freeze(strings)
+
+        if self._line_list is not None:
+            self._line_list = tuple(self._line_list)
+        self._individual_list = tuple(self._individual_list)
+        self._family_list = tuple(self._family_list)
+        self._dangling = tuple(self._dangling)
+        backlinks = self._record_dict.backlinks
+        for (target, refs) in backlinks.items():
+            backlinks[target] = tuple(refs)
+
+        self._frozen = True
+        gc.collect()
+        if hasattr(gc, 'freeze'):
+            gc.freeze()
+        return self
+
+    def frozen(self):
+        """ Return True if freeze() has been called """
+        return self._frozen
+
+    def update_from(self,file,encoding=None):
+        """ Bring the tree up to date with a new version of the file
+
+        Meant for files which are exported again and again with only
+        a few records changed. The new file is cut into records
+        (without splitting their lines) and only records whose text
+        changed, or which were added, are parsed. Records are matched
+        by their xref (or tag, for records without xref such as HEAD)
+        and by how many records with the same xref came before them.
+
+        Unchanged records keep their objects. Changed records get new
+        objects, with the same ids (see Record.id()), and ids of
+        removed records are no longer used (get_record() raises
+        KeyError for them). Links are initialised again
+        for new records and for records which point to changed,
+        added or removed records. Options given to __init__() (such
+        as record_types) apply to the new file too.
+
+        The first update compares the file with the text of the
+        lines in the tree, so records whose lines were written
+        differently (with extra spaces, for example) are parsed again
+        even if they did not change. Later updates compare with the
+        previous file.
+
+        Returns (added, changed, removed) lists of records. Raises
+        GedcomParseError, and leaves the tree as it was, if a new or
+        changed record is not valid.
+        """
+        if self.frozen():
+            raise TypeError("Lines of a frozen Gedcom can not be changed")
+
+        keyed = keyed_records(self._line_top.children_lines())
+        old = dict(keyed)
+        hashes = self._hashes
+        if hashes is None:
+            hashes = dict((key, _digest(_record_text(r))) for (key, r) in old.items())
+
+        # keys in the order of the new file, and lines of records which changed
+        order = []
+        spans = {}
+        digests = {}
+        f = open_input(file)
+        try:
+            for (key, number, lines) in _spans(decode_lines(f, encoding)):
+                digest = _digest(lines)
+                order.append(key)
+                digests[key] = digest
+                if hashes.get(key) != digest:
+                    spans[key] = (number, lines)
+        finally:
+            f.close()
+
+        if not spans and order == [key for (key, r) in keyed]:
+            self._hashes = digests
+            return ([], [], [])
+
+        (parsed, lines) = self._parse_spans([key for key in order if key in spans], spans)
+        return self._replace(old, order, spans, parsed, lines, digests)
+
     # Private methods
 
-    def _parse(self,file):
+    def _parse(self,file,encoding):
         # open file
         # go through the lines
-        f = open(file)
-        number = 1
-        for line in f.readlines():
-            self._parse_line(number,line.decode("utf-8-sig"))
-            number += 1
+        f = open_input(file)
+        try:
+            for (number, tokens) in self._tokens(decode_lines(f, encoding), split_line):
+                self._add_line(number, tokens)
+        finally:
+            f.close()
+        self._trim_last()
+
+        self._resolve_pointers()
+        self._link()
 
+    def _link(self):
         for e in self.line_list():
             e._init()
 
-    def _parse_line(self,number,line):
-        # each line should have: Level SP (Xref SP)? Tag (SP Value)? (SP)? NL
-        # parse the line
-        tail = line.strip()
+        for e in self._line_top.children_lines():
+            e._linked = True
+
+    def _parse_profiled(self,file,encoding):
+        """ Same as _parse(), but measures its phases into a LoadStats """
+        stats = LoadStats()
+        phases = stats.phases
+        # collecting garbage to count containers is left out of the times
+        counting = [0.0]
+        def count():
+            t = clock()
+            n = count_containers()
+            counting[0] += clock() - t
+            return n
 
-        if tail == '':
-            self._error(number,"Empty line")
+        start = clock()
+        containers = count()
 
+        tokenize = [0.0]
+        def split(number, line):
+            t = clock()
+            tokens = split_line(number, line)
+            tokenize[0] += clock() - t
+            return tokens
+
+        f = TimedReader(open_input(file), stats)
         try:
-            [head, tail] = tail.split(' ', 1)
-        except ValueError:
-            self._error(number,"Incomplete line")
+            build = 0.0
+            number = 0
+            t0 = clock()
+            for (number, tokens) in self._tokens(decode_lines(f, encoding), split):
+                t1 = clock()
+                self._add_line(number, tokens)
+                build += clock() - t1
+            self._trim_last()
+            loop = clock() - t0
+        finally:
+            f.close()
+        # whatever was not measured on its own was spent decoding
+        phases['decode'].seconds = loop - build - tokenize[0] - phases['read'].seconds
+        phases['tokenize'].seconds = tokenize[0]
+        phases['build'].seconds = build
+        stats.lines = number
+
+        for (name, function) in (('build', None),
+                                 ('resolve', self._resolve_pointers),
+                                 ('init', self._link)):
+            if function is not None:
+                t = clock()
+                function()
+                phases[name].seconds = clock() - t
+            n = count()
+            phases[name].containers = n - containers
+            containers = n
+
+        for e in self._line_top.children_lines():
+            stats.records[e.type()] = stats.records.get(e.type(), 0) + 1
+        stats.seconds = clock() - start - counting[0]
+        self._load_stats = stats
 
-        l = self._level(number,head) #retireve line level
+    def _walk(self):
+        """ Return list of all lines, in the order of the file, collected from the tree """
+        lines = []
+        stack = list(reversed(self._line_top.children_lines()))
+        while stack:
+            e = stack.pop()
+            lines.append(e)
+            stack.extend(reversed(e.children_lines()))
+        return lines
 
+    def _parse_spans(self,keys,spans):
+        """ Parse records of given keys from spans
+
+        Returns dictionaries of the new records and of lists of their
+        lines, by key.
+        New records are added to the record dictionary, but not to the
+        tree. If a record is not valid, everything is put back as it
+        was before GedcomParseError is raised. """
+        records = self._record_dict.records
+        top = self._line_top.children_lines()
+        saved = (self._line_list, self._individual_list, self._family_list,
+                 len(records), len(top), dict(self._record_dict))
+        self._line_list = []
+        self._individual_list = []
+        self._family_list = []
+        self._open = [self._line_top]
+        parsed = {}
+        lines = {}
         try:
-            [head, tail] = tail.split(' ', 1)
-        except ValueError:
-            [head, tail] = [tail, '']
-        p = self._xref(number,head) #retrieve line xref if it exists
-        if p != '':
-            try:
-                [head, tail] = tail.split(' ', 1)
-            except ValueError:
-                [head, tail] = [tail, '']
-        t = self._tag(number,head) #retrieve line tag
+            for key in keys:
+                (number, text) = spans[key]
+                count = len(top)
+                start = len(self._line_list)
+                for (n, tokens) in self._tokens(text, split_line, number - 1):
+                    self._add_line(n, tokens)
+                if len(top) > count:
+                    parsed[key] = top[-1]
+                    lines[key] = self._line_list[start:]
+            self._trim_last()
+        except GedcomParseError:
+            self._record_dict.clear()
+            self._record_dict.update(saved[5])
+            raise
+        finally:
+            (self._line_list, self._individual_list, self._family_list) = saved[:3]
+            del records[saved[3]:]
+            del top[saved[4]:]
+            del self._open
+        return (parsed, lines)
 
-        v = tail #retrieve value of tag if it exists
-        
+    def _replace(self,old,order,spans,parsed,lines,digests):
+        """ Put parsed records into the tree in place of old ones (see update_from()) """
+        records = self._record_dict.records
+        top = self._line_top
+        # records which are gone from the file, or are now skipped
+        removed = [r for (key, r) in old.items() if key not in digests or
+                   (key in spans and key not in parsed)]
+        removed.sort(key = lambda r: r._id)
+        lost = set(r._id for r in removed)
+        changed = []
+        added = []
+        for key in order:
+            record = parsed.get(key)
+            if record is None:
+                continue
+            if key in old and old[key]._id not in lost:
+                record._id = old[key]._id
+                records[record._id] = record
+                changed.append(record)
+            else:
+                record._id = len(records)
+                records.append(record)
+                added.append(record)
+
+        # forget xrefs of lines which are no longer in the tree
+        gone = removed + [old[key] for key in order if key in parsed and key in old]
+        for record in gone:
+            for e in _subtree(record):
+                if e._xref and self._record_dict.get(e._xref) is e:
+                    del self._record_dict[e._xref]
+        for record in removed:
+            records[record._id] = None
+
+        # lines of old records are taken from the list of lines, if it is kept
+        line_list = None
+        if self._line_list is not None:
+            starts = [n for (n, e) in enumerate(self._line_list) if e._level == 0]
+            starts.append(len(self._line_list))
+            bounds = dict((id(r), (starts[n], starts[n + 1]))
+                          for (n, r) in enumerate(top.children_lines()))
+            line_list = []
+
+        children = []
+        for key in order:
+            if key in parsed:
+                children.append(parsed[key])
+            elif key in old and old[key]._id not in lost:
+                children.append(old[key])
+        top._children_lines[:] = children
+        self._individual_list[:] = [r for r in children if isinstance(r, Individual)]
+        self._family_list[:] = [r for r in children if isinstance(r, Family)]
+
+        # resolve pointers of new records and pointers which were
+        # dangling, and find old records which point to records which
+        # were replaced, added or removed
+        touched = set(r._id for r in gone + added)
+        fresh = dict((id(parsed[key]), lines[key]) for key in parsed)
+        dangling = set(id(e) for e in self._dangling)
+        record_dict = self._record_dict
+        neighbours = []
+        self._dangling = []
+        # the index of pointers is built again along the way
+        backlinks = record_dict.backlinks = {}
+        for record in children:
+            new = fresh.get(id(record))
+            if new is not None:
+                record_lines = new
+            elif line_list is not None:
+                (a, b) = bounds[id(record)]
+                record_lines = self._line_list[a:b]
+            else:
+                record_lines = list(_subtree(record))
+            linked = False
+            for e in record_lines:
+                ref = e._ref
+                resolve = True
+                if new is None:
+                    if ref is None:
+                        resolve = id(e) in dangling
+                    elif ref in touched:
+                        linked = True
+                        if ref in lost:
+                            e._ref = None
+                        else:
+                            resolve = False
+                    else:
+                        resolve = False
+                if resolve:
+                    v = e._value
+                    if v[:1] == '@' and v[-1:] == '@' and len(v) > 2 and ' ' not in v:
+                        target = record_dict.get(v)
+                        if target is None:
+                            self._dangling.append(e)
+                        else:
+                            e._ref = target._id
+                            linked = True
+                if e._ref is not None:
+                    backlinks.setdefault(e._ref, []).append((record._id, e))
+            if linked and new is None:
+                neighbours.append(record)
+            if line_list is not None:
+                line_list.extend(record_lines)
+
+        for record in changed + added + neighbours:
+            record._init()
+            record._linked = True
+        self._record_dict.epoch += 1
+
+        if line_list is not None:
+            self._line_list = line_list
+        self._hashes = digests
+        return (added, changed, removed)
+
+    def _resolve_pointers(self):
+        """ Store integer id of the record pointed to in every pointer line, and index the pointers """
+        records = self._record_dict
+        backlinks = records.backlinks
+        current = None
+        for e in self._line_list:
+            if e._level == 0:
+                current = e._id
+            v = e._value
+            if v[:1] == '@' and v[-1:] == '@' and len(v) > 2 and ' ' not in v:
+                record = records.get(v)
+                if record is None:
+                    self._dangling.append(e)
+                else:
+                    e._ref = record._id
+                    refs = backlinks.get(e._ref)
+                    if refs is None:
+                        backlinks[e._ref] = [(current, e)]
+                    else:
+                        refs.append((current, e))
+
+    def _tokens(self,lines,split,number=0):
+        """ Iterate over (number, tokens) of lines which are to be parsed
+
+        Lines are split into tokens by split, and numbered from
+        number + 1. Records and lines which are filtered out (see
+        __init__()) are passed over; only their first line is split. """
+        record_types = self._record_types
+        tags = self._tags
+        if record_types is None and tags is None:
+            for line in lines:
+                number += 1
+                yield (number, split(number, line))
+            return
+
+        # (number, tokens, text) of a record or line which is skipped
+        skipped = None
+        for line in lines:
+            number += 1
+            if skipped is not None:
+                level = skipped[1][0]
+                if level == 0:
+                    inside = not _starts_record(line)
+                else:
+                    inside = _level(number, line.lstrip().split(' ', 1)[0]) > level
+                if inside:
+                    if skipped[2] is not None:
+                        skipped[2].append(line)
+                    continue
+                self._add_skipped(skipped)
+                skipped = None
+
+            tokens = split(number, line)
+            (l, p, t, v) = tokens
+            if l == 0:
+                skip = record_types is not None and t not in record_types
+            else:
+                skip = tags is not None and t not in tags and t != 'CONC' and t != 'CONT'
+            if skip:
+                skipped = (number, tokens, [line] if self._keep_skipped else None)
+            else:
+                yield (number, tokens)
+
+        if skipped is not None:
+            self._add_skipped(skipped)
+
+    def _add_skipped(self,skipped):
+        """ Add a skipped record or line to the tree as text, if skipped lines are kept """
+        (number, tokens, text) = skipped
+        if text is not None:
+            self._add_line(number, tokens, u'\n'.join(text))
+
+    def _parse_line(self,number,line):
+        self._add_line(number, split_line(number, line))
+
+    def _add_line(self,number,tokens,raw=None):
+        """ Add a line to the tree; raw is the text of lines which are not parsed """
+        (l, p, t, v) = tokens
         # create the line
-        if l > self._current_level + 1:
-            self._error(number,"Structure of GEDCOM file is corrupted")
+        if l >= len(self._open):
+            _error(number,"Structure of GEDCOM file is corrupted")
 
-        if l == 0: #current line is in fact a brand new record
+        if raw is not None:
+            if l == 0:
+                e = RawRecord(l,p,t,v,self.record_dict(),raw)
+            else:
+                e = RawLine(l,p,t,v,self.record_dict(),raw)
+        elif l == 0: #current line is in fact a brand new record
+            e = RECORD_CLASSES.get(t, Record)(l,p,t,v,self.record_dict())
             if t == "INDI":
-                e = Individual(l,p,t,v,self.record_dict())
                 self._individual_list.append(e)
             elif t == "FAM":
-                e = Family(l,p,t,v,self.record_dict())
                 self._family_list.append(e)
-            elif t == "OBJE":
-                e = Multimedia(l,p,t,v,self.record_dict())
-            elif t == "NOTE":
-                e = Note(l,p,t,v,self.record_dict())
-            elif t == "REPO":
-                e = Repository(l,p,t,v,self.record_dict())
-            elif t == "SOUR":
-                e = Source(l,p,t,v,self.record_dict())
-            elif t == "SUBN":
-                e = Submission(l,p,t,v,self.record_dict())
-            elif t == "SUBM":
-                e = Submitter(l,p,t,v,self.record_dict())
-            else:
-                e = Record(l,p,t,v,self.record_dict())
         else:
             e = Line(l,p,t,v,self.record_dict())
 
         self._line_list.append(e)
+        if l == 0:
+            e._id = len(self._record_dict.records)
+            self._record_dict.records.append(e)
         if p != '':
             self._record_dict[p] = e
 
-        if l > self._current_level:
-            self._current_line.add_child(e)
-            e.add_parent_line(self._current_line)
+        if t != 'CONC':
+            self._trim_last()
+        del self._open[l + 1:]
+        parent = self._open[l]
+        # not add_child(), nothing needs to hear of changes while parsing
+        parent._children_lines.append(e)
+        if self._keep_parent_links:
+            e.add_parent_line(parent)
         else:
-            # l.value <= self._current_level:
-            while (self._current_line.level() != l - 1):
-                self._current_line = self._current_line.parent_line()
-            self._current_line.add_child(e)
-            e.add_parent_line(self._current_line)
+            # a copy of the attributes fits into a smaller dictionary
+            # than the one which grew while they were set
+            e.__dict__ = dict(e.__dict__)
+        self._open.append(e)
 
-        # finish up
-        self._current_level = l
-        self._current_line = e
+    def _trim_last(self):
+        """ Drop trailing whitespace from the value of the line added last
 
-    def _level(self,number,head):
+        Called once the next line is known not to continue the value
+        with CONC (see trim_values()). """
+        last = self._open[-1]
+        if last._value[-1:].isspace() and last._tag != 'CONC' and not isinstance(last, (RawLine, RawRecord)):
+            last._value = last._value.rstrip()
+
+    def _print(self):
+        for e in self.line_list:
+            print string.join([unicode(e.level()),e.xref(),e.tag(),e.value()])
+
+
+def _write_records(stream, newline, records, skip, char = None):
+    """ Write records to stream, without lines whose id() is in skip (and their sub-lines)
+
+    Unless char is None, CHAR line of the header is written (or
+    added) with char as its value. """
+    chunk = []
+    for record in records:
+        lines = record._gedcom_lines(len(newline), skip)
+        if char is not None and record.tag() == 'HEAD':
+            lines = _with_character_set(lines, char)
+        for text in lines:
+            chunk.append(text)
+            if len(chunk) == 1000:
+                chunk.append(u'')
+                stream.write(newline.join(chunk))
+                chunk = []
+    if chunk:
+        chunk.append(u'')
+        stream.write(newline.join(chunk))
+
+def _with_character_set(lines, char):
+    """ Iterate over GEDCOM lines of a header, with value of its CHAR line replaced by char """
+    found = False
+    for text in lines:
+        if text == u'1 CHAR' or text.startswith(u'1 CHAR '):
+            text = u'1 CHAR ' + char
+            found = True
+        yield text
+    if not found:
+        yield u'1 CHAR ' + char
+
+def _text_character_set(stream):
+    """ Return value of HEAD.CHAR for a text stream, or None if its encoding is not known """
+    encoding = getattr(stream, 'encoding', None)
+    if encoding is None:
+        return None
+    try:
+        return character_set(encoding)
+    except ValueError:
+        return None
+
+def split_line(number,line):
+    """ Split a line of a GEDCOM file into (level, xref, tag, value)
+
+    Number of the line is used in the message of GedcomParseError,
+    which is raised if the line is not valid.
+    """
+    # each line should have: Level SP (Xref SP)? Tag (SP Value)? (SP)? NL
+    # parse the line
+    # trailing spaces are part of the value (and matter in CONC
+    # lines), see trim_values()
+    tail = line.lstrip()
+
+    if tail == '':
+        _error(number,"Empty line")
+
+    try:
+        [head, tail] = tail.split(' ', 1)
+    except ValueError:
+        _error(number,"Incomplete line")
+
+    l = _level(number,head) #retireve line level
+
+    try:
+        [head, tail] = tail.split(' ', 1)
+    except ValueError:
+        [head, tail] = [tail, '']
+    p = _xref(number,head) #retrieve line xref if it exists
+    if p != '':
         try:
-            l = int(head)
+            [head, tail] = tail.split(' ', 1)
         except ValueError:
-            self._error(number,"Line must start with an integer level")
-
-        if (l < 0):
-            self._error(number,"Line must start with a positive integer")
-
-        return l
-
-    def _xref(self,number,head):
-        if head == '':
-            self._error(number,"Incomplete Line")
-        p = ''
-        if head[0] == '@':
-            if head[len(head)-1] == '@':
-                p = head
-                # could strip the xref to remove the @ with
-                # string.strip(head,'@')
-                # but it may be useful to identify xrefs outside this class
-            else:
-                self._error(number,"Xref must start and end with @")
-        return p
+            [head, tail] = [tail, '']
+    t = _tag(number,head) #retrieve line tag
 
-    def _tag(self,number,head):
-        if head == '':
-            self._error(number,"Incomplete Line")
-        return head
+    v = tail #retrieve value of tag if it exists
 
-    def _error(self,number,text):
-        error = "Gedcom format error on line " + unicode(number) + ': ' + text
-        raise GedcomParseError(error)
+    return (l, p, t, v)
 
-    def _print(self):
-        for e in self.line_list:
-            print string.join([unicode(e.level()),e.xref(),e.tag(),e.value()])
+def trim_values(items):
+    """ Iterate over (number, tokens) of items, with trailing whitespace dropped from values
+
+    Items are (number, (level, xref, tag, value)) as given by
+    split_line(). Trailing spaces are kept in values of CONC lines,
+    and in values which the next line continues with CONC, because
+    there they are part of the text. Everywhere else (pointers, dates,
+    ...) they are dropped, as the Gedcom parser does. """
+    previous = None
+    for item in items:
+        if previous is not None:
+            yield _trimmed(previous, item[1][2] == 'CONC')
+        previous = item
+    if previous is not None:
+        yield _trimmed(previous, False)
+
+def _trimmed(item, continued):
+    (number, (l, p, t, v)) = item
+    if continued or t == 'CONC' or not v[-1:].isspace():
+        return item
+    return (number, (l, p, t, v.rstrip()))
+
+def _trim_text(lines):
+    """ Return GEDCOM lines with trailing whitespace dropped as trim_values() does """
+    result = list(lines)
+    for n in xrange(len(result)):
+        line = result[n]
+        if not line[-1:].isspace() or _is_conc(line):
+            continue
+        if n + 1 < len(result) and _is_conc(result[n + 1]):
+            continue
+        result[n] = line.rstrip()
+    return result
+
+def _is_conc(line):
+    parts = line.split(None, 2)
+    return len(parts) > 1 and parts[1] == 'CONC'
+
+def keyed_records(records):
+    """ Return list of (key, record) of records
+
+    Key is (xref, n), or (tag, n) for records without xref such as
+    HEAD, where n counts records with the same xref (or tag) which
+    came before. Keys match records of two versions of a file (see
+    Gedcom.update_from() and diff.diff()). """
+    counts = {}
+    result = []
+    for r in records:
+        name = r._xref or r._tag
+        n = counts.get(name, 0)
+        counts[name] = n + 1
+        result.append(((name, n), r))
+    return result
+
+def _spans(lines):
+    """ Iterate over (key, number of the first line, lines) of records in lines """
+    counts = {}
+    span = None
+    number = 0
+    for line in lines:
+        number += 1
+        if span is not None and line[:2] != u'0 ' and not _starts_record(line):
+            span[2].append(line)
+            continue
+        if span is not None:
+            yield span
+        (l, p, t, v) = split_line(number, line)
+        name = p or t
+        n = counts.get(name, 0)
+        counts[name] = n + 1
+        span = ((name, n), number, [line])
+    if span is not None:
+        yield span
+
+def _subtree(line):
+    """ Iterate over line and all of its sub-lines, in the order of the file """
+    stack = [line]
+    while stack:
+        e = stack.pop()
+        yield e
+        stack.extend(reversed(e._children_lines))
+
+def _record_text(record):
+    """ Return list of GEDCOM lines of record, as they would have been read """
+    lines = []
+    for e in _subtree(record):
+        if isinstance(e, (RawLine, RawRecord)):
+            lines.append(e.raw())
+        else:
+            lines.append(unicode(e))
+    return lines
+
+def _digest(lines):
+    """ Return digest of the text of a record, as it is parsed (see _trim_text()) """
+    return hashlib.sha1(u'\n'.join(_trim_text(lines)).encode('utf-8')).digest()
+
+def _starts_record(line):
+    """ Return True if line has level 0 (without splitting it) """
+    if line[:2] == u'0 ':
+        return True
+    return line[:1] in (u' ', u'\t') and line.lstrip()[:2] == u'0 '
+
+def _level(number,head):
+    try:
+        l = int(head)
+    except ValueError:
+        _error(number,"Line must start with an integer level")
+
+    if (l < 0):
+        _error(number,"Line must start with a positive integer")
+
+    return l
+
+def _xref(number,head):
+    if head == '':
+        _error(number,"Incomplete Line")
+    p = ''
+    if head[0] == '@':
+        if head[len(head)-1] == '@':
+            p = head
+            # could strip the xref to remove the @ with
+            # string.strip(head,'@')
+            # but it may be useful to identify xrefs outside this class
+        else:
+            _error(number,"Xref must start and end with @")
+    return p
+
+def _tag(number,head):
+    if head == '':
+        _error(number,"Incomplete Line")
+    return head
+
+def _error(number,text):
+    error = "Gedcom format error on line " + unicode(number) + ': ' + text
+    raise GedcomParseError(error)
 
 
 class GedcomParseError(Exception):
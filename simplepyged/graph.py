@@ -0,0 +1,231 @@
+#-*- coding: utf-8 -*-
+#
+# Gedcom 5.5 Parser
+#
+# Copyright (C) 2010 Nikola Škorić (nskoric [ at ] gmail.com)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# Please see the GPL license at http://www.gnu.org/licenses/gpl.txt
+#
+# To contact the author, see http://github.com/dijxtra/simplepyged
+
+# Global imports
+from array import array
+from collections import deque
+
+
+def _csr(rows):
+    """ Pack a list of index lists into (offsets, indices) arrays """
+    offsets = array('i', [0])
+    indices = array('i')
+    for row in rows:
+        indices.extend(row)
+        offsets.append(len(indices))
+    return (offsets, indices)
+
+
+class FamilyGraph:
+    """ Parent/child links of a Gedcom file in compressed sparse row form
+
+    Every individual gets an integer index (the position of the
+    individual in Gedcom.individual_list()). Links are stored in two
+    pairs of arrays:
+
+    * child_offsets/child_indices: children of individual i are
+      child_indices[child_offsets[i]:child_offsets[i+1]]
+    * parent_offsets/parent_indices: parents of individual i are
+      parent_indices[parent_offsets[i]:parent_offsets[i+1]]
+
+    Neighbours are listed in the same order as Individual.children()
+    and Individual.parents() return them (missing parents are left
+    out). xrefs is a list mapping index to xref, index is a dictionary
+    mapping xref to index.
+
+    The graph is a snapshot: it does not follow later changes of the
+    tree. Build a new one with Gedcom.family_graph() if you need to.
+    """
+
+    def __init__(self, individuals):
+        self.xrefs = [i.xref() for i in individuals]
+        self.index = dict((x, n) for (n, x) in enumerate(self.xrefs))
+
+        position = dict((id(i), n) for (n, i) in enumerate(individuals))
+        parents = []
+        children = []
+        for i in individuals:
+            parents.append([position[id(p)] for p in i.parents() if p is not None and id(p) in position])
+            children.append([position[id(c)] for c in i.children() if id(c) in position])
+
+        (self.parent_offsets, self.parent_indices) = _csr(parents)
+        (self.child_offsets, self.child_indices) = _csr(children)
+
+    def __len__(self):
+        return len(self.xrefs)
+
+    def index_of(self, xref):
+        """ Return index of individual identified by xref """
+        return self.index[xref]
+
+    def xref_of(self, index):
+        """ Return xref of individual with given index """
+        return self.xrefs[index]
+
+    def parents(self, index):
+        """ Return array of indices of parents of individual with given index """
+        return self.parent_indices[self.parent_offsets[index]:self.parent_offsets[index + 1]]
+
+    def children(self, index):
+        """ Return array of indices of children of individual with given index """
+        return self.child_indices[self.child_offsets[index]:self.child_offsets[index + 1]]
+
+    def ancestors(self, index, depth = None):
+        """ Return indices of all ancestors of an individual (not deeper than depth generations) """
+        return self._sweep(index, self.parent_offsets, self.parent_indices, depth)
+
+    def descendants(self, index, depth = None):
+        """ Return indices of all descendants of an individual (not deeper than depth generations) """
+        return self._sweep(index, self.child_offsets, self.child_indices, depth)
+
+    def generations(self):
+        """ Return array of generation numbers, one for each individual
+
+        Individuals without parents are in generation 0, everybody
+        else is one generation below their youngest parent. Individuals
+        which can not be numbered (because they are their own
+        ancestors) get -1.
+        """
+        offsets = self.child_offsets
+        indices = self.child_indices
+
+        waiting = array('i', [0]) * len(self)
+        for c in indices:
+            waiting[c] += 1
+        generation = array('i', [-1]) * len(self)
+        queue = deque(i for i in xrange(len(self)) if waiting[i] == 0)
+        for i in queue:
+            generation[i] = 0
+
+        while queue:
+            i = queue.popleft()
+            g = generation[i] + 1
+            for n in xrange(offsets[i], offsets[i + 1]):
+                c = indices[n]
+                if generation[c] < g:
+                    generation[c] = g
+                waiting[c] -= 1
+                if waiting[c] == 0:
+                    queue.append(c)
+
+        return generation
+
+    def statistics(self):
+        """ Return a dictionary with basic statistics of the graph """
+        n = len(self)
+        roots = sum(1 for i in xrange(n) if self.parent_offsets[i] == self.parent_offsets[i + 1])
+        leaves = sum(1 for i in xrange(n) if self.child_offsets[i] == self.child_offsets[i + 1])
+        generations = self.generations()
+
+        return {'individuals': n,
+                'parent_links': len(self.parent_indices),
+                'child_links': len(self.child_indices),
+                'roots': roots,
+                'leaves': leaves,
+                'generations': max(generations) + 1 if n else 0}
+
+    def cycles(self):
+        """ Return a list of cycles in the graph
+
+        A cycle is a group of individuals in which everybody is their own
+        ancestor, which can only happen in a corrupted file. Each cycle
+        is returned as a list of indices. The graph is searched once,
+        using an iterative version of Tarjan's strongly connected
+        components algorithm, so deep trees do not hit the recursion
+        limit.
+        """
+        offsets = self.child_offsets
+        indices = self.child_indices
+        n = len(self)
+
+        order = array('i', [-1]) * n
+        low = array('i', [0]) * n
+        on_stack = bytearray(n)
+        stack = []
+        found = []
+        counter = 0
+
+        for root in xrange(n):
+            if order[root] != -1:
+                continue
+
+            order[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = 1
+            work = [[root, offsets[root]]]
+
+            while work:
+                frame = work[-1]
+                v = frame[0]
+                if frame[1] < offsets[v + 1]:
+                    w = indices[frame[1]]
+                    frame[1] += 1
+                    if order[w] == -1:
+                        order[w] = low[w] = counter
+                        counter += 1
+                        stack.append(w)
+                        on_stack[w] = 1
+                        work.append([w, offsets[w]])
+                    elif on_stack[w] and order[w] < low[v]:
+                        low[v] = order[w]
+                    continue
+
+                work.pop()
+                if work and low[v] < low[work[-1][0]]:
+                    low[work[-1][0]] = low[v]
+
+                if low[v] == order[v]:
+                    component = []
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = 0
+                        component.append(w)
+                        if w == v:
+                            break
+                    if len(component) > 1 or v in self.children(v):
+                        component.reverse()
+                        found.append(component)
+
+        return found
+
+    @staticmethod
+    def _sweep(index, offsets, indices, depth):
+        """ Breadth first sweep over one direction of the graph """
+        seen = set([index])
+        found = array('i')
+        frontier = [index]
+        level = 0
+        while frontier and (depth is None or level < depth):
+            new = []
+            for i in frontier:
+                for n in xrange(offsets[i], offsets[i + 1]):
+                    j = indices[n]
+                    if j not in seen:
+                        seen.add(j)
+                        new.append(j)
+            found.extend(new)
+            frontier = new
+            level += 1
+        return found
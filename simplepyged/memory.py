@@ -0,0 +1,175 @@
+#-*- coding: utf-8 -*-
+#
+# Gedcom 5.5 Parser
+#
+# Copyright (C) 2010 Nikola Škorić (nskoric [ at ] gmail.com)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# Please see the GPL license at http://www.gnu.org/licenses/gpl.txt
+#
+# To contact the author, see http://github.com/dijxtra/simplepyged
+
+""" Estimate of memory taken by a parsed GEDCOM file, see Gedcom.memory_report()
+
+Sizes are taken with sys.getsizeof(), which gives the size of an
+object without the objects it refers to, and added up over
+everything the tree refers to. Every object is counted once only, so
+strings which are shared between lines (see Gedcom.freeze()) or
+between lines and events are counted with the first owner. Overhead
+of the memory allocator is not included.
+
+Categories:
+
+* lines - Line objects and their attribute dictionaries
+* children - lists (or tuples) of child lines
+* strings - tags, xrefs and values (and text of skipped lines, see
+  Gedcom(keep_skipped=True))
+* caches - lists and tuples of linked records and events kept by
+  Individual and Family objects
+* events - Event objects (with strings of their own)
+* record_dict - dictionary of records, with the list of all records
+  and the index of pointers (see RecordDict.backlinks)
+* line_list - lists of lines, individuals and families kept by Gedcom
+"""
+
+# Global imports
+from sys import getsizeof
+from events import Event
+
+CATEGORIES = ('lines', 'children', 'strings', 'caches', 'events', 'record_dict', 'line_list')
+
+
+class MemoryReport:
+    """ Memory taken by a tree, in bytes
+
+    * total - everything
+    * categories - dictionary of bytes, by category (see CATEGORIES)
+    * types - dictionary of dictionaries of bytes, by record class
+      ('Individual', 'Family', 'Note', ...) and category
+    * tags - dictionary of bytes (of lines, children and strings) by tag
+    * lines - number of lines counted
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.categories = dict((c, 0) for c in CATEGORIES)
+        self.types = {}
+        self.tags = {}
+        self.lines = 0
+
+    def as_dict(self):
+        """ Return the report as a dictionary of plain values """
+        return {'total': self.total,
+                'lines': self.lines,
+                'categories': dict(self.categories),
+                'types': dict((t, dict(c)) for (t, c) in self.types.items()),
+                'tags': dict(self.tags)}
+
+    def report(self, tags = 10):
+        """ Return a human readable table, with given number of biggest tags """
+        rows = ["%-12s %14s" % ('category', 'bytes')]
+        for c in CATEGORIES:
+            rows.append("%-12s %14d" % (c, self.categories[c]))
+        rows.append("%-12s %14d" % ('total', self.total))
+        rows.append("")
+        rows.append("%-12s %14s" % ('record type', 'bytes'))
+        for (t, c) in sorted(self.types.items(), key = lambda item: -sum(item[1].values())):
+            rows.append("%-12s %14d" % (t, sum(c.values())))
+        rows.append("")
+        rows.append("%-12s %14s" % ('tag', 'bytes'))
+        for (t, size) in sorted(self.tags.items(), key = lambda item: -item[1])[:tags]:
+            rows.append("%-12s %14d" % (t, size))
+        return "\n".join(rows)
+
+    def __str__(self):
+        return self.report()
+
+    def _add(self, category, kind, size):
+        self.categories[category] += size
+        if kind is not None:
+            sizes = self.types.setdefault(kind, {})
+            sizes[category] = sizes.get(category, 0) + size
+        self.total += size
+
+
+def memory_report(gedcom):
+    """ Return MemoryReport of a Gedcom """
+    report = MemoryReport()
+    seen = set()
+
+    def once(obj):
+        """ Return size of obj if it was not counted yet, else 0 """
+        if id(obj) in seen:
+            return 0
+        seen.add(id(obj))
+        return getsizeof(obj)
+
+    records = gedcom.records()
+    events = []
+    for record in records:
+        kind = record.type()
+        stack = [record]
+        while stack:
+            e = stack.pop()
+            report.lines += 1
+            children = e.children_lines()
+            stack.extend(children)
+
+            attributes = e.__dict__
+            lines = getsizeof(e) + getsizeof(attributes)
+            if '_ref' in attributes:
+                lines += once(e.ref())
+            report._add('lines', kind, lines)
+            size = once(children)
+            report._add('children', kind, size)
+            lines += size
+            size = once(e.tag()) + once(e.xref()) + once(e.value())
+            if '_raw' in attributes:
+                size += once(attributes['_raw'])
+            report._add('strings', kind, size)
+            lines += size
+            report.tags[e.tag()] = report.tags.get(e.tag(), 0) + lines
+
+        # only records keep anything else
+        report._add('lines', kind, once(record.id()))
+        for (name, value) in record.__dict__.items():
+            if name != '_children_lines' and isinstance(value, (list, tuple)):
+                report._add('caches', kind, once(value))
+                events.extend((kind, v) for v in value if isinstance(v, Event))
+
+    for (kind, event) in events:
+        size = once(event)
+        if size:
+            size += getsizeof(event.__dict__)
+            for value in event.__dict__.values():
+                if isinstance(value, basestring):
+                    size += once(value)
+        report._add('events', kind, size)
+
+    dictionary = gedcom.record_dict()
+    report._add('record_dict', None, once(dictionary) + once(dictionary.records))
+    backlinks = dictionary.backlinks
+    size = once(backlinks)
+    for refs in backlinks.itervalues():
+        size += once(refs) + sum(once(ref) for ref in refs)
+    report._add('record_dict', None, size)
+    lists = [gedcom.individual_list(), gedcom.family_list(), gedcom.dangling_pointers()]
+    if gedcom.keeps_line_list():
+        lists.append(gedcom.line_list())
+    for l in lists:
+        report._add('line_list', None, once(l))
+
+    return report
@@ -0,0 +1,210 @@
+#-*- coding: utf-8 -*-
+#
+# Gedcom 5.5 Parser
+#
+# Copyright (C) 2010 Nikola Škorić (nskoric [ at ] gmail.com)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# Please see the GPL license at http://www.gnu.org/licenses/gpl.txt
+#
+# To contact the author, see http://github.com/dijxtra/simplepyged
+
+""" Merging of two GEDCOM files without loading them
+
+Files are streamed line by line; only sets of xrefs and the map of
+renamed xrefs are kept in memory. Records of the first file are
+written unchanged. Records of the second file whose xrefs are also
+used in the first file get new xrefs, and every pointer to them (in
+FAMS, FAMC, HUSB, WIFE, CHIL, SOUR, NOTE, OBJE or any other line) is
+rewritten. The header of the first file is kept, the header of the
+second file is left out.
+
+The second file is read twice (first only for its xrefs), so a stream
+given for it must be seekable.
+
+.. code-block:: python
+
+    merge('ours.ged', 'theirs.ged.gz', 'merged.ged', renumber = True)
+"""
+
+# Global imports
+import io
+import re
+import codecs
+from streams import open_input, open_output, decode_lines, character_set
+from gedcom import split_line
+
+_NUMBERED = re.compile(r'^@(.*?)(\d+)@$')
+
+
+def merge(a, b, file, suffix = '_b', renumber = False, encoding = 'utf-8',
+          newline = '\n', compression = None):
+    """ Write records of GEDCOM files a and b into file, return map of renamed xrefs of b
+
+    A and b can be paths or binary streams, file can be a path or a
+    stream (as for Gedcom.write()).
+    Colliding xrefs of b get suffix (@I1@ becomes @I1_b@) or, with
+    renumber, the next free number with the same prefix (@I1@
+    becomes @I1001@ if @I1000@ is the highest @I...@ xref of both
+    files). Output is written like Gedcom.write() does it; CHAR line
+    of the header is changed (or added) to match encoding, and
+    ValueError is raised if GEDCOM has no name for encoding.
+    """
+    if hasattr(b, 'read'):
+        start = b.tell()
+    theirs = _xrefs(b)
+    if hasattr(b, 'read'):
+        b.seek(start)
+
+    if isinstance(file, io.TextIOBase):
+        return _merge(a, b, theirs, file, None, newline, suffix, renumber)
+
+    char = character_set(encoding)
+    f = open_output(file, compression)
+    try:
+        return _merge(a, b, theirs, codecs.getwriter(encoding)(f), char, newline, suffix, renumber)
+    finally:
+        f.close()
+
+def _merge(a, b, theirs, stream, char, newline, suffix, renumber):
+    out = _Output(stream, newline)
+    ours = _copy(a, out, char)
+    mapping = _mapping(ours, theirs, suffix, renumber)
+    _copy_remapped(b, out, mapping)
+    out.write(u'0 TRLR')
+    out.flush()
+    return mapping
+
+
+class _Output:
+    """ Buffered writer of lines """
+
+    def __init__(self, stream, newline):
+        self._stream = stream
+        self._newline = newline
+        self._lines = []
+
+    def write(self, line):
+        self._lines.append(line)
+        if len(self._lines) == 1000:
+            self.flush()
+
+    def flush(self):
+        if self._lines:
+            self._lines.append(u'')
+            self._stream.write(self._newline.join(self._lines))
+            self._lines = []
+
+
+def _records(file):
+    """ Iterate over (number, line, tag of the record the line belongs to) of a file """
+    f = open_input(file)
+    try:
+        record = None
+        number = 0
+        for line in decode_lines(f):
+            number += 1
+            if line[:2] == u'0 ' or line.lstrip()[:2] == u'0 ':
+                record = split_line(number, line)[2]
+            yield (number, line, record)
+    finally:
+        f.close()
+
+def _xrefs(file):
+    """ Return set of xrefs of records of a file """
+    xrefs = set()
+    for (number, line, record) in _records(file):
+        if u'@' in line:
+            p = split_line(number, line)[1]
+            if p:
+                xrefs.add(p)
+    return xrefs
+
+def _copy(file, out, char):
+    """ Write all records but the trailer of a file to out, return set of its xrefs
+
+    Unless char is None, CHAR line of the header is written (or
+    added at the end of the header) with char as its value. """
+    xrefs = set()
+    in_head = False
+    for (number, line, record) in _records(file):
+        if in_head and record != 'HEAD':
+            out.write(u'1 CHAR ' + char)
+            in_head = False
+        if record == 'TRLR':
+            continue
+        if u'@' in line:
+            p = split_line(number, line)[1]
+            if p:
+                xrefs.add(p)
+        elif record == 'HEAD' and char is not None:
+            (l, p, t, v) = split_line(number, line)
+            if l == 0:
+                in_head = True
+            elif l == 1 and t == 'CHAR':
+                line = u'1 CHAR ' + char
+                in_head = False
+        out.write(line)
+    if in_head:
+        out.write(u'1 CHAR ' + char)
+    return xrefs
+
+def _copy_remapped(file, out, mapping):
+    """ Write all records but the header and the trailer of a file to out, renaming xrefs """
+    for (number, line, record) in _records(file):
+        if record == 'HEAD' or record == 'TRLR':
+            continue
+        if mapping and u'@' in line:
+            (l, p, t, v) = split_line(number, line)
+            v = v.rstrip() if v[:1] == u'@' else v
+            if p in mapping or v in mapping:
+                line = u' '.join(x for x in (unicode(l), mapping.get(p, p), t, mapping.get(v, v)) if x)
+        out.write(line)
+
+def _mapping(ours, theirs, suffix, renumber):
+    """ Return dictionary of new xrefs of those xrefs in theirs which are also in ours """
+    used = ours | theirs
+    numbers = {}
+    if renumber:
+        for xref in used:
+            match = _NUMBERED.match(xref)
+            if match is not None:
+                (prefix, n) = match.groups()
+                numbers[prefix] = max(numbers.get(prefix, 0), int(n))
+
+    mapping = {}
+    for xref in sorted(theirs & ours, key = _order):
+        match = _NUMBERED.match(xref) if renumber else None
+        if match is not None:
+            prefix = match.group(1)
+            numbers[prefix] += 1
+            new = u'@%s%d@' % (prefix, numbers[prefix])
+        else:
+            new = u'@%s%s@' % (xref[1:-1], suffix)
+            n = 1
+            while new in used:
+                n += 1
+                new = u'@%s%s%d@' % (xref[1:-1], suffix, n)
+        used.add(new)
+        mapping[xref] = new
+    return mapping
+
+def _order(xref):
+    """ Sort key of xrefs: by prefix and number (@I2@ before @I10@) """
+    match = _NUMBERED.match(xref)
+    if match is None:
+        return (xref, -1)
+    return (match.group(1), int(match.group(2)))
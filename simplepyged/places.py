@@ -0,0 +1,230 @@
+#-*- coding: utf-8 -*-
+#
+# Gedcom 5.5 Parser
+#
+# Copyright (C) 2010 Nikola Škorić (nskoric [ at ] gmail.com)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# Please see the GPL license at http://www.gnu.org/licenses/gpl.txt
+#
+# To contact the author, see http://github.com/dijxtra/simplepyged
+
+""" Hierarchy of places of events
+
+A PLAC value lists jurisdictions from the smallest to the largest,
+separated by commas ('Salt Lake City, UT, USA'). Each value is split
+into its parts, and equal parts under the same parent are one Place
+(names are compared without regard to case and extra spaces), so that
+the places of a file make a tree with countries (or whatever comes
+last) at the top.
+
+Parts get names of jurisdictions from the FORM line under PLAC of
+the header ('City, County, State, Country'), or from a FORM line
+under the PLAC line itself. Parts are matched with the FORM from the
+right, so 'Ontario, Canada' is a State in a Country. Empty parts (as
+in ', , Ontario, Canada') keep their position but make no Place.
+
+Every event is indexed by its place and by all places above it, so
+that all events in a region are found without looking at any other
+event:
+
+.. code-block:: python
+
+    index = g.place_index()
+    for (record, event) in index.find('Ontario, Canada').events():
+        print record.name(), event.tag, event.place
+"""
+
+# Global imports
+from records import Individual, Family
+
+
+class Place:
+    """ A place in the hierarchy of places
+
+    * name - the name, as first seen in the file
+    * jurisdiction - name of the level from the FORM ('County'), or
+      None if it is not known
+    * parent - Place this one is part of (None for the top level)
+    """
+
+    def __init__(self, name, jurisdiction, parent):
+        self.name = name
+        self.jurisdiction = jurisdiction
+        self.parent = parent
+        self._children = {}
+        # (record, event) of events at this place only, and at this
+        # place or any place below it
+        self._here = []
+        self._events = []
+
+    def children(self):
+        """ Return list of places which are part of this one, sorted by name """
+        return sorted(self._children.values(), key = lambda p: _key(p.name))
+
+    def child(self, name):
+        """ Return place of given name which is part of this one, or None """
+        return self._children.get(_key(name))
+
+    def path(self):
+        """ Return list of places from the top level down to this one """
+        result = []
+        place = self
+        while place is not None:
+            result.append(place)
+            place = place.parent
+        result.reverse()
+        return result
+
+    def full_name(self):
+        """ Return names of this place and of places above it, as in a PLAC value """
+        return u', '.join(p.name for p in reversed(self.path()))
+
+    def events(self, subplaces = True):
+        """ Return list of (record, event) of events at this place
+
+        Unless subplaces is False, events at places which are part of
+        this one are included. Events come in the order in which they
+        were indexed. """
+        if subplaces:
+            return list(self._events)
+        return list(self._here)
+
+    def records(self, subplaces = True):
+        """ Return list of records with events at this place (see events()), each once """
+        seen = set()
+        result = []
+        for (record, event) in self.events(subplaces):
+            if id(record) not in seen:
+                seen.add(id(record))
+                result.append(record)
+        return result
+
+    def count(self, subplaces = True):
+        """ Return number of events at this place (see events()) """
+        if subplaces:
+            return len(self._events)
+        return len(self._here)
+
+    def __repr__(self):
+        return '<Place %s>' % self.full_name().encode('utf-8')
+
+
+class PlaceIndex:
+    """ Places of events of a tree, with events indexed by place
+
+    Built by Gedcom.place_index(), or from any records with events.
+    Events of individuals and families are indexed. Events without
+    place are left out.
+    """
+
+    def __init__(self, records = (), form = None):
+        """ Index events of records, with form the FORM of the header (a list of jurisdictions or a PLAC FORM value) """
+        self.form = _form(form)
+        self._top = {}
+        self._names = {}
+        self._places = 0
+        for record in records:
+            for event in _events(record):
+                self.add(record, event)
+
+    def add(self, record, event):
+        """ Index an event of a record; return its Place (None if the event has no place) """
+        if not event.place:
+            return None
+        form = self.form
+        forms = event.line.children_tags('PLAC')[0].children_tags('FORM')
+        if forms:
+            form = _form(forms[0].value())
+
+        parts = [u' '.join(p.split()) for p in event.place.split(u',')]
+        place = None
+        siblings = self._top
+        for (n, name) in enumerate(reversed(parts)):
+            if not name:
+                continue
+            key = _key(name)
+            child = siblings.get(key)
+            if child is None:
+                jurisdiction = form[-1 - n] if n < len(form) else None
+                child = siblings[key] = Place(name, jurisdiction, place)
+                self._names.setdefault(key, []).append(child)
+                self._places += 1
+            child._events.append((record, event))
+            place = child
+            siblings = child._children
+        if place is not None:
+            place._here.append((record, event))
+        return place
+
+    def top(self):
+        """ Return list of places at the top level, sorted by name """
+        return sorted(self._top.values(), key = lambda p: _key(p.name))
+
+    def find(self, place):
+        """ Return Place of a PLAC value ('Ontario, Canada'), or None if there is no such place """
+        siblings = self._top
+        result = None
+        for name in reversed(place.split(u',')):
+            name = u' '.join(name.split())
+            if not name:
+                continue
+            result = siblings.get(_key(name))
+            if result is None:
+                return None
+            siblings = result._children
+        return result
+
+    def named(self, name):
+        """ Return list of places (at any level) with given name """
+        return list(self._names.get(_key(name), ()))
+
+    def events_in(self, place):
+        """ Return list of (record, event) of events at a place or within it, given as a PLAC value """
+        found = self.find(place)
+        if found is None:
+            return []
+        return found.events()
+
+    def __len__(self):
+        """ Return number of places """
+        return self._places
+
+
+def header_form(header):
+    """ Return list of jurisdictions of the FORM under PLAC of a header record, or None """
+    for plac in header.children_tags('PLAC'):
+        for form in plac.children_tags('FORM'):
+            return _form(form.value())
+    return None
+
+def _form(form):
+    if form is None:
+        return []
+    if isinstance(form, basestring):
+        form = form.split(u',')
+    return [u' '.join(f.split()) or None for f in form]
+
+def _key(name):
+    return u' '.join(name.lower().split())
+
+def _events(record):
+    """ Return list of events of an individual or a family """
+    if isinstance(record, Individual):
+        return record.birth_events + record.death_events + record.other_events
+    if isinstance(record, Family):
+        return record.marriage_events + record.other_events
+    return []
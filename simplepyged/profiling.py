@@ -0,0 +1,141 @@
+#-*- coding: utf-8 -*-
+#
+# Gedcom 5.5 Parser
+#
+# Copyright (C) 2010 Nikola Škorić (nskoric [ at ] gmail.com)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# Please see the GPL license at http://www.gnu.org/licenses/gpl.txt
+#
+# To contact the author, see http://github.com/dijxtra/simplepyged
+
+""" Statistics of loading a GEDCOM file, see Gedcom(profile=True)
+
+Loading goes through these phases:
+
+* read - reading (and decompressing) the file
+* decode - decoding bytes into unicode and splitting them into lines
+* tokenize - splitting lines into level, xref, tag and value
+* build - creating Line objects and putting them into the tree
+* resolve - finding records pointed to by pointer lines
+* init - linking records with each other (Line._init())
+
+The first four are interleaved (the file is read in chunks), their
+times are summed up over the whole file.
+"""
+
+# Global imports
+import gc
+from timeit import default_timer as clock
+
+PHASES = ('read', 'decode', 'tokenize', 'build', 'resolve', 'init')
+
+
+class LoadStats:
+    """ Statistics of loading one file
+
+    * seconds - wall time of the whole load, without time spent
+      counting containers (see Phase)
+    * phases - dictionary of Phase objects, by name (see PHASES)
+    * lines - number of lines
+    * bytes - number of (decompressed) bytes read
+    * records - dictionary of number of records, by type ('Individual', 'Family', ...)
+    """
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.phases = dict((name, Phase(name)) for name in PHASES)
+        self.lines = 0
+        self.bytes = 0
+        self.records = {}
+
+    def as_dict(self):
+        """ Return statistics as a dictionary of plain values (for JSON or a metrics system) """
+        return {'seconds': self.seconds,
+                'lines': self.lines,
+                'bytes': self.bytes,
+                'records': dict(self.records),
+                'phases': dict((p.name, {'seconds': p.seconds, 'containers': p.containers})
+                               for p in self.phases.values())}
+
+    def report(self):
+        """ Return a human readable table of the statistics """
+        rows = ["%-10s %10s %7s %12s" % ('phase', 'seconds', '%', 'containers')]
+        for name in PHASES:
+            phase = self.phases[name]
+            share = 100.0 * phase.seconds / self.seconds if self.seconds else 0.0
+            containers = '' if phase.containers is None else str(phase.containers)
+            rows.append("%-10s %10.3f %7.1f %12s" % (name, phase.seconds, share, containers))
+        rows.append("%-10s %10.3f" % ('total', self.seconds))
+        rows.append("%d lines, %d bytes" % (self.lines, self.bytes))
+        rows.append(", ".join("%s: %d" % (t, n) for (t, n) in sorted(self.records.items())))
+        return "\n".join(rows)
+
+    def __str__(self):
+        return self.report()
+
+
+class Phase:
+    """ Time spent in a phase of loading
+
+    containers is the number of live containers tracked by the
+    garbage collector (lists, dictionaries, instances, ...) which
+    were created and kept during the phase. Strings and numbers are
+    not tracked, so they are not counted; neither Python 2 nor this
+    module has a cheap way of counting all allocations. It is counted
+    for whole passes over the data only, so phases read, decode and
+    tokenize have None and build gets the count for all four of them.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.containers = None
+
+
+def count_containers():
+    """ Return number of live containers tracked by the garbage collector
+
+    Garbage is collected first, so that only containers which are
+    kept are counted. """
+    gc.collect()
+    return len(gc.get_objects())
+
+
+class TimedReader:
+    """ Stream (see streams.Reader) which measures time spent reading from it """
+
+    def __init__(self, stream, stats):
+        self._stream = stream
+        self._phase = stats.phases['read']
+        self._stats = stats
+
+    def read(self, size = -1):
+        start = clock()
+        data = self._stream.read(size)
+        self._phase.seconds += clock() - start
+        self._stats.bytes += len(data)
+        return data
+
+    def read_chunk(self):
+        start = clock()
+        data = self._stream.read_chunk()
+        self._phase.seconds += clock() - start
+        self._stats.bytes += len(data)
+        return data
+
+    def close(self):
+        self._stream.close()
@@ -24,8 +24,66 @@
 
 # Global imports
 import string
+import hashlib
+from collections import deque
 from events import Event
 
+# GEDCOM 5.5 limit for length of a line, including the terminator
+MAX_LINE_LENGTH = 255
+
+# Tags of sub-lines whose order matters (preferred name first, children
+# and families in the order of birth and marriage); order of other
+# sub-lines does not change the content hash of a line
+ORDERED_TAGS = frozenset(['NAME', 'CHIL', 'FAMC', 'FAMS'])
+
+class RecordDict(dict):
+    """ Dictionary of records keyed by xref
+
+    Besides mapping xrefs to records, it keeps a list of all records
+    (including those without xref) in which position of a record is
+    its integer id (see Record.id()), and an index of pointers:
+    backlinks maps id of a record to the list of (id of record, line)
+    of lines whose values point to it, in the order of the file.
+
+    epoch is bumped whenever a linked record of the tree changes, so
+    that everything cached from links between its records is
+    resolved again. Other trees keep their caches.
+    """
+
+    def __init__(self):
+        dict.__init__(self)
+        self.records = []
+        self.backlinks = {}
+        self.epoch = 0
+
+    def referrers(self, record):
+        """ Return list of (record, line) of lines which point to record, in the order of the file """
+        records = self.records
+        return [(records[r], e) for (r, e) in self.backlinks.get(record._id, ())]
+
+    def add_pointers(self, record, line):
+        """ Index pointers of line and its sub-lines, which were added to record
+
+        Lines whose values point to records of this dictionary get
+        ids of these records (see Line.ref()). Pointers are indexed
+        after the other pointers of record, which is the order of the
+        file as long as lines are added at the end of records. """
+        lines = [line]
+        for e in lines:
+            lines.extend(e._children_lines)
+            v = e._value
+            if v[:1] == '@' and v[-1:] == '@' and len(v) > 2 and ' ' not in v:
+                target = self.get(v)
+                if target is None:
+                    continue
+                e._ref = target._id
+                refs = self.backlinks.setdefault(e._ref, [])
+                i = len(refs)
+                while i > 0 and refs[i - 1][0] > record._id:
+                    i -= 1
+                refs.insert(i, (record._id, e))
+
+
 class Line:
     """ Line of a GEDCOM file
 
@@ -52,6 +110,14 @@ class Line:
 
     """
 
+    # Integer id of the record pointed to by value of this line. Set
+    # by the Gedcom parser for pointer lines only.
+    _ref = None
+
+    # Lines of a Gedcom loaded with keep_parent_links=False have no
+    # parent line of their own
+    _parent_line = None
+
     def __init__(self,level,xref,tag,value,dict):
         """ Initialize a line.  You must include a level, xref,
         tag, value, and global line dictionary.  Normally initialized
@@ -65,7 +131,6 @@ class Line:
         self._dict = dict
         # structuring
         self._children_lines = []
-        self._parent_line = None
 
     def _init(self):
         """ A method which GEDCOM parser runs after all lines are available. Subclasses should implement this method if they want to work with other Lines at parse time, but after all Lines are parsed. """
@@ -94,6 +159,14 @@ class Line:
         """ Return the value of this line """
         return self._value
 
+    def ref(self):
+        """ Return integer id of the record the value of this line points to
+
+        Returns None if the value is not a pointer or if it points to
+        a record which does not exist.
+        """
+        return self._ref
+
     def children_lines(self):
         """ Return the child lines of this line """
         return self._children_lines
@@ -103,13 +176,101 @@ class Line:
         return self._parent_line
 
     def add_child(self,line):
-        """ Add a child line to this line """
+        """ Add a child line to this line
+
+        Pointers in line and its sub-lines are indexed (see
+        RecordDict.add_pointers()) if the record this line belongs
+        to is known, that is if this line is a record or parent
+        links are kept (see Gedcom). """
+        if isinstance(self._children_lines, tuple):
+            raise TypeError("Lines of a frozen Gedcom can not be changed")
         self.children_lines().append(line)
+        record = self._record()
+        if getattr(record, '_id', None) is not None:
+            self._dict.add_pointers(record, line)
+        self._changed()
+
+    def _record(self):
+        """ Return the record this line belongs to, or None if it is not known """
+        line = self
+        while line is not None and line._level != 0:
+            line = line._parent_line
+        return line
         
     def add_parent_line(self,line):
         """ Add a parent line to this line """
         self._parent_line = line
 
+    def _changed(self):
+        """ Called when lines are added below this line. Passes the news up to the record this line belongs to. """
+        if self._parent_line is not None:
+            self._parent_line._changed()
+
+    def _freeze(self, strings):
+        """ Make this line read-only (see Gedcom.freeze())
+
+        Equal tags, xrefs and pointers of all lines are replaced by
+        one shared string, taken from dictionary strings. """
+        self._children_lines = tuple(self._children_lines)
+        self._tag = strings.setdefault(self._tag, self._tag)
+        if self._xref:
+            self._xref = strings.setdefault(self._xref, self._xref)
+        if self._ref is not None:
+            self._value = strings.setdefault(self._value, self._value)
+
+    def full_value(self):
+        """ Return the value of this line joined with values of its CONC and CONT lines """
+        value = self._value
+        for c in self._children_lines:
+            if c._tag == 'CONC':
+                value += c._value
+            elif c._tag == 'CONT':
+                value += u'\n' + c._value
+        return value
+
+    def content_hash(self):
+        """ Return a hash (hexadecimal string) of the content of this line and its sub-lines
+
+        The hash covers tags and values, with values of CONC and CONT
+        lines joined to the values of their lines (see full_value()),
+        so a long value hashes the same however it was split. Xref of
+        the line itself is not covered, but pointers to other records
+        are. Order of sub-lines matters only for tags in ORDERED_TAGS.
+        The hash is the same in every process and on every platform.
+        """
+        return self._digest().encode('hex')
+
+    def _digest(self, digests = None):
+        """ Return binary SHA-1 digest of this line (see content_hash())
+
+        The digest is made of the tag and value of this line and the
+        digests of its sub-lines, so each line is hashed once. If
+        digests is a dictionary, digests of this line and all of its
+        sub-lines are stored in it by id() of the line. """
+        digest = hashlib.sha1(self._canonical(digests)).digest()
+        if digests is not None:
+            digests[id(self)] = digest
+        return digest
+
+    def _canonical(self, digests):
+        """ Return bytes hashed by _digest(): tag, value and digests of sub-lines """
+        value = self._value
+        ordered = []
+        unordered = []
+        for c in self._children_lines:
+            tag = c._tag
+            if tag == 'CONC':
+                value += c._value
+            elif tag == 'CONT':
+                value += u'\n' + c._value
+            elif tag in ORDERED_TAGS:
+                ordered.append(c._digest(digests))
+            else:
+                unordered.append(c._digest(digests))
+        unordered.sort()
+        head = u'%s\0%s\0%d\0' % (self._tag, value, len(ordered))
+        return head.encode('utf-8') + ''.join(ordered) + ''.join(unordered)
+
     def children_tags(self, tag):
         """ Returns list of child lines whos tag matches the argument. """
         lines = []
@@ -123,18 +284,95 @@ class Line:
         """ Returns list of records which are pointed by child lines with given tag. """
         lines = []
         for e in self.children_tags(tag):
-            try:
-                lines.append(self._dict[e.value()])
-            except KeyError:
-                pass
+            if e._ref is not None:
+                lines.append(self._dict.records[e._ref])
+            else:
+                # lines added after parsing are not resolved yet
+                record = self._dict.get(e.value())
+                if record is not None:
+                    lines.append(record)
 
         return lines
 
     def gedcom(self):
         """ Return GEDCOM code for this line and all of its sub-lines """
-        result = unicode(self)
-        for e in self.children_lines():
-            result += '\n' + e.gedcom()
+        return u'\n'.join(self._gedcom_lines(1))
+
+    def write_to(self, stream, newline = '\n'):
+        """ Write GEDCOM code for this line and all of its sub-lines to stream
+
+        Stream must accept unicode strings (for example a file opened
+        with io.open() in text mode). Each line is terminated with
+        newline. Values which do not fit into MAX_LINE_LENGTH, or
+        which contain line breaks, are written as CONC and CONT lines.
+        """
+        chunk = []
+        for text in self._gedcom_lines(len(newline)):
+            chunk.append(text)
+            if len(chunk) == 1000:
+                chunk.append(u'')
+                stream.write(newline.join(chunk))
+                chunk = []
+        if chunk:
+            chunk.append(u'')
+            stream.write(newline.join(chunk))
+
+    def _gedcom_lines(self, terminator, skip = None):
+        """ Iterate over GEDCOM lines (without terminators) of this line and all of its sub-lines
+
+        Sub-lines whose id() is in skip are left out, with their own
+        sub-lines. """
+        stack = [self]
+        while stack:
+            line = stack.pop()
+            for text in line._split(MAX_LINE_LENGTH - terminator):
+                yield text
+            if skip:
+                stack.extend(c for c in reversed(line._children_lines) if id(c) not in skip)
+            else:
+                stack.extend(reversed(line._children_lines))
+
+    def _split(self, limit):
+        """ Return GEDCOM code of this line split into lines not longer than limit
+
+        Line breaks in the value become CONT lines and the rest is
+        broken into CONC lines. A value is never split next to a
+        space, because some programs strip spaces at the end of lines.
+        """
+        head = unicode(self.level())
+        if self.xref() != "":
+            head += ' ' + self.xref()
+        head += ' ' + self.tag()
+        value = self.value()
+        if value == "":
+            return [head]
+        if len(head) + 1 + len(value) <= limit and '\n' not in value:
+            return [head + ' ' + value]
+
+        level = unicode(self.level() + 1)
+        result = []
+        for (n, part) in enumerate(value.split('\n')):
+            if n == 0:
+                prefix = head + ' '
+            else:
+                prefix = level + ' CONT '
+            while True:
+                room = limit - len(prefix)
+                if len(part) <= room:
+                    break
+                cut = room
+                while cut > 1 and (part[cut - 1] == ' ' or part[cut] == ' '):
+                    cut -= 1
+                if cut <= 1:
+                    cut = room
+                result.append(prefix + part[:cut])
+                part = part[cut:]
+                prefix = level + ' CONC '
+            if part == '':
+                result.append(prefix.rstrip(' '))
+            else:
+                result.append(prefix + part)
+
         return result
 
     def __str__(self):
@@ -154,6 +392,72 @@ class Record(Line):
     Child class of Line
 
     """
+
+    # Set by the Gedcom parser once _init() has been run for all records
+    _linked = False
+
+    # Integer id, set by the Gedcom parser
+    _id = None
+
+    # Set by Gedcom.freeze(); caches of frozen records are filled
+    # once and never written to again
+    _frozen = False
+
+    # Cached result of _digest(), cleared when the record changes
+    _content_digest = None
+
+    def id(self):
+        """ Return integer id of this record
+
+        Records are numbered from 0 in the order in which they appear
+        in the Gedcom file. See Gedcom.get_record().
+        """
+        return self._id
+
+    def referring_lines(self, tags = None):
+        """ Return list of lines whose values point to this record, in the order of the file
+
+        Lines anywhere in a record count, including those below
+        events (for example SOUR of a BIRT). If tags is given, only
+        lines with these tags are returned. """
+        return [e for (r, e) in self._dict.referrers(self) if tags is None or e._tag in tags]
+
+    def referring_records(self, tags = None):
+        """ Return list of records with lines which point to this record (see referring_lines()) """
+        result = []
+        for (r, e) in self._dict.referrers(self):
+            if (tags is None or e._tag in tags) and (not result or result[-1] is not r):
+                result.append(r)
+        return result
+
+    def _changed(self):
+        """ Implementing Line._changed()
+
+        Once the file is parsed, a change of a record means that its
+        links have to be initialised again, and that link caches of
+        the tree are stale (see RecordDict.epoch). """
+        if self._content_digest is not None:
+            self._content_digest = None
+        if self._linked:
+            self._init()
+            self._dict.epoch += 1
+
+    def _freeze(self, strings):
+        """ Implementing Line._freeze() """
+        Line._freeze(self, strings)
+        self._frozen = True
+
+    def _digest(self, digests = None):
+        """ Implementing Line._digest(), the digest is kept until the record changes
+
+        Frozen records are not written to, so their digest is computed
+        on each call. """
+        if self._content_digest is not None and digests is None:
+            return self._content_digest
+        digest = Line._digest(self, digests)
+        if not self._frozen:
+            self._content_digest = digest
+        return digest
     
     def _parse_generic_event_list(self, tag):
         """ Creates new event for each line with given tag"""
@@ -165,19 +469,33 @@ class Record(Line):
 
 
 class Multimedia(Record):
+    """ Multimedia object (OBJE record); records which use it are returned by referring_records() """
     pass
 
 
 class Note(Record):
+    """ Note (NOTE record); records which use it are returned by referring_records() """
     pass
 
 
 class Repository(Record):
-    pass
+    """ Repository (REPO record) """
+
+    def sources(self):
+        """ Return list of sources held by this repository """
+        return self.referring_records(['REPO'])
 
 
 class Source(Record):
-    pass
+    """ Source (SOUR record) """
+
+    def citing_lines(self):
+        """ Return list of SOUR lines which cite this source (see Record.referring_lines()) """
+        return self.referring_lines(['SOUR'])
+
+    def citing_records(self):
+        """ Return list of records (individuals, families, notes...) which cite this source """
+        return self.referring_records(['SOUR'])
 
 
 class Submission(Record):
@@ -202,6 +520,7 @@ class Individual(Record):
         """ Implementing Line._init() """
         self._parent_families = self.get_parent_families()
         self._families = self.get_families()
+        self._links_epoch = -1
 
         self.birth_events = self._parse_generic_event_list("BIRT")
         self.death_events = self._parse_generic_event_list("DEAT")
@@ -212,6 +531,21 @@ class Individual(Record):
                            "PROB", "WILL", "EVEN"]:
             self.other_events.extend(self._parse_generic_event_list(event_type))
 
+    def _freeze(self, strings):
+        """ Implementing Line._freeze(), fill all caches first """
+        self._links()
+        try:
+            self.marriage_years()
+        except ValueError:
+            # not cached, so every call raises again
+            pass
+        self._parent_families = tuple(self._parent_families)
+        self._families = tuple(self._families)
+        self.birth_events = tuple(self.birth_events)
+        self.death_events = tuple(self.death_events)
+        self.other_events = tuple(self.other_events)
+        Record._freeze(self, strings)
+
     def sex(self):
         """ Returns 'M' for males, 'F' for females, or None if not specified """
         try:
@@ -225,40 +559,61 @@ class Individual(Record):
     def families(self):
         return self._families
 
-    def father(self):
-        """Returns a father as an Individual object. If person has multiple fathers, returns a list of Individual objects. """
-        fathers = []
+    def _links(self):
+        """ Resolve links to relatives, unless they are already cached
 
+        Relatives are resolved on first use and kept as tuples until
+        some record of the same tree changes (see Record._changed()).
+        """
+        if self._frozen or self._links_epoch == self._dict.epoch:
+            return
+
+        fathers = []
+        mothers = []
+        parents = []
         for family in self.parent_families():
             if family.husband() != None:
                 fathers.append(family.husband())
+            if family.wife() != None:
+                mothers.append(family.wife())
+            parents.extend(family.parents())
+
+        children = []
+        marriages = []
+        for family in self.families():
+            children.extend(family.children())
+            marriages.extend(family.marriage_events)
+
+        self._fathers = tuple(fathers)
+        self._mothers = tuple(mothers)
+        self._parents = tuple(parents)
+        self._children = tuple(children)
+        self._marriages = tuple(marriages)
+        self._marriage_years = None
+        self._links_epoch = self._dict.epoch
 
-        if len(fathers) == 1:
-            return fathers[0]
+    def father(self):
+        """Returns a father as an Individual object. If person has multiple fathers, returns a tuple of Individual objects. """
+        self._links()
 
-        return fathers
+        if len(self._fathers) == 1:
+            return self._fathers[0]
 
-    def mother(self):
-        """Returns a mother as an Individual object. If person has multiple mothers, returns a list of Individual objects. """
-        mothers = []
+        return self._fathers
 
-        for family in self.parent_families():
-            if family.wife() != None:
-                mothers.append(family.wife())
+    def mother(self):
+        """Returns a mother as an Individual object. If person has multiple mothers, returns a tuple of Individual objects. """
+        self._links()
 
-        if len(mothers) == 1:
-            return mothers[0]
+        if len(self._mothers) == 1:
+            return self._mothers[0]
 
-        return mothers
+        return self._mothers
 
     def children(self):
-        retval = []
-
-        for f in self.families():
-            for c in f.children():
-                retval.append(c)
-
-        return retval
+        """ Return tuple of children of this Individual """
+        self._links()
+        return self._children
 
     def get_families(self):
         """ Return a list of all of the family records of a person. """
@@ -371,18 +726,13 @@ class Individual(Record):
         return not self.alive()
 
     def marriages(self):
-        """ Return a list of marriage events for a person.
+        """ Return a tuple of marriage events for a person.
         """
-        retval = []
-
-        for f in self.families():
-            for marr in f.marriage_events:
-                retval.append(marr)
-
-        return retval
+        self._links()
+        return self._marriages
 
     def marriage_years(self):
-        """ Return a list of marriage years for a person, each in integer
+        """ Return a tuple of marriage years for a person, each in integer
         format.
         """
         def ret_year(marr):
@@ -390,14 +740,53 @@ class Individual(Record):
                 return ''
             return int(marr.date.split(" ")[-1])
 
-        return map(ret_year, self.marriages())
+        self._links()
+        if self._marriage_years is None:
+            self._marriage_years = tuple(map(ret_year, self._marriages))
+
+        return self._marriage_years
 
     def parents(self):
-        """ Return list of parents of this Individual """
+        """ Return tuple of parents of this Individual """
+        self._links()
+        return self._parents
+
+    def iter_ancestors(self, depth = None):
+        """ Iterate over ancestors of this Individual
+
+        Yields tuples (ancestor, generation) in breadth first order,
+        where generation is 1 for parents, 2 for grandparents and so
+        on. Each ancestor is yielded only once, even if they can be
+        reached through several lines (pedigree collapse). If depth is
+        given, ancestors more than depth generations away from the
+        individual are not visited.
+        """
+        return self._iter_relatives(Individual.parents, depth)
 
-        parent_pairs = map(lambda x: x.parents(), self.parent_families())
+    def iter_descendants(self, depth = None):
+        """ Iterate over descendants of this Individual
 
-        return [parent for parent_pair in parent_pairs for parent in parent_pair]   
+        Yields tuples (descendant, generation) in breadth first order,
+        where generation is 1 for children, 2 for grandchildren and so
+        on. See iter_ancestors().
+        """
+        return self._iter_relatives(Individual.children, depth)
+
+    def _iter_relatives(self, step, depth):
+        """ Breadth first walk which uses step to get next relatives of a person """
+        seen = set([self])
+        queue = deque([(self, 0)])
+
+        while queue:
+            (person, generation) = queue.popleft()
+            if depth is not None and generation >= depth:
+                continue
+            for relative in step(person):
+                if relative is None or relative in seen:
+                    continue
+                seen.add(relative)
+                yield (relative, generation + 1)
+                queue.append((relative, generation + 1))
 
     def common_ancestor(self, relative):
         """ Find a common ancestor with a relative """
@@ -410,8 +799,10 @@ class Individual(Record):
         
         me['new'] = [self]
         me['old'] = []
+        me['seen'] = set([self])
         him['new'] = [relative]
         him['old'] = []
+        him['seen'] = set([relative])
 
         while(me['new'] != [] or him['new'] != []): #loop until we have no new ancestors to compare
             for p in me['new']: #compare new ancestors of both me and him
@@ -431,7 +822,10 @@ class Individual(Record):
                 new = []
                 for p in l['new']: #find parents of all memebers of 'new'
                     new.extend(p.parents())
-                new = filter(lambda x: x is not None, new)
+                # people seen before are left out, so the loop ends
+                # even if somebody is their own ancestor
+                new = filter(lambda x: x is not None and x not in l['seen'], new)
+                l['seen'].update(new)
                 l['old'].extend(l['new']) #copy members of 'new' to 'old'
                 l['new'] = new #parents of 'new' members became themselves 'new'
 
@@ -478,6 +872,7 @@ class Individual(Record):
 
         distance = 0
         ancestor_list = [self]
+        seen = set(ancestor_list)
 
         while ancestor_list != []:
             if ancestor in ancestor_list:
@@ -485,9 +880,10 @@ class Individual(Record):
 
             new_list = []
             for a in ancestor_list:
-                new_list.extend(a.parents())
-                if None in new_list:
-                    new_list.remove(None)
+                for p in a.parents():
+                    if p is not None and p not in seen:
+                        seen.add(p)
+                        new_list.append(p)
 
             ancestor_list = new_list
 
@@ -498,26 +894,53 @@ class Individual(Record):
     @staticmethod
     def down_path(ancestor, descendant, distance = None):
         """ Return path between ancestor and descendant (do not go deeper than distance depth) """
+        if distance is None:
+            visited = set()
+        else:
+            visited = None
 
-        if distance is not None:
-            if distance <= 0:
-                return None
+        return Individual._down_path(ancestor, descendant, distance, visited)
 
-        if ancestor.children() == []:
-            return None
-        
-        if descendant in ancestor.children():
-            return [ancestor]
+    @staticmethod
+    def _down_path(ancestor, descendant, distance, visited):
+        """ Implementation of down_path()
+
+        Depth first search with an explicit stack (of iterators over
+        children of people on the path), so long lineages do not hit
+        the recursion limit. A person already on the path from the top
+        ancestor is never followed again, so a cycle in a corrupted
+        file ends the search. Without a distance limit every person
+        needs to be searched only once, so they are also remembered in
+        visited.
+        """
+        path = []
+        on_path = set()
+        stack = [iter([ancestor])]
+
+        while stack:
+            person = next(stack[-1], None)
+            if person is None:
+                stack.pop()
+                if path:
+                    on_path.discard(path.pop())
+                continue
+            if person in on_path or (visited is not None and person in visited):
+                continue
+            if distance is not None and distance - len(path) <= 0:
+                continue
+
+            children = person.children()
+            if not children:
+                continue
+            if descendant in children:
+                return path + [person]
+
+            path.append(person)
+            on_path.add(person)
+            if visited is not None:
+                visited.add(person)
+            stack.append(iter(children))
 
-        for c in ancestor.children():
-            if distance is None:
-                path = ancestor.down_path(c, descendant)
-            else:
-                path = ancestor.down_path(c, descendant, distance - 1)
-            if path is not None:
-                path.insert(0, ancestor)
-                return path
-    
         return None
 
     def path_to_relative(self, relative):
@@ -614,6 +1037,13 @@ class Family(Record):
                            "MARC", "MARL", "MARS", "EVEN"]:
             self.other_events.extend(self._parse_generic_event_list(event_type))
 
+    def _freeze(self, strings):
+        """ Implementing Line._freeze() """
+        self._children = tuple(self._children)
+        self.marriage_events = tuple(self.marriage_events)
+        self.other_events = tuple(self.other_events)
+        Record._freeze(self, strings)
+
     def husband(self):
         """ Return husband this family """
         return self._husband
@@ -653,3 +1083,54 @@ class Family(Record):
             return True
 
         return False
+
+
+class _Raw:
+    """ Mixin for lines which were skipped by the parser (see Gedcom(keep_skipped=True))
+
+    Level, xref, tag and value of the line itself are known, but its
+    sub-lines were not parsed: the whole subtree is kept as the text
+    which was read, and written out unchanged.
+    """
+
+    def raw(self):
+        """ Return text of this line and all of its sub-lines, as it was read """
+        return self._raw
+
+    def _split(self, limit):
+        """ Implementing Line._split(), the text is written as it was read """
+        return self._raw.split(u'\n')
+
+    def _canonical(self, digests):
+        """ Implementing Line._canonical(), the text is hashed as it was read """
+        return (u'\3' + self._raw).encode('utf-8')
+
+
+class RawLine(_Raw, Line):
+    """ Line whose sub-lines were not parsed """
+
+    def __init__(self,level,xref,tag,value,dict,raw):
+        Line.__init__(self,level,xref,tag,value,dict)
+        self._raw = raw
+
+
+class RawRecord(_Raw, Record):
+    """ Record whose lines were not parsed """
+
+    def __init__(self,level,xref,tag,value,dict,raw):
+        Record.__init__(self,level,xref,tag,value,dict)
+        self._raw = raw
+
+
+# Classes of records, by tag of the record. Records with other tags
+# are of class Record.
+RECORD_CLASSES = {
+    'INDI': Individual,
+    'FAM': Family,
+    'OBJE': Multimedia,
+    'NOTE': Note,
+    'REPO': Repository,
+    'SOUR': Source,
+    'SUBN': Submission,
+    'SUBM': Submitter,
+    }
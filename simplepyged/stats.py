@@ -0,0 +1,333 @@
+#-*- coding: utf-8 -*-
+#
+# Gedcom 5.5 Parser
+#
+# Copyright (C) 2010 Nikola Škorić (nskoric [ at ] gmail.com)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# Please see the GPL license at http://www.gnu.org/licenses/gpl.txt
+#
+# To contact the author, see http://github.com/dijxtra/simplepyged
+
+""" Aggregate statistics of a tree, computed in one pass
+
+Every individual is read once into a row of plain values (see
+individual_row()), and every family into a row of its own; all
+aggregates are then fed from these rows, so asking for more of them
+costs little more than asking for one.
+
+Aggregates keep only counts and sums, so two of them made from
+different parts of a tree can be merged. With processes other than
+1, parts of the tree are aggregated in a pool of processes and merged
+afterwards. Workers get the tree by fork(), so this works where
+multiprocessing forks (not on Windows); freeze() the tree first to
+keep its memory shared (see Gedcom.freeze()).
+
+.. code-block:: python
+
+    result = statistics(g, ['sex', 'births', Lifespans(width = 5)])
+    print result['sex']['ratio'], result['lifespans']['mean']
+"""
+
+# Global imports
+from multiprocessing import Pool
+
+# Aggregates computed when none are given
+DEFAULT = ('surnames', 'sex', 'lifespans', 'births', 'children', 'missing')
+
+# Individuals or families aggregated by one task of the process pool
+CHUNK = 5000
+
+
+class Aggregate:
+    """ Base class of aggregates
+
+    Subclasses count rows of individuals (individual()) and of
+    families (family()), and merge counts of another aggregate of the
+    same kind (merge()). Result is a plain dictionary.
+    """
+
+    name = None
+
+    def individual(self, row):
+        pass
+
+    def family(self, row):
+        pass
+
+    def merge(self, other):
+        pass
+
+    def result(self):
+        return {}
+
+    def empty(self):
+        """ Return a new aggregate of this kind with the same options and nothing counted """
+        return self.__class__()
+
+
+class Surnames(Aggregate):
+    """ Number of individuals by surname ('' for no surname) """
+
+    name = 'surnames'
+
+    def __init__(self):
+        self.counts = {}
+
+    def individual(self, row):
+        surname = row[0] or u''
+        self.counts[surname] = self.counts.get(surname, 0) + 1
+
+    def merge(self, other):
+        _add(self.counts, other.counts)
+
+    def result(self):
+        return dict(self.counts)
+
+
+class Sex(Aggregate):
+    """ Number of individuals by sex ('M', 'F' and None), and ratio of males to females """
+
+    name = 'sex'
+
+    def __init__(self):
+        self.counts = {'M': 0, 'F': 0, None: 0}
+
+    def individual(self, row):
+        sex = row[2] if row[2] in ('M', 'F') else None
+        self.counts[sex] += 1
+
+    def merge(self, other):
+        _add(self.counts, other.counts)
+
+    def result(self):
+        result = dict(self.counts)
+        result['ratio'] = float(result['M']) / result['F'] if result['F'] else None
+        return result
+
+
+class Lifespans(Aggregate):
+    """ Ages at death, of individuals with known years of birth and death
+
+    Result has histogram (number of individuals by age, in buckets of
+    width years), count and mean.
+    """
+
+    name = 'lifespans'
+
+    def __init__(self, width = 10):
+        self.width = width
+        self.histogram = {}
+        self.count = 0
+        self.total = 0
+
+    def empty(self):
+        return Lifespans(self.width)
+
+    def individual(self, row):
+        (birth, death) = (row[3], row[4])
+        if birth is None or death is None or death < birth:
+            return
+        bucket = (death - birth) // self.width * self.width
+        self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+        self.count += 1
+        self.total += death - birth
+
+    def merge(self, other):
+        _add(self.histogram, other.histogram)
+        self.count += other.count
+        self.total += other.total
+
+    def result(self):
+        return {'histogram': dict(self.histogram),
+                'count': self.count,
+                'mean': float(self.total) / self.count if self.count else None}
+
+
+class Births(Aggregate):
+    """ Number of births by decade (or by periods of width years), by the first year of the period """
+
+    name = 'births'
+
+    def __init__(self, width = 10):
+        self.width = width
+        self.counts = {}
+
+    def empty(self):
+        return Births(self.width)
+
+    def individual(self, row):
+        if row[3] is not None:
+            period = row[3] // self.width * self.width
+            self.counts[period] = self.counts.get(period, 0) + 1
+
+    def merge(self, other):
+        _add(self.counts, other.counts)
+
+    def result(self):
+        return dict(self.counts)
+
+
+class Children(Aggregate):
+    """ Number of families by number of children """
+
+    name = 'children'
+
+    def __init__(self):
+        self.counts = {}
+
+    def family(self, row):
+        self.counts[row[0]] = self.counts.get(row[0], 0) + 1
+
+    def merge(self, other):
+        _add(self.counts, other.counts)
+
+    def result(self):
+        return dict(self.counts)
+
+
+class Missing(Aggregate):
+    """ Share of individuals without name, sex, birth year, birth place or parents
+
+    Death year is counted as missing only for deceased individuals.
+    Result has counts and rates (between 0 and 1) by field, and the
+    number of individuals.
+    """
+
+    name = 'missing'
+
+    FIELDS = ('name', 'sex', 'birth_year', 'birth_place', 'death_year', 'parents')
+
+    def __init__(self):
+        self.counts = dict((f, 0) for f in self.FIELDS)
+        self.total = 0
+
+    def individual(self, row):
+        (surname, given, sex, birth, death, place, deceased, parents) = row
+        counts = self.counts
+        self.total += 1
+        if not surname and not given:
+            counts['name'] += 1
+        if sex not in ('M', 'F'):
+            counts['sex'] += 1
+        if birth is None:
+            counts['birth_year'] += 1
+        if not place:
+            counts['birth_place'] += 1
+        if deceased and death is None:
+            counts['death_year'] += 1
+        if not parents:
+            counts['parents'] += 1
+
+    def merge(self, other):
+        _add(self.counts, other.counts)
+        self.total += other.total
+
+    def result(self):
+        return {'counts': dict(self.counts),
+                'rates': dict((f, float(n) / self.total if self.total else 0.0)
+                              for (f, n) in self.counts.items()),
+                'total': self.total}
+
+
+AGGREGATES = dict((c.name, c) for c in (Surnames, Sex, Lifespans, Births, Children, Missing))
+
+
+def statistics(tree, aggregates = DEFAULT, processes = 1):
+    """ Return dictionary of results of aggregates, by name, over individuals and families of a tree
+
+    Tree is a Gedcom (or anything with individual_list() and
+    family_list()). Aggregates are names (see AGGREGATES) or
+    Aggregate objects. With processes other than 1, parts of the
+    tree are aggregated by a pool of that many processes (None for
+    one process per CPU).
+    """
+    aggregates = [AGGREGATES[a]() if isinstance(a, basestring) else a for a in aggregates]
+    individuals = tree.individual_list()
+    families = tree.family_list()
+
+    if processes == 1:
+        aggregate(aggregates, individuals, families)
+    else:
+        global _tree
+        _tree = (individuals, families, aggregates)
+        pool = Pool(processes)
+        try:
+            tasks = [('individuals', n) for n in xrange(0, len(individuals), CHUNK)]
+            tasks += [('families', n) for n in xrange(0, len(families), CHUNK)]
+            for parts in pool.imap_unordered(_aggregate_chunk, tasks):
+                for (a, part) in zip(aggregates, parts):
+                    a.merge(part)
+        finally:
+            pool.close()
+            pool.join()
+            _tree = None
+
+    return dict((a.name, a.result()) for a in aggregates)
+
+def aggregate(aggregates, individuals = (), families = ()):
+    """ Feed rows of individuals and families into aggregates, in one pass over each """
+    feeds = [a.individual for a in aggregates if _overrides(a, 'individual')]
+    for i in individuals:
+        row = individual_row(i)
+        for feed in feeds:
+            feed(row)
+
+    feeds = [a.family for a in aggregates if _overrides(a, 'family')]
+    for f in families:
+        row = family_row(f)
+        for feed in feeds:
+            feed(row)
+
+def individual_row(individual):
+    """ Return values of an individual which aggregates use, as a tuple
+
+    (surname, given name, sex, birth year, death year, birth place,
+    deceased, has parents); unknown years are None. """
+    (given, surname) = individual.name()
+    birth = individual.birth()
+    year = individual.birth_year()
+    death = individual.death_year()
+    return (surname, given, individual.sex(), year if year != -1 else None,
+            death if death != -1 else None, birth and birth.place,
+            individual.deceased(), bool(individual.parent_families()))
+
+def family_row(family):
+    """ Return values of a family which aggregates use, as a tuple: (number of children,) """
+    return (len(family.children()),)
+
+
+def _add(counts, other):
+    for (key, n) in other.items():
+        counts[key] = counts.get(key, 0) + n
+
+def _overrides(aggregate, method):
+    """ Return True if class of aggregate has its own implementation of method """
+    return getattr(aggregate.__class__, method).im_func is not getattr(Aggregate, method).im_func
+
+# Individuals, families and aggregates of statistics() in processes of the pool
+_tree = None
+
+def _aggregate_chunk(task):
+    """ Return fresh copies of aggregates fed with one chunk of the tree """
+    (kind, start) = task
+    (individuals, families, aggregates) = _tree
+    parts = [a.empty() for a in aggregates]
+    if kind == 'individuals':
+        aggregate(parts, individuals[start:start + CHUNK])
+    else:
+        aggregate(parts, (), families[start:start + CHUNK])
+    return parts
@@ -0,0 +1,371 @@
+#-*- coding: utf-8 -*-
+#
+# Gedcom 5.5 Parser
+#
+# Copyright (C) 2010 Nikola Škorić (nskoric [ at ] gmail.com)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# Please see the GPL license at http://www.gnu.org/licenses/gpl.txt
+#
+# To contact the author, see http://github.com/dijxtra/simplepyged
+
+""" Opening and decoding of (possibly compressed) GEDCOM files
+
+Files compressed with gzip, bzip2 or xz are recognised by their first
+bytes when reading, and by their extension when writing. Data is
+decompressed and compressed in chunks, so a decompressed copy of a
+file is never stored on disk or held in memory as a whole.
+
+xz needs the lzma module (part of Python 3, or backports.lzma).
+
+Character encoding of a file is taken from its byte order mark or,
+if there is none, from CHAR line of its header. Data is decoded in
+chunks with an incremental decoder and split into lines afterwards.
+"""
+
+# Global imports
+import io
+import re
+import zlib
+import bz2
+import codecs
+import ansel
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+# Size of chunks read from files
+CHUNK_SIZE = 64 * 1024
+
+
+def _gzip_decompressor():
+    return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+def _gzip_compressor():
+    return zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+def _bz2_decompressor():
+    return bz2.BZ2Decompressor()
+
+def _bz2_compressor():
+    return bz2.BZ2Compressor()
+
+def _xz_decompressor():
+    _need_lzma()
+    return lzma.LZMADecompressor()
+
+def _xz_compressor():
+    _need_lzma()
+    return lzma.LZMACompressor()
+
+def _need_lzma():
+    if lzma is None:
+        raise ImportError("xz compressed files need the lzma module (or backports.lzma)")
+
+
+# name: (magic bytes, extensions, decompressor factory, compressor factory)
+COMPRESSIONS = {
+    'gzip': ('\x1f\x8b', ('.gz', '.gzip'), _gzip_decompressor, _gzip_compressor),
+    'bz2': ('BZh', ('.bz2',), _bz2_decompressor, _bz2_compressor),
+    'xz': ('\xfd7zXZ\x00', ('.xz',), _xz_decompressor, _xz_compressor),
+    }
+
+
+def compression_of_name(path):
+    """ Return name of compression used by a file with given path (judging by its extension), or None """
+    lower = path.lower()
+    for (name, (magic, extensions, d, c)) in COMPRESSIONS.items():
+        if lower.endswith(extensions):
+            return name
+    return None
+
+def compression_of_data(head):
+    """ Return name of compression used by data starting with head, or None """
+    for (name, (magic, extensions, d, c)) in COMPRESSIONS.items():
+        if head.startswith(magic):
+            return name
+    return None
+
+
+# Python codecs for values of HEAD.CHAR. ASCII files are read as UTF-8
+# (which is a superset of ASCII), so mislabelled files still work.
+CHARACTER_SETS = {
+    'ANSEL': 'ansel',
+    'UTF-8': 'utf-8',
+    'UTF8': 'utf-8',
+    'UNICODE': 'utf-8',
+    'ASCII': 'utf-8',
+    'ANSI': 'cp1252',
+    'IBMPC': 'cp437',
+    'MACINTOSH': 'mac-roman',
+    'LATIN1': 'latin-1',
+    'ISO-8859-1': 'latin-1',
+    }
+
+# Values of HEAD.CHAR for codecs (by codecs.lookup() name) files are written in
+CHARACTER_SET_NAMES = {
+    'utf-8': 'UTF-8',
+    'utf-16': 'UNICODE',
+    'utf-16-le': 'UNICODE',
+    'utf-16-be': 'UNICODE',
+    'ascii': 'ASCII',
+    'ansel': 'ANSEL',
+    'cp1252': 'ANSI',
+    'cp437': 'IBMPC',
+    'mac-roman': 'MACINTOSH',
+    'iso8859-1': 'LATIN1',
+    }
+
+# byte order mark: codec
+BYTE_ORDER_MARKS = [
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF16_LE, 'utf-16-le'),
+    (codecs.BOM_UTF16_BE, 'utf-16-be'),
+    ]
+
+_CHAR = re.compile(r'^[ \t]*1[ \t]+CHAR[ \t]+([^\r\n]+)', re.M)
+_HEAD_END = re.compile(r'[\r\n][ \t]*0[ \t]')
+_NEWLINE = re.compile(u'\r\n|\n\r|\r|\n')
+
+
+def detect_encoding(head):
+    """ Return (codec, length of byte order mark) for a file starting with head """
+    for (bom, codec) in BYTE_ORDER_MARKS:
+        if head.startswith(bom):
+            return (codec, len(bom))
+
+    # UTF-16 without byte order mark, level of the first line gives it away
+    if head[:2] == '0\x00':
+        return ('utf-16-le', 0)
+    if head[:2] == '\x000':
+        return ('utf-16-be', 0)
+
+    end = _HEAD_END.search(head)
+    if end is not None:
+        head = head[:end.start()]
+    char = _CHAR.search(head)
+    if char is None:
+        return ('utf-8', 0)
+
+    return (CHARACTER_SETS.get(char.group(1).strip().upper(), 'utf-8'), 0)
+
+def character_set(encoding):
+    """ Return value of HEAD.CHAR for a file written in encoding
+
+    Raises ValueError if GEDCOM has no name for the encoding. """
+    try:
+        name = codecs.lookup(encoding).name
+    except LookupError:
+        name = None
+    if name not in CHARACTER_SET_NAMES:
+        raise ValueError("No GEDCOM character set for encoding %r" % encoding)
+    return CHARACTER_SET_NAMES[name]
+
+def decode_lines(stream, encoding = None):
+    """ Iterate over lines of a binary stream opened by open_input()
+
+    Lines are unicode strings without terminators (CR, LF, CR LF or
+    LF CR). If encoding is None, it is detected by detect_encoding().
+    """
+    data = stream.read(CHUNK_SIZE)
+    if encoding is None:
+        (encoding, bom) = detect_encoding(data)
+        data = data[bom:]
+    decoder = codecs.getincrementaldecoder(encoding)()
+
+    rest = u''
+    while data:
+        text = rest + decoder.decode(data)
+        # terminators at the end may be the first half of CR LF, so
+        # they are kept together with the last line until more arrives
+        cut = len(text.rstrip(u'\r\n'))
+        lines = _NEWLINE.split(text[:cut])
+        rest = lines.pop() + text[cut:]
+        for line in lines:
+            yield line
+        data = stream.read_chunk()
+
+    lines = _NEWLINE.split(rest + decoder.decode('', True))
+    if lines[-1] == u'':
+        lines.pop()
+    for line in lines:
+        yield line
+
+
+class Reader:
+    """ Binary stream which reads from another stream
+
+    Data already read from the underlying stream (while looking for
+    compression magic) is passed in head. If decompressor is given,
+    data is decompressed on the fly. Concatenated compressed streams
+    (as made by 'cat a.gz b.gz') are read one after another.
+    """
+
+    def __init__(self, raw, head = '', decompressor = None, close_raw = False):
+        self._raw = raw
+        self._pending = head
+        self._factory = decompressor
+        self._close_raw = close_raw
+        self._buffer = ''
+        if decompressor is not None:
+            self._decompressor = decompressor()
+
+    def _fill(self):
+        """ Return next chunk of (decompressed) data, or '' at the end """
+        while True:
+            if self._pending:
+                data = self._pending
+                self._pending = ''
+            else:
+                data = self._raw.read(CHUNK_SIZE)
+            if self._factory is None:
+                return data
+            if not data:
+                if hasattr(self._decompressor, 'flush'):
+                    return self._decompressor.flush()
+                return ''
+            out = self._decompressor.decompress(data)
+            rest = self._decompressor.unused_data
+            if rest:
+                # data after the end of a compressed stream is the
+                # start of the next one
+                self._pending = rest
+                self._decompressor = self._factory()
+            if out:
+                return out
+
+    def read(self, size = -1):
+        """ Read at most size bytes (everything if size is negative) """
+        chunks = [self._buffer]
+        length = len(self._buffer)
+        while size < 0 or length < size:
+            data = self._fill()
+            if not data:
+                break
+            chunks.append(data)
+            length += len(data)
+        data = ''.join(chunks)
+        if size < 0:
+            self._buffer = ''
+            return data
+        self._buffer = data[size:]
+        return data[:size]
+
+    def read_chunk(self):
+        """ Read next chunk of data of any size, or '' at the end """
+        if self._buffer:
+            data = self._buffer
+            self._buffer = ''
+            return data
+        return self._fill()
+
+    def __iter__(self):
+        """ Iterate over lines (ending with '\\n') """
+        rest = ''
+        while True:
+            data = self.read_chunk()
+            if not data:
+                break
+            lines = (rest + data).split('\n')
+            rest = lines.pop()
+            for line in lines:
+                yield line + '\n'
+        if rest:
+            yield rest
+
+    def close(self):
+        if self._close_raw:
+            self._raw.close()
+
+
+class Writer:
+    """ Binary stream which compresses data written to it into another stream """
+
+    def __init__(self, raw, compressor, close_raw = False):
+        self._raw = raw
+        self._compressor = compressor()
+        self._close_raw = close_raw
+
+    def write(self, data):
+        out = self._compressor.compress(data)
+        if out:
+            self._raw.write(out)
+
+    def close(self):
+        """ Finish compressed stream (and close underlying stream, if it was opened here) """
+        self._raw.write(self._compressor.flush())
+        if self._close_raw:
+            self._raw.close()
+        else:
+            self._raw.flush()
+
+
+def open_input(file):
+    """ Return a binary stream with (decompressed) contents of file
+
+    File can be a path or a binary stream. Use close() of returned
+    stream when done; streams passed in are not closed.
+    """
+    if hasattr(file, 'read'):
+        raw = file
+        close_raw = False
+    else:
+        raw = io.open(file, 'rb')
+        close_raw = True
+
+    head = raw.read(8)
+    compression = compression_of_data(head)
+    if compression is None:
+        return Reader(raw, head, None, close_raw)
+
+    return Reader(raw, head, COMPRESSIONS[compression][2], close_raw)
+
+def open_output(file, compression = None):
+    """ Return a binary stream which writes (compressed) data to file
+
+    File can be a path or a binary stream. For paths, compression is
+    guessed from the extension unless given ('gzip', 'bz2' or 'xz').
+    Use close() of returned stream when done; streams passed in are
+    flushed, but not closed.
+    """
+    if hasattr(file, 'write'):
+        raw = file
+        close_raw = False
+    else:
+        if compression is None:
+            compression = compression_of_name(file)
+        raw = io.open(file, 'wb')
+        close_raw = True
+
+    if compression is None:
+        return Writer(raw, _Identity, close_raw)
+
+    return Writer(raw, COMPRESSIONS[compression][3], close_raw)
+
+
+class _Identity:
+    """ Compressor which does not compress """
+
+    def compress(self, data):
+        return data
+
+    def flush(self):
+        return ''
@@ -0,0 +1,365 @@
+#-*- coding: utf-8 -*-
+#
+# Gedcom 5.5 Parser
+#
+# Copyright (C) 2010 Nikola Škorić (nskoric [ at ] gmail.com)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# Please see the GPL license at http://www.gnu.org/licenses/gpl.txt
+#
+# To contact the author, see http://github.com/dijxtra/simplepyged
+
+""" Generator of synthetic GEDCOM files, for testing and benchmarks
+
+The same arguments (including seed) always give the same file. The
+tree grows generation by generation from a number of founding
+individuals: people marry outsiders (or, for pedigree collapse,
+somebody of their own generation), have children and sometimes marry
+again. Records are written as soon as they are complete and only one
+generation is kept in memory, so files with millions of individuals
+can be generated.
+
+.. code-block:: python
+
+    synthetic.write('big.ged.gz', individuals = 1000000)
+"""
+
+# Global imports
+import random
+from streams import open_output
+from records import MAX_LINE_LENGTH
+
+# Share of individuals who marry at all
+MARRIAGE_RATE = 0.85
+
+# Year in which founders are born, and the year of "today"
+START_YEAR = 1500
+END_YEAR = 2020
+
+DATE_FORMATS = ('exact', 'year', 'about', 'before', 'range')
+
+MONTHS = ('JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN',
+          'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC')
+
+MALE_NAMES = ('John', 'William', 'James', 'George', 'Charles', 'Thomas',
+              'Henry', 'Joseph', 'Samuel', 'David', 'Robert', 'Edward',
+              'Nikola', 'Ivan', 'Marko', 'Josip', 'Pierre', 'Jean')
+FEMALE_NAMES = ('Mary', 'Elizabeth', 'Sarah', 'Margaret', 'Anna', 'Jane',
+                'Emma', 'Alice', 'Catherine', 'Martha', 'Lucy', 'Ruth',
+                'Ana', 'Marija', 'Ivana', 'Marie', u'Zoë', u'Renée')
+SURNAMES = ('Smith', 'Wright', 'McIntyre', 'Merriman', 'Hern', 'Taylor',
+            'Brown', 'Wilson', 'Walker', 'Green', 'Baker', 'Turner',
+            u'Škorić', 'Horvat', u'Kovačević', 'Martin', u'Müller', 'Dubois')
+PLACES = ('London, England', 'Glasgow, Scotland', 'Dublin, Ireland',
+          'Boston, Massachusetts, USA', 'Zagreb, Croatia', 'Paris, France',
+          'Ohio, USA', 'Ontario, Canada', u'Köln, Germany')
+WORDS = ('lived', 'in', 'the', 'old', 'house', 'by', 'river', 'and',
+         'worked', 'as', 'a', 'farmer', 'smith', 'teacher', 'for', 'many',
+         'years', 'moved', 'to', 'town', 'after', 'war')
+
+
+def write(file, individuals = 1000, generations = 8, fertility = 2.5,
+          remarriage = 0.1, collapse = 0.02, notes = 0.1, sources = 0.2,
+          date_formats = DATE_FORMATS, duplicates = 0.0, seed = 0, compression = None):
+    """ Write a synthetic GEDCOM file with given number of individuals
+
+    File can be a path or a binary stream (see streams.open_output()).
+
+    * generations - number of generations the tree should span; more
+      are added if the population dies out before it is big enough
+    * fertility - average number of children of a family
+    * remarriage - probability that a married person marries again
+    * collapse - probability that a person marries somebody of his own
+      generation (often a relative) instead of an outsider
+    * notes - probability that an individual has a (long) note
+    * sources - probability that an event cites a source
+    * date_formats - formats of dates, chosen at random: 'exact'
+      (12 MAR 1850), 'year' (1850), 'about' (ABT 1850), 'before'
+      (BEF 1850) and 'range' (BET 1848 AND 1850)
+    * duplicates - probability that an individual is written once
+      more, as a separate record (with xref @D...@) with typos in the
+      name and a slightly different birth, as if merged from another
+      file; the copy points to the original with a _DUPL line, which
+      can be used to check duplicate detection (see dedup.py). Copies
+      do not count towards the number of individuals.
+    """
+    f = open_output(file, compression)
+    try:
+        generator = _Generator(f, individuals, generations, fertility,
+                               remarriage, collapse, notes, sources,
+                               date_formats, duplicates, seed)
+        generator.run()
+    finally:
+        f.close()
+
+
+class _Generator:
+    """ State of write() """
+
+    def __init__(self, stream, individuals, generations, fertility, remarriage,
+                 collapse, notes, sources, date_formats, duplicates, seed):
+        self._stream = stream
+        self._target = individuals
+        self._generations = max(1, generations)
+        self._fertility = fertility
+        self._remarriage = remarriage
+        self._collapse = collapse
+        self._notes = notes
+        self._sources = sources
+        self._date_formats = tuple(date_formats)
+        self._duplicates = duplicates
+        self._copies = 0
+        self._random = random.Random(seed)
+        self._individuals = 0
+        self._families = 0
+        self._source_count = max(1, individuals // 100)
+        self._buffer = []
+
+    def run(self):
+        self._out(u'0 HEAD', u'1 SOUR SIMPLEPYGED', u'2 NAME synthetic',
+                  u'1 GEDC', u'2 VERS 5.5', u'2 FORM LINEAGE-LINKED', u'1 CHAR UTF-8')
+        for n in xrange(1, self._source_count + 1):
+            self._out(u'0 @S%d@ SOUR' % n, u'1 TITL Parish register %d' % n)
+
+        generation = []
+        depth = 0
+        while self._individuals < self._target:
+            if not generation:
+                generation = [self._person(None, None, START_YEAR + depth * 30)
+                              for n in xrange(self._founders())]
+            generation = self._next(generation)
+            depth += 1
+
+        # last generation does not marry
+        for person in generation:
+            self._individual(person, ())
+
+        self._out(u'0 TRLR')
+        self._flush()
+
+    def _founders(self):
+        """ Number of founders which fills the requested generations """
+        size = 1.0
+        total = 0.0
+        for n in xrange(self._generations):
+            total += size * (1 + MARRIAGE_RATE * (1 + self._remarriage))
+            size *= MARRIAGE_RATE * (1 + self._remarriage) * self._fertility
+        missing = self._target - self._individuals
+        return max(1, min(missing, int(missing / total) + 1))
+
+    def _person(self, surname, famc, born):
+        """ Return a new person (number, sex, surname, birth year, famc) """
+        if self._individuals >= self._target:
+            return None
+        self._individuals += 1
+        sex = self._random.choice('MF')
+        if surname is None:
+            surname = self._random.choice(SURNAMES)
+        return (self._individuals, sex, surname, born, famc)
+
+    def _next(self, generation):
+        """ Marry a generation off and return their children """
+        rand = self._random
+        children = []
+        spouses = {}
+        for person in generation:
+            if person is None:
+                continue
+            if person[0] in spouses or rand.random() >= MARRIAGE_RATE:
+                continue
+
+            marriages = 1
+            while rand.random() < self._remarriage and marriages < 4:
+                marriages += 1
+            for m in xrange(marriages):
+                partner = None
+                if rand.random() < self._collapse:
+                    partner = self._relative(person, generation, spouses)
+                if partner is None:
+                    partner = self._person(None, None, person[3] + rand.randint(-5, 5))
+                    if partner is None:
+                        break
+                    self._individual(partner, (self._families + 1,))
+                family = self._family(person, partner, children)
+                spouses.setdefault(person[0], []).append(family)
+                if partner[0] in spouses:
+                    spouses.setdefault(partner[0], []).append(family)
+
+        for person in generation:
+            if person is not None:
+                self._individual(person, spouses.get(person[0], ()))
+        return children
+
+    def _relative(self, person, generation, spouses):
+        """ Pick a spouse from the same generation (pedigree collapse) """
+        for n in xrange(5):
+            partner = self._random.choice(generation)
+            if partner is None or partner[0] == person[0] or partner[0] in spouses:
+                continue
+            # siblings do not marry
+            if partner[4] is not None and partner[4] == person[4]:
+                continue
+            spouses[partner[0]] = []
+            return partner
+        return None
+
+    def _family(self, person, partner, children):
+        """ Write a family of two people, add their children to children and return number of family """
+        rand = self._random
+        self._families += 1
+        number = self._families
+        if person[1] == 'M':
+            (husband, wife) = (person, partner)
+        else:
+            (husband, wife) = (partner, person)
+
+        lines = [u'0 @F%d@ FAM' % number,
+                 u'1 HUSB @I%d@' % husband[0],
+                 u'1 WIFE @I%d@' % wife[0]]
+        married = max(husband[3], wife[3]) + rand.randint(18, 35)
+        if married < END_YEAR:
+            lines.append(u'1 MARR')
+            self._event(lines, married)
+
+        count = int(rand.random() * 2 * self._fertility + 0.5)
+        for n in xrange(count):
+            born = married + rand.randint(1, 20)
+            if born >= END_YEAR:
+                break
+            child = self._person(husband[2], number, born)
+            if child is None:
+                break
+            children.append(child)
+            lines.append(u'1 CHIL @I%d@' % child[0])
+
+        self._out(*lines)
+        return number
+
+    def _individual(self, person, families):
+        """ Write an individual record """
+        rand = self._random
+        (number, sex, surname, born, famc) = person
+        if sex == 'M':
+            given = rand.choice(MALE_NAMES)
+        else:
+            given = rand.choice(FEMALE_NAMES)
+
+        lines = [u'0 @I%d@ INDI' % number,
+                 u'1 NAME %s /%s/' % (given, surname),
+                 u'2 GIVN %s' % given,
+                 u'2 SURN %s' % surname,
+                 u'1 SEX %s' % sex,
+                 u'1 BIRT']
+        self._event(lines, born)
+        died = born + rand.randint(0, 95)
+        if died < END_YEAR:
+            lines.append(u'1 DEAT')
+            self._event(lines, died)
+        if famc is not None:
+            lines.append(u'1 FAMC @F%d@' % famc)
+        for family in families:
+            lines.append(u'1 FAMS @F%d@' % family)
+        if rand.random() < self._notes:
+            self._note(lines)
+        self._out(*lines)
+        # no random numbers are drawn unless asked for, so that files
+        # without duplicates stay the same
+        if self._duplicates and rand.random() < self._duplicates:
+            self._duplicate(person, given)
+
+    def _note(self, lines):
+        """ Add a NOTE of random words to lines, broken into CONT and CONC lines
+
+        No line is longer than GEDCOM allows, and values are never
+        split next to a space (as Gedcom.write() does it). """
+        rand = self._random
+        paragraphs = [u' '.join(rand.choice(WORDS) for n in xrange(rand.randint(5, 80)))]
+        for n in xrange(rand.randint(0, 3)):
+            paragraphs.append(u' '.join(rand.choice(WORDS) for n in xrange(rand.randint(5, 30))))
+
+        # the terminator counts too
+        limit = MAX_LINE_LENGTH - 1
+        for (n, text) in enumerate(paragraphs):
+            prefix = u'1 NOTE ' if n == 0 else u'2 CONT '
+            while len(prefix) + len(text) > limit:
+                # words are short, so a cut which is not next to a
+                # space is always near
+                cut = limit - len(prefix)
+                while text[cut - 1] == u' ' or text[cut] == u' ':
+                    cut -= 1
+                lines.append(prefix + text[:cut])
+                text = text[cut:]
+                prefix = u'2 CONC '
+            lines.append(prefix + text)
+
+    def _duplicate(self, person, given):
+        """ Write a copy of an individual record, with some errors """
+        rand = self._random
+        (number, sex, surname, born, famc) = person
+        self._copies += 1
+        lines = [u'0 @D%d@ INDI' % self._copies,
+                 u'1 NAME %s /%s/' % (self._typo(given), self._typo(surname)),
+                 u'1 SEX %s' % sex,
+                 u'1 BIRT']
+        self._event(lines, born + rand.choice((-1, 0, 0, 0, 1)))
+        if famc is not None:
+            lines.append(u'1 FAMC @F%d@' % famc)
+        lines.append(u'1 _DUPL @I%d@' % number)
+        self._out(*lines)
+
+    def _typo(self, name):
+        """ Return name, sometimes with a letter left out, doubled or swapped """
+        rand = self._random
+        if len(name) < 4 or rand.random() < 0.5:
+            return name
+        n = rand.randint(1, len(name) - 2)
+        kind = rand.randint(0, 2)
+        if kind == 0:
+            return name[:n] + name[n + 1:]
+        elif kind == 1:
+            return name[:n] + name[n] + name[n:]
+        return name[:n] + name[n + 1] + name[n] + name[n + 2:]
+
+    def _event(self, lines, year):
+        """ Add DATE, PLAC and SOUR lines of an event which happened in year """
+        rand = self._random
+        lines.append(u'2 DATE ' + self._date(year))
+        lines.append(u'2 PLAC ' + rand.choice(PLACES))
+        if rand.random() < self._sources:
+            lines.append(u'2 SOUR @S%d@' % rand.randint(1, self._source_count))
+
+    def _date(self, year):
+        form = self._random.choice(self._date_formats)
+        if form == 'exact':
+            return u'%d %s %d' % (self._random.randint(1, 28), self._random.choice(MONTHS), year)
+        elif form == 'about':
+            return u'ABT %d' % year
+        elif form == 'before':
+            return u'BEF %d' % year
+        elif form == 'range':
+            return u'BET %d AND %d' % (year - 2, year)
+        return u'%d' % year
+
+    def _out(self, *lines):
+        self._buffer.extend(lines)
+        if len(self._buffer) > 10000:
+            self._flush()
+
+    def _flush(self):
+        if self._buffer:
+            self._buffer.append(u'')
+            self._stream.write(u'\n'.join(self._buffer).encode('utf-8'))
+            self._buffer = []
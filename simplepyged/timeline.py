@@ -0,0 +1,227 @@
+#-*- coding: utf-8 -*-
+#
+# Gedcom 5.5 Parser
+#
+# Copyright (C) 2010 Nikola Škorić (nskoric [ at ] gmail.com)
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# Please see the GPL license at http://www.gnu.org/licenses/gpl.txt
+#
+# To contact the author, see http://github.com/dijxtra/simplepyged
+
+""" Events of all individuals and families in the order of their dates
+
+Dates are turned into integer keys YYYYMMDD (a missing day or month
+is 0, so '1850' comes before '3 MAR 1850'). Qualifiers such as ABT,
+BEF or EST are ignored, and of a range ('BET 1850 AND 1855', 'FROM
+1850 TO 1855') only the first date counts.
+
+Keys of all events, and of events of each tag, are kept as sorted
+arrays, so that events in a period are found by bisection, and
+counted without looking at the events at all:
+
+.. code-block:: python
+
+    timeline = g.timeline()
+    for (key, record, event) in timeline.events(1850, 1860):
+        print key, event.tag, record.xref()
+    print timeline.count(1850, 1860, 'BURI')
+    print timeline.histogram(1800, 1899, 10, 'BIRT')
+"""
+
+# Global imports
+from array import array
+from bisect import bisect_left, bisect_right
+from heapq import merge
+from places import _events
+
+MONTHS = {'JAN': 1, 'FEB': 2, 'MAR': 3, 'APR': 4, 'MAY': 5, 'JUN': 6,
+          'JUL': 7, 'AUG': 8, 'SEP': 9, 'OCT': 10, 'NOV': 11, 'DEC': 12}
+
+# Words of a date which say how exact it is, and not when
+QUALIFIERS = frozenset(['ABT', 'CAL', 'EST', 'BEF', 'AFT', 'INT', 'BET', 'FROM'])
+
+
+def date_range(date):
+    """ Return (first, last) date keys of days a GEDCOM date can mean, or None if it has no year
+
+    For '1850' that is (18500000, 18501231), for 'MAR 1850'
+    (18500300, 18500331) and for '3 MAR 1850' (18500303, 18500303).
+    """
+    if not date:
+        return None
+    words = []
+    for word in date.upper().split():
+        if word.startswith('(') or (word in ('AND', 'TO') and words):
+            break
+        if word not in QUALIFIERS:
+            words.append(word)
+    if not words:
+        return None
+
+    try:
+        # dual years, such as 1750/51, count as the first one
+        year = int(words[-1].split('/')[0])
+    except ValueError:
+        return None
+    month = MONTHS.get(words[-2], 0) if len(words) >= 2 else 0
+    day = 0
+    if month and len(words) >= 3 and words[-3].isdigit():
+        day = int(words[-3])
+
+    first = year * 10000 + month * 100 + day
+    if day:
+        return (first, first)
+    if month:
+        return (first, first + 31)
+    return (first, first + 1231)
+
+def date_key(date):
+    """ Return the date key of a GEDCOM date (see date_range()), or None if it has no year """
+    bounds = date_range(date)
+    if bounds is None:
+        return None
+    return bounds[0]
+
+
+class Timeline:
+    """ Events of records, sorted by date
+
+    Built by Gedcom.timeline(), or from any individuals and families.
+    Events without a date (or with a date which has no year) are kept
+    apart, see undated().
+
+    Periods are given by start and end, each a year (an integer) or
+    a GEDCOM date, both included: events(1850, 1860) is everything
+    from 1 JAN 1850 up to 31 DEC 1860. Start or end can be None, for
+    no limit. Tags can be a tag ('BURI') or a list of tags.
+    """
+
+    def __init__(self, records = ()):
+        rows = []
+        self._undated = []
+        for record in records:
+            for event in _events(record):
+                key = date_key(event.date)
+                if key is None:
+                    self._undated.append((record, event))
+                else:
+                    rows.append((key, len(rows), record, event))
+        rows.sort()
+
+        self._keys = array('l', (row[0] for row in rows))
+        self._records = [row[2] for row in rows]
+        self._events = [row[3] for row in rows]
+        # by tag, (keys, positions in the arrays of all events)
+        tags = {}
+        for (n, event) in enumerate(self._events):
+            tags.setdefault(event.tag, []).append(n)
+        keys = self._keys
+        self._tags = dict((tag, (array('l', (keys[n] for n in positions)), array('l', positions)))
+                          for (tag, positions) in tags.items())
+
+    def __len__(self):
+        """ Return number of dated events """
+        return len(self._keys)
+
+    def tags(self):
+        """ Return sorted list of tags of dated events """
+        return sorted(self._tags)
+
+    def events(self, start = None, end = None, tags = None):
+        """ Iterate over (date key, record, event) of events in a period, in the order of dates
+
+        Events with the same key come in the order of records. """
+        records = self._records
+        events = self._events
+        for (key, n) in self._positions(start, end, tags):
+            yield (key, records[n], events[n])
+
+    def count(self, start = None, end = None, tags = None):
+        """ Return number of events in a period """
+        (low, high) = _bounds(start, end)
+        total = 0
+        for (keys, positions) in self._columns(tags):
+            total += bisect_right(keys, high) - bisect_left(keys, low)
+        return total
+
+    def histogram(self, start, end, step = 1, tags = None):
+        """ Return list of (year, number of events) for periods of step years from start up to end
+
+        Start and end are years. """
+        result = []
+        for year in xrange(start, end + 1, step):
+            result.append((year, self.count(year, min(year + step - 1, end), tags)))
+        return result
+
+    def first(self, tags = None):
+        """ Return (date key, record, event) of the earliest event, or None if there are no events """
+        for item in self.events(tags = tags):
+            return item
+        return None
+
+    def undated(self):
+        """ Return list of (record, event) of events without a date """
+        return list(self._undated)
+
+    def _columns(self, tags):
+        """ Return list of (keys, positions) of given tags, or of all events """
+        if tags is None:
+            return [(self._keys, None)]
+        if isinstance(tags, basestring):
+            tags = [tags]
+        return [self._tags[tag] for tag in tags if tag in self._tags]
+
+    def _positions(self, start, end, tags):
+        """ Iterate over (key, position) of events in a period, in the order of positions """
+        (low, high) = _bounds(start, end)
+        ranges = []
+        for (keys, positions) in self._columns(tags):
+            ranges.append(_range(keys, positions, bisect_left(keys, low), bisect_right(keys, high)))
+        if len(ranges) == 1:
+            return ranges[0]
+        return merge(*ranges)
+
+
+def _range(keys, positions, a, b):
+    """ Iterate over (key, position) of items a to b of a column """
+    for n in xrange(a, b):
+        if positions is None:
+            yield (keys[n], n)
+        else:
+            yield (keys[n], positions[n])
+
+def _bounds(start, end):
+    """ Return (low, high) date keys of a period """
+    if start is None:
+        low = -1 << 31
+    elif isinstance(start, (int, long)):
+        low = start * 10000
+    else:
+        low = _date_range(start)[0]
+    if end is None:
+        high = (1 << 31) - 1
+    elif isinstance(end, (int, long)):
+        high = end * 10000 + 1231
+    else:
+        high = _date_range(end)[1]
+    return (low, high)
+
+def _date_range(date):
+    bounds = date_range(date)
+    if bounds is None:
+        raise ValueError("Date without a year: %r" % date)
+    return bounds
@@ -27,5 +27,18 @@ class AllTagsTest(unittest.TestCase):
         uniq_events = set([e.tag for e in torture.other_events])
         self.assertEqual(len(uniq_events), 10)
 
+class AnselTest(AllTagsTest):
+    """Unit tests for simplepyged using the torture GED file in its original ANSEL encoding."""
+
+    def setUp(self):
+        self.g = Gedcom(os.path.abspath('test/TGC55CLF.ged'))
+
+    def test_characters(self):
+        """Check that ANSEL characters are decoded"""
+        utf8 = Gedcom(os.path.abspath('test/TGC55CLF.utf-8.ged'))
+        copr = [e.value() for e in self.g.line_list() if e.tag() == 'COPR']
+        self.assertTrue(utf8.line_list()[0].children_tags('COPR')[0].value() in copr)
+        self.assertTrue(any(e.value().startswith(u'     \u1ea2B\u0309C\u0309') for e in self.g.line_list()))
+
 if __name__ == '__main__':
     unittest.main()
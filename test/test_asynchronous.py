@@ -0,0 +1,154 @@
+import unittest
+import os
+import threading
+from gedcom import *
+from matches import *
+import asynchronous
+from asynchronous import AsyncGedcom, Future, ThreadExecutor, CancelledError
+
+
+class GatedExecutor(ThreadExecutor):
+    """ ThreadExecutor which counts submits and holds work back until opened """
+
+    def __init__(self):
+        ThreadExecutor.__init__(self, 2)
+        self.gate = threading.Event()
+        self.submitted = 0
+
+    def submit(self, function, *args):
+        self.submitted += 1
+        return ThreadExecutor.submit(self, self._gated, function, args)
+
+    def _gated(self, function, args):
+        self.gate.wait()
+        return function(*args)
+
+
+class ThreadTest(unittest.TestCase):
+    """Unit tests for asynchronous.py without an event loop, using mcintyre.ged."""
+
+    def setUp(self):
+        self.path = os.path.abspath('test/mcintyre.ged')
+        self.executor = ThreadExecutor()
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_open(self):
+        """ Testing opening a file in a thread """
+        gedcom = AsyncGedcom.open(self.path, executor=self.executor).result(10)
+        self.assertEqual(gedcom.get_individual('@P405366386@').name(), ('Mary Christine', 'Hern'))
+        self.assertEqual(len(gedcom.individual_list()), len(Gedcom(self.path).individual_list()))
+        self.assertRaises(TypeError, gedcom.individual_list()[0].add_child, None)
+
+        done = []
+        future = AsyncGedcom.open(self.path, executor=self.executor)
+        future.add_done_callback(done.append)
+        future.result(10)
+        self.assertEqual(done, [future])
+
+    def test_coalesce(self):
+        """ Testing that concurrent opens of a file share one parse """
+        executor = GatedExecutor()
+        try:
+            opens = [AsyncGedcom.open(self.path, executor=executor) for n in range(3)]
+            other = AsyncGedcom.open(self.path, encoding='utf-8', executor=executor)
+            self.assertEqual(executor.submitted, 2)
+
+            # cancelling one open leaves the shared parse alone
+            self.assertTrue(opens[2].cancel())
+            executor.gate.set()
+            results = [f.result(10) for f in opens[:2] + [other]]
+        finally:
+            executor.shutdown()
+
+        self.assertTrue(results[0].gedcom() is results[1].gedcom())
+        self.assertFalse(results[0].gedcom() is results[2].gedcom())
+        self.assertRaises(CancelledError, opens[2].result)
+        self.assertEqual(AsyncGedcom._opening, {})
+
+        again = AsyncGedcom.open(self.path, executor=self.executor).result(10)
+        self.assertFalse(again.gedcom() is results[0].gedcom())
+
+    def test_error(self):
+        """ Testing that parse errors are passed to the future """
+        future = AsyncGedcom.open(os.path.abspath('test/missing.ged'), executor=self.executor)
+        self.assertRaises(IOError, future.result, 10)
+        self.assertTrue(isinstance(future.exception(), IOError))
+
+    def test_match(self):
+        """ Testing matching queries run in threads """
+        gedcom = AsyncGedcom.open(self.path, executor=self.executor).result(10)
+        m = MatchList(gedcom.individual_list())
+
+        criteria = "surname=McIntyre:marriagerange=1820-1825"
+        futures = [gedcom.match(criteria) for n in range(8)]
+        for future in futures:
+            self.assertEqual(future.result(10), m.criteria_match(criteria))
+
+        self.assertEqual(gedcom.match_list().birth_year_match(1904).result(10), m.birth_year_match(1904))
+        self.assertEqual(gedcom.run(lambda g: len(g.family_list())).result(10), len(gedcom.family_list()))
+
+    def test_future(self):
+        """ Testing Future """
+        future = Future()
+        self.assertRaises(RuntimeError, future.result, 0.01)
+        self.assertTrue(future.set_running_or_notify_cancel())
+        self.assertFalse(future.cancel())
+        future.set_exception(ValueError('bad'))
+        self.assertRaises(ValueError, future.result)
+
+        future = Future()
+        self.assertTrue(future.cancel())
+        self.assertTrue(future.cancelled())
+        self.assertFalse(future.set_running_or_notify_cancel())
+
+
+@unittest.skipIf(asynchronous.asyncio is None, "needs asyncio or trollius")
+class McIntyreTest(unittest.TestCase):
+    """Unit tests for asynchronous.py using mcintyre.ged."""
+
+    def setUp(self):
+        self.path = os.path.abspath('test/mcintyre.ged')
+        self.loop = asynchronous.asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_open(self):
+        """ Testing opening a file in the executor """
+        gedcom = self.loop.run_until_complete(AsyncGedcom.open(self.path, loop=self.loop))
+        self.assertEqual(gedcom.get_individual('@P405366386@').name(), ('Mary Christine', 'Hern'))
+        self.assertEqual(len(gedcom.individual_list()), len(Gedcom(self.path).individual_list()))
+
+    def test_coalesce(self):
+        """ Testing that concurrent opens of a file share one parse """
+        opens = [AsyncGedcom.open(self.path, loop=self.loop) for n in range(3)]
+        other = AsyncGedcom.open(self.path, encoding='utf-8', loop=self.loop)
+        results = self.loop.run_until_complete(asynchronous.asyncio.gather(*(opens + [other])))
+        self.assertTrue(results[0].gedcom() is results[1].gedcom() is results[2].gedcom())
+        self.assertFalse(results[0].gedcom() is results[3].gedcom())
+        self.assertEqual(AsyncGedcom._opening, {})
+
+        again = self.loop.run_until_complete(AsyncGedcom.open(self.path, loop=self.loop))
+        self.assertFalse(again.gedcom() is results[0].gedcom())
+
+    def test_error(self):
+        """ Testing that parse errors are passed to the future """
+        future = AsyncGedcom.open(os.path.abspath('test/missing.ged'), loop=self.loop)
+        self.assertRaises(IOError, self.loop.run_until_complete, future)
+
+    def test_match(self):
+        """ Testing matching queries run in the executor """
+        gedcom = self.loop.run_until_complete(AsyncGedcom.open(self.path, loop=self.loop))
+        m = MatchList(gedcom.individual_list())
+
+        criteria = "surname=McIntyre:marriagerange=1820-1825"
+        result = self.loop.run_until_complete(gedcom.match(criteria))
+        self.assertEqual(result, m.criteria_match(criteria))
+
+        result = self.loop.run_until_complete(gedcom.match_list().birth_year_match(1904))
+        self.assertEqual(result, m.birth_year_match(1904))
+
+        count = self.loop.run_until_complete(gedcom.run(lambda g: len(g.family_list())))
+        self.assertEqual(count, len(gedcom.family_list()))
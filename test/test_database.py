@@ -0,0 +1,100 @@
+import unittest
+import os
+import tempfile
+import io
+from gedcom import *
+from matches import *
+from database import GedcomDB
+
+
+class McIntyreTest(unittest.TestCase):
+    """Unit tests for database.py using mcintyre.ged."""
+
+    def setUp(self):
+        self.g = Gedcom(os.path.abspath('test/mcintyre.ged'))
+        self.db = GedcomDB(':memory:', os.path.abspath('test/mcintyre.ged'))
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_trailing_spaces(self):
+        """ Trailing spaces of pointers and dates are dropped, as Gedcom does it """
+        db = GedcomDB(':memory:', io.BytesIO("0 @I1@ INDI \n1 NAME A /B/ \n1 FAMS @F1@ \n1 BIRT\n"
+                                             "2 DATE 1 JAN 1900 \n0 @F1@ FAM\n1 HUSB @I1@ \n0 TRLR\n"))
+        try:
+            i = db.get_individual('@I1@')
+            self.assertEqual([f.xref() for f in i.families()], ['@F1@'])
+            self.assertEqual(i.birth_year(), 1900)
+        finally:
+            db.close()
+
+    def test_corrupted(self):
+        """ Lines below a missing parent raise GedcomParseError """
+        self.assertRaises(GedcomParseError, GedcomDB, ':memory:', io.BytesIO("0 @I1@ INDI\n2 DATE 1900\n"))
+
+    def test_records(self):
+        """ Testing records read from the database """
+        self.assertEqual([i.xref() for i in self.db.individual_list()],
+                         [i.xref() for i in self.g.individual_list()])
+        self.assertEqual([f.xref() for f in self.db.family_list()],
+                         [f.xref() for f in self.g.family_list()])
+
+        for i in self.g.individual_list():
+            j = self.db.get_record(i.id())
+            self.assertEqual(j.xref(), i.xref())
+            self.assertEqual(j.gedcom(), i.gedcom())
+            self.assertEqual(j.name(), i.name())
+            self.assertEqual(j.birth_year(), i.birth_year())
+
+        self.assertEqual(self.db.get_record('@F1@').gedcom(), self.g.get_record('@F1@').gedcom())
+        self.assertEqual(self.db.get_individual('@F1@'), None)
+        self.assertEqual(self.db.get_individual('@NONE@'), None)
+
+    def test_referrers(self):
+        """ Testing pointers to a record, looked up in the database """
+        for f in self.g.family_list():
+            self.assertEqual([(r.xref(), e.tag()) for (r, e) in self.db.record_dict().referrers(self.db.get_record(f.xref()))],
+                             [(r.xref(), e.tag()) for (r, e) in self.g.record_dict().referrers(f)])
+
+    def test_lazy(self):
+        """ Testing that records are read only when used """
+        mary = self.db.get_individual('@P405366386@')
+        self.assertEqual(len(self.db._records), 1)
+        self.assertEqual(mary.type(), 'Individual')
+
+        self.assertEqual(mary.father().name(), ('Thomas Clyde', 'Hern'))
+        self.assertEqual(mary.mother().name(), self.g.get_individual('@P405366386@').mother().name())
+        self.assertTrue(len(self.db._records) < 10)
+
+        self.assertTrue(mary.father() is self.db.get_individual(mary.father().xref()))
+        self.assertEqual([c.xref() for c in mary.children()],
+                         [c.xref() for c in self.g.get_individual('@P405366386@').children()])
+
+    def test_match(self):
+        """ Testing matching queries evaluated by the database """
+        m = MatchList(self.g.individual_list())
+        for criteria in ["surname=McIntyre:birthrange=1820-1840:deathrange=1865-1870",
+                         "surname=McIntyre:birth=1890:death=1953",
+                         "surname=McIntyre:marriage=1821",
+                         "surname=McIntyre:marriagerange=1820-1825",
+                         "name=Archibald",
+                         "birth=1904:death=1979",
+                         "surname=Merriman"]:
+            self.assertEqual([i.xref() for i in self.db.match(criteria)],
+                             [i.xref() for i in m.criteria_match(criteria)])
+
+        self.assertEqual(self.db.match("surname"), [])
+        self.assertEqual(self.db.match("birth=unknown"), [])
+
+    def test_reopen(self):
+        """ Testing database stored in a file """
+        (fd, path) = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        try:
+            GedcomDB(path, os.path.abspath('test/mcintyre.ged')).close()
+            db = GedcomDB(path)
+            self.assertEqual(len(db.individual_list()), len(self.g.individual_list()))
+            self.assertEqual(db.get_individual('@P405366386@').name(), ('Mary Christine', 'Hern'))
+            db.close()
+        finally:
+            os.remove(path)
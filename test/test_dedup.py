@@ -0,0 +1,46 @@
+import unittest
+import io
+from gedcom import *
+import synthetic
+import dedup
+
+
+class DedupTest(unittest.TestCase):
+    """Unit tests for dedup.py on a synthetic tree with duplicates"""
+
+    def setUp(self):
+        out = io.BytesIO()
+        synthetic.write(out, individuals = 1000, duplicates = 0.1)
+        out.seek(0)
+        self.g = Gedcom(out)
+        self.duplicates = set()
+        for i in self.g.individual_list():
+            for e in i.children_tags('_DUPL'):
+                self.duplicates.add(frozenset((i.xref(), e.value())))
+
+    def test_similarity(self):
+        """Soundex and Jaro-Winkler give known values"""
+        self.assertEqual([dedup.soundex(n) for n in ('Robert', 'Rupert', 'Tymczak', 'Pfister', u'\u0160kori\u0107', '')],
+                         ['R163', 'R163', 'T522', 'P236', 'S620', ''])
+        self.assertAlmostEqual(dedup.jaro_winkler('martha', 'marhta'), 0.9611, 4)
+        self.assertAlmostEqual(dedup.jaro_winkler('dixon', 'dicksonx'), 0.8133, 4)
+        self.assertEqual(dedup.jaro_winkler('abc', 'xyz'), 0.0)
+
+    def test_find_duplicates(self):
+        """Most duplicates are found, best first, and only few pairs are compared"""
+        individuals = self.g.individual_list()
+        features = [dedup._features(i) for i in individuals]
+        pairs = dedup.candidates(features)
+        self.assertTrue(len(pairs) < len(individuals) ** 2 / 50)
+
+        result = dedup.find_duplicates(individuals, threshold = 0.8)
+        scores = [s for (s, a, b) in result]
+        self.assertEqual(scores, sorted(scores, reverse = True))
+        found = set(frozenset((a.xref(), b.xref())) for (s, a, b) in result)
+        self.assertTrue(len(found & self.duplicates) > 0.8 * len(self.duplicates))
+
+    def test_processes(self):
+        """A pool of processes gives the same result"""
+        individuals = self.g.individual_list()
+        self.assertEqual([(s, a.xref(), b.xref()) for (s, a, b) in dedup.find_duplicates(individuals)],
+                         [(s, a.xref(), b.xref()) for (s, a, b) in dedup.find_duplicates(individuals, processes = 2)])
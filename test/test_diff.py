@@ -0,0 +1,71 @@
+import unittest
+import os
+import io
+from gedcom import *
+from diff import diff
+
+
+class DiffTest(unittest.TestCase):
+    """Unit tests for diff.py using wright.ged"""
+
+    def setUp(self):
+        self.source = open('test/wright.ged', 'rb').read()
+        self.g = Gedcom(io.BytesIO(self.source))
+
+    def edited(self, edit):
+        records = self.source.split('\r\n0 ')
+        edit(records)
+        return Gedcom(io.BytesIO('\r\n0 '.join(records)))
+
+    def test_same(self):
+        """Equal files have no differences"""
+        self.assertEqual(diff(self.g, Gedcom(io.BytesIO(self.source))), [])
+
+    def test_records(self):
+        """Added, changed and removed records and their lines are found"""
+        def edit(records):
+            records[5] = records[5].replace('NAME Olive', 'NAME Olivia', 1)
+            records[5] = records[5].replace('1 SEX F\r\n', '', 1)
+            records[6] = records[6].replace('\r\n1 BIRT', '\r\n1 EVEN\r\n2 TYPE Test\r\n1 BIRT', 1)
+            del records[10]
+            records.insert(-1, '@I999@ INDI\r\n1 NAME Newly /Added/')
+
+        differences = diff(self.g, self.edited(edit))
+        self.assertEqual([(d.kind, d.path) for d in differences],
+                         [('changed', ('@I8@',)), ('changed', ('@I11@',)),
+                          ('added', ('@I999@',)), ('removed', ('@I21@',))])
+        self.assertEqual([(d.kind, d.path) for d in differences[0].lines],
+                         [('changed', ('@I8@', 'NAME')), ('removed', ('@I8@', 'SEX'))])
+        self.assertEqual(unicode(differences[0].lines[0]),
+                         u'~ @I8@ NAME Olive Saxeby /McGregor/ -> Olivia Saxeby /McGregor/')
+        self.assertEqual([unicode(d) for d in differences[1].lines], [u'+ @I11@ EVEN'])
+        self.assertEqual(differences[3].old.xref(), '@I21@')
+
+    def test_digests(self):
+        """Digests of a record and all of its lines are found in one pass"""
+        record = self.g.get_record('@I3@')
+        digests = {}
+        self.assertEqual(record._digest(digests).encode('hex'), record.content_hash())
+        # CONC and CONT lines are part of the value of their line
+        lines = [record]
+        for e in lines:
+            lines.extend(c for c in e.children_lines() if c.tag() not in ('CONC', 'CONT'))
+        self.assertEqual(sorted(digests), sorted(id(e) for e in lines))
+        for e in lines:
+            self.assertEqual(digests[id(e)].encode('hex'), e.content_hash())
+
+    def test_order(self):
+        """Order of sub-lines matters only for some tags"""
+        def sex_first(records):
+            records[5] = records[5].replace('1 SEX F\r\n', '', 1).replace('\r\n1 NAME', '\r\n1 SEX F\r\n1 NAME', 1)
+        self.assertEqual(diff(self.g, self.edited(sex_first)), [])
+
+        def names(records):
+            records[5] = records[5].replace('\r\n1 SEX', '\r\n1 NAME Second /Name/\r\n1 SEX', 1)
+        def swapped(records):
+            records[5] = records[5].replace('\r\n1 NAME', '\r\n1 NAME Second /Name/\r\n1 NAME', 1)
+        differences = diff(self.edited(names), self.edited(swapped))
+        self.assertEqual([(d.kind, d.path) for d in differences[0].lines], [('changed', ('@I8@',))])
+
+if __name__ == '__main__':
+    unittest.main()
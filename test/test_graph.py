@@ -0,0 +1,163 @@
+import unittest
+import os
+import tempfile
+import io
+from gedcom import *
+
+
+CYCLE = """0 HEAD
+0 @I1@ INDI
+1 NAME John /Smith/
+1 FAMS @F1@
+1 FAMC @F2@
+0 @I2@ INDI
+1 NAME Jack /Smith/
+1 FAMS @F2@
+1 FAMC @F1@
+0 @I3@ INDI
+1 NAME Jane /Smith/
+1 FAMC @F1@
+0 @F1@ FAM
+1 HUSB @I1@
+1 CHIL @I2@
+1 CHIL @I3@
+0 @F2@ FAM
+1 HUSB @I2@
+1 CHIL @I1@
+0 TRLR
+"""
+
+
+class McIntyreTest(unittest.TestCase):
+    """Unit tests for graph.py using mcintyre.ged."""
+
+    def setUp(self):
+        self.g = Gedcom(os.path.abspath('test/mcintyre.ged'))
+        self.graph = self.g.family_graph()
+
+    def test_round_trip(self):
+        """Neighbours in the graph are the same as parents() and children()"""
+        self.assertEqual(len(self.graph), len(self.g.individual_list()))
+
+        for (n, person) in enumerate(self.g.individual_list()):
+            self.assertEqual(self.graph.index_of(person.xref()), n)
+            self.assertEqual(self.graph.xref_of(n), person.xref())
+
+            parents = [self.graph.xref_of(i) for i in self.graph.parents(n)]
+            self.assertEqual(parents, [p.xref() for p in person.parents() if p is not None])
+
+            children = [self.graph.xref_of(i) for i in self.graph.children(n)]
+            self.assertEqual(children, [c.xref() for c in person.children()])
+
+    def test_sweeps(self):
+        """Testing ancestor/descendant sweeps and generation numbering"""
+        mary = self.graph.index_of('@P405366386@')
+        chris = self.graph.index_of('@P405749335@')
+
+        self.assertTrue(mary in self.graph.ancestors(chris))
+        self.assertFalse(mary in self.graph.ancestors(chris, 2))
+        self.assertTrue(mary in self.graph.ancestors(chris, 3))
+        self.assertTrue(chris in self.graph.descendants(mary))
+        self.assertFalse(chris in self.graph.descendants(mary, 2))
+
+        generations = self.graph.generations()
+        self.assertFalse(-1 in generations)
+        for n in xrange(len(self.graph)):
+            for p in self.graph.parents(n):
+                self.assertTrue(generations[n] > generations[p])
+
+        stats = self.graph.statistics()
+        self.assertEqual(stats['individuals'], 41)
+        self.assertEqual(stats['parent_links'], stats['child_links'])
+
+
+class CycleTest(unittest.TestCase):
+    """Unit tests for traversals of a corrupted file in which a person is their own ancestor."""
+
+    def setUp(self):
+        (fd, self.path) = tempfile.mkstemp(suffix='.ged')
+        os.write(fd, CYCLE)
+        os.close(fd)
+        self.g = Gedcom(self.path)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_find_cycles(self):
+        """Cycle detector reports offending xrefs"""
+        cycles = self.g.find_cycles()
+        self.assertEqual(len(cycles), 1)
+        self.assertEqual(sorted(cycles[0]), ['@I1@', '@I2@'])
+        self.assertEqual(self.g.family_graph().generations()[0], -1)
+
+    def test_bounded_traversals(self):
+        """Traversals stop on cyclic input"""
+        john = self.g.get_individual('@I1@')
+        jack = self.g.get_individual('@I2@')
+        jane = self.g.get_individual('@I3@')
+
+        self.assertEqual(sorted(p.xref() for (p, g) in john.iter_ancestors()), ['@I2@'])
+        self.assertEqual(sorted(p.xref() for (p, g) in john.iter_descendants()), ['@I2@', '@I3@'])
+        self.assertEqual(jane.common_ancestor(self.g.get_individual('@I3@')), jane)
+        self.assertTrue(jane.common_ancestor(jack) in [john, jack])
+        self.assertEqual(jane.distance_to_ancestor(jack), 2)
+        self.assertEqual(jane.distance_to_ancestor(None), None)
+        self.assertEqual(Individual.down_path(jack, jane), [jack, john])
+        self.assertEqual(Individual.down_path(jack, jane, 5), [jack, john])
+        self.assertEqual(Individual.down_path(jane, jack), None)
+        self.assertTrue(jane.path_to_relative(jack) is not None)
+
+
+class DeepTest(unittest.TestCase):
+    """Unit tests for traversals of a lineage deeper than the recursion limit."""
+
+    GENERATIONS = 3000
+
+    def setUp(self):
+        lines = ['0 HEAD']
+        for n in range(self.GENERATIONS):
+            lines += ['0 @I%d@ INDI' % n, '1 NAME Gen%d /Deep/' % n]
+            if n > 0:
+                lines.append('1 FAMC @F%d@' % (n - 1))
+            if n < self.GENERATIONS - 1:
+                lines.append('1 FAMS @F%d@' % n)
+        for n in range(self.GENERATIONS - 1):
+            lines += ['0 @F%d@ FAM' % n, '1 HUSB @I%d@' % n, '1 CHIL @I%d@' % (n + 1)]
+        lines.append('0 TRLR')
+        self.g = Gedcom(io.BytesIO('\n'.join(lines) + '\n'))
+
+    def test_deep_traversals(self):
+        """Traversals of a long lineage do not recurse"""
+        top = self.g.get_individual('@I0@')
+        bottom = self.g.get_individual('@I%d@' % (self.GENERATIONS - 1))
+
+        path = Individual.down_path(top, bottom)
+        self.assertEqual(len(path), self.GENERATIONS - 1)
+        self.assertEqual(path[0], top)
+        self.assertEqual(Individual.down_path(top, bottom, self.GENERATIONS), path)
+        self.assertEqual(Individual.down_path(top, bottom, 10), None)
+        self.assertEqual(bottom.distance_to_ancestor(top), self.GENERATIONS - 1)
+        self.assertEqual(len(list(bottom.iter_ancestors())), self.GENERATIONS - 1)
+
+
+class WrightTest(unittest.TestCase):
+    """Unit tests for graph.py using wright.ged."""
+
+    def setUp(self):
+        self.g = Gedcom(os.path.abspath('test/wright.ged'))
+
+    def test_round_trip(self):
+        """Neighbours in the graph are the same as parents() and children()"""
+        graph = self.g.family_graph()
+
+        for (n, person) in enumerate(self.g.individual_list()):
+            self.assertEqual(map(graph.xref_of, graph.parents(n)), [p.xref() for p in person.parents() if p is not None])
+            self.assertEqual(map(graph.xref_of, graph.children(n)), [c.xref() for c in person.children()])
+
+    def test_find_cycles(self):
+        """A correct file has no cycles"""
+        self.assertEqual(self.g.find_cycles(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import io
+from gedcom import *
+from merge import merge
+
+
+class MergeTest(unittest.TestCase):
+    """Unit tests for merge.py using wright.ged and mcintyre.ged"""
+
+    def setUp(self):
+        self.source = open('test/wright.ged', 'rb').read()
+        self.g = Gedcom(io.BytesIO(self.source))
+
+    def merged(self, **options):
+        out = io.BytesIO()
+        mapping = merge(io.BytesIO(self.source), io.BytesIO(self.source), out, **options)
+        out.seek(0)
+        return (Gedcom(out), mapping)
+
+    def test_suffix(self):
+        """Records of a file merged with itself are linked like the original"""
+        (m, mapping) = self.merged()
+        self.assertEqual(len(m.individual_list()), 2 * len(self.g.individual_list()))
+        self.assertEqual(len(m.family_list()), 2 * len(self.g.family_list()))
+        self.assertEqual(mapping['@I3@'], '@I3_b@')
+        self.assertEqual(len(m.dangling_pointers()), 2 * len(self.g.dangling_pointers()))
+        self.assertEqual([e.tag() for e in m.line_list() if e.level() == 0].count('HEAD'), 1)
+
+        for i in self.g.individual_list():
+            copy = m.get_record(mapping[i.xref()])
+            self.assertEqual(copy.name(), i.name())
+            self.assertEqual(sorted(p.xref() for p in copy.parents() if p is not None),
+                             sorted(mapping[p.xref()] for p in i.parents() if p is not None))
+            self.assertEqual(sorted(f.xref() for f in copy.families()),
+                             sorted(mapping[f.xref()] for f in i.families()))
+
+    def test_renumber(self):
+        """Renumbered xrefs continue after the highest number"""
+        (m, mapping) = self.merged(renumber = True)
+        numbers = [int(x[2:-1]) for x in self.g.record_dict() if x.startswith('@I')]
+        self.assertEqual(mapping['@I0@'], '@I%d@' % (max(numbers) + 1))
+        self.assertEqual(len(set(mapping.values())), len(mapping))
+        self.assertEqual(len(m.individual_list()), 2 * len(self.g.individual_list()))
+
+    def test_paths(self):
+        """Only common xrefs are renamed"""
+        out = io.BytesIO()
+        mapping = merge('test/wright.ged', 'test/mcintyre.ged', out)
+        other = Gedcom('test/mcintyre.ged')
+        self.assertEqual(sorted(mapping), sorted(x for x in other.record_dict() if x in self.g.record_dict()))
+        out.seek(0)
+        m = Gedcom(out)
+        self.assertEqual(len(m.individual_list()), len(self.g.individual_list()) + len(other.individual_list()))
+        for f in other.family_list():
+            self.assertEqual(len(m.get_record(mapping.get(f.xref(), f.xref())).children()), len(f.children()))
+
+    def test_character_set(self):
+        """CHAR line of the header follows the encoding, and the merged file reads back"""
+        ours = u"0 HEAD\n1 SOUR Test\n0 @I1@ INDI\n1 NAME Jos\xe9 /M\xfcller/\n0 TRLR\n".encode('utf-8')
+        theirs = u"0 HEAD\n1 CHAR UTF-8\n0 @I1@ INDI\n1 NAME Ren\xe9e /G\xe4rtner/\n0 TRLR\n".encode('utf-8')
+        for (encoding, char) in [('latin-1', 'LATIN1'), ('ansel', 'ANSEL')]:
+            out = io.BytesIO()
+            mapping = merge(io.BytesIO(ours), io.BytesIO(theirs), out, encoding = encoding)
+            out.seek(0)
+            m = Gedcom(out)
+            self.assertEqual([e.value() for e in m.line_list() if e.tag() == 'CHAR'], [char])
+            self.assertEqual(m.get_individual('@I1@').name(), (u'Jos\xe9', u'M\xfcller'))
+            self.assertEqual(m.get_individual(mapping['@I1@']).name(), (u'Ren\xe9e', u'G\xe4rtner'))
+
+        self.assertRaises(ValueError, merge, io.BytesIO(ours), io.BytesIO(theirs), io.BytesIO(), encoding = 'koi8-r')
+
+if __name__ == '__main__':
+    unittest.main()
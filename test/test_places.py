@@ -0,0 +1,61 @@
+import unittest
+import os
+from gedcom import *
+from places import PlaceIndex, _events
+
+
+class PlacesTest(unittest.TestCase):
+    """Unit tests for places.py"""
+
+    def setUp(self):
+        self.g = Gedcom(os.path.abspath('test/TGC55CLF.utf-8.ged'))
+
+    def test_hierarchy(self):
+        """Places are split into a tree, with jurisdictions from the FORM"""
+        index = self.g.place_index()
+        self.assertEqual(index.form, ['City', 'County', 'State', 'Country'])
+        usa = index.find('USA')
+        self.assertEqual(usa.jurisdiction, 'Country')
+        utah = usa.child('ut')
+        self.assertEqual(utah.jurisdiction, 'State')
+        city = index.find(' salt lake city,UT,  usa')
+        self.assertEqual(city.name, 'Salt Lake City')
+        self.assertEqual(city.path(), [usa, utah, city])
+        self.assertEqual(city.full_name(), 'Salt Lake City, UT, USA')
+        self.assertEqual(index.find('Salt Lake City'), None)
+        self.assertEqual(index.named('salt lake city'), [city])
+
+        # a FORM under PLAC takes precedence over the header
+        self.assertEqual(index.find('New York, New York, USA').jurisdiction, 'city')
+
+    def test_events(self):
+        """Events are found by their place and by places above it"""
+        index = self.g.place_index()
+        usa = index.find('USA')
+        expected = [(r, e) for r in self.g.individual_list() + self.g.family_list()
+                    for e in _events(r)
+                    if e.place and e.place.split(',')[-1].strip() == 'USA']
+        self.assertEqual(sorted(map(id, (e for (r, e) in usa.events()))), sorted(map(id, (e for (r, e) in expected))))
+        self.assertEqual(usa.events(subplaces=False), [])
+        self.assertEqual(usa.count(), len(expected))
+        city = index.find('Salt Lake City, UT, USA')
+        self.assertEqual([r.xref() for r in city.records()], ['@PERSON1@'])
+        self.assertEqual(index.events_in('Nowhere'), [])
+
+        # the index is built again once records change
+        self.assertTrue(self.g.place_index() is index)
+        record = self.g.get_record('@PERSON1@')
+        record.add_child(Line(1, '', 'NOTE', 'changed', self.g.record_dict()))
+        self.assertFalse(self.g.place_index() is index)
+
+    def test_empty_parts(self):
+        """Empty parts keep positions of the others"""
+        g = Gedcom(os.path.abspath('test/wright.ged'))
+        index = PlaceIndex(g.individual_list(), 'Town, , Province, Country')
+        canada = index.find('Canada')
+        self.assertEqual(canada.jurisdiction, 'Country')
+        self.assertEqual(canada.child('Ontario').jurisdiction, 'Province')
+        self.assertEqual(len(index.events_in('Ontario, Canada')), canada.child('Ontario').count())
+
+if __name__ == '__main__':
+    unittest.main()
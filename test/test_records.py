@@ -1,5 +1,6 @@
 import unittest
 import os
+import io
 from gedcom import *
 
 
@@ -32,7 +33,7 @@ class McIntyreTest(unittest.TestCase):
         self.assertEqual(mary.father().xref(), '@P405368888@')
         self.assertEqual(mary.mother().xref(), '@P405538002@')
         self.assertEqual(map(lambda x: x.xref(), mary.families()), ['@F4@'])
-        self.assertEqual(mary.father().children(), [mary])
+        self.assertEqual(mary.father().children(), (mary,))
 
     def test_family(self):
         """Testing class Family"""
@@ -87,6 +88,71 @@ class McIntyreTest(unittest.TestCase):
         
         self.assertEqual(map(lambda (x, y): (x.xref(), y), barbara.path_to_relative(chris)), [('@P407946950@', 'start'), ('@P405342543@', 'sibling'), ('@P405313470@', 'child'), ('@P405749335@', 'child')])
 
+    def test_iter_relatives(self):
+        """Testing lazy ancestor/descendant generators"""
+        mary = self.g.get_individual('@P405366386@')
+        chris = self.g.get_individual('@P405749335@')
+
+        ancestors = list(chris.iter_ancestors())
+        self.assertTrue((mary, 3) in ancestors)
+        self.assertEqual(len(ancestors), len(set(a for (a, g) in ancestors)))
+        self.assertEqual([g for (a, g) in ancestors], sorted(g for (a, g) in ancestors))
+        self.assertEqual(sorted(a for (a, g) in chris.iter_ancestors(1)), sorted(p for p in chris.parents() if p is not None))
+        self.assertFalse(mary in [a for (a, g) in chris.iter_ancestors(2)])
+
+        descendants = list(mary.iter_descendants())
+        self.assertTrue((chris, 3) in descendants)
+        self.assertEqual([d for (d, g) in mary.iter_descendants(1)], list(mary.children()))
+
+        for (a, g) in chris.iter_ancestors():
+            self.assertEqual(g, 1)
+            break
+
+    def test_link_cache(self):
+        """Cached relatives are immutable and follow changes of the tree"""
+        mary = self.g.get_individual('@P405366386@')
+        father = mary.father()
+
+        self.assertTrue(father.children() is father.children())
+        self.assertTrue(isinstance(mary.parents(), tuple))
+
+        ernest = self.g.get_individual('@P405362004@')
+        family = father.families()[0]
+        family.add_child(Line(1, '', 'CHIL', ernest.xref(), self.g.record_dict()))
+        self.assertEqual(father.children(), (mary, ernest))
+        self.assertTrue(ernest in family.children())
+
+    def test_link_cache_per_tree(self):
+        """Changes of one tree leave caches of other trees alone"""
+        other = Gedcom(os.path.abspath('test/mcintyre.ged'))
+        timeline = self.g.timeline()
+        epoch = self.g.record_dict().epoch
+        other.individual_list()[0].add_child(Line(1, '', 'NOTE', 'changed', other.record_dict()))
+        self.assertEqual(self.g.record_dict().epoch, epoch)
+        self.assertTrue(self.g.timeline() is timeline)
+        self.assertEqual(other.record_dict().epoch, epoch + 1)
+
+    def test_content_hash(self):
+        """Content hash ignores order of sub-lines, xref and splitting of values"""
+        def record(text):
+            return Gedcom(io.BytesIO(text)).get_record('@I1@')
+
+        a = record("0 @I1@ INDI\n1 NAME A /B/\n1 SEX M\n1 BIRT\n2 DATE 1900\n2 PLAC Here\n1 NOTE long\n2 CONC  note\n")
+        self.assertEqual(len(a.content_hash()), 40)
+        self.assertEqual(a.content_hash(), record("0 @I1@ INDI\n1 SEX M\n1 NAME A /B/\n1 BIRT\n2 PLAC Here\n"
+                                                  "2 DATE 1900\n1 NOTE lo\n2 CONC ng note\n").content_hash())
+        self.assertNotEqual(a.content_hash(), record("0 @I1@ INDI\n1 NAME A /B/\n1 SEX M\n1 BIRT\n2 DATE 1901\n"
+                                                     "2 PLAC Here\n1 NOTE long\n2 CONC  note\n").content_hash())
+        self.assertNotEqual(a.content_hash(), record("0 @I1@ INDI\n1 NAME A /B/\n1 SEX M\n1 BIRT\n2 DATE 1900\n"
+                                                     "2 PLAC Here\n1 NOTE long\n2 CONT  note\n").content_hash())
+
+        # order of names matters, and changes are followed
+        names = record("0 @I1@ INDI\n1 NAME A /B/\n1 NAME C /D/\n")
+        self.assertNotEqual(names.content_hash(), record("0 @I1@ INDI\n1 NAME C /D/\n1 NAME A /B/\n").content_hash())
+        before = names.content_hash()
+        names.children_lines()[0].add_child(Line(2, '', 'GIVN', 'A', {}))
+        self.assertNotEqual(names.content_hash(), before)
+
     def test_spaces(self):
         """Testing indenting spaces"""
         ernest = self.g.get_individual('@P405362004@')
@@ -131,5 +197,53 @@ class WrightTest(unittest.TestCase):
         self.assertEqual(family.marriage().dateplace(), ('1 SEP 1973', 'Troronto, Ontario, Canada')) #sic :-)
         
 
+class BacklinkTest(unittest.TestCase):
+    """Unit tests for pointers to records, using TGC55CLF.utf-8.ged."""
+
+    def setUp(self):
+        self.g = Gedcom(os.path.abspath('test/TGC55CLF.utf-8.ged'))
+
+    def test_referring(self):
+        """Lines and records which point to a record are found"""
+        family = self.g.get_family('@F5@')
+        self.assertEqual([e.tag() for e in family.referring_lines()], ['FAMC', 'FAMC', 'FAMC', 'FAMS', 'FAMS'])
+        self.assertEqual([r.xref() for r in family.referring_records(['FAMS'])], ['@I9@', '@I15@'])
+        self.assertEqual([r.xref() for r in self.g.get_record('@N36@').referring_records()], ['@F5@'])
+        self.assertEqual([r.xref() for r in self.g.get_record('@R1@').sources()], ['@SOURCE1@'])
+        self.assertEqual(len(self.g.get_record('@SR2@').citing_lines()), 2)
+
+        # every pointer is in the index once
+        lines = [e for e in self.g.line_list() if e.ref() is not None]
+        indexed = [e for r in self.g.record_dict().records for e in r.referring_lines()]
+        self.assertEqual(sorted(map(id, lines)), sorted(map(id, indexed)))
+
+    def test_citations(self):
+        """Citations of a source below events are found"""
+        source = self.g.get_record('@SOURCE1@')
+        self.assertEqual([r.xref() for r in source.citing_records()], ['@PERSON1@', '@FAMILY1@', '@N2@', '@N6@'])
+        lines = source.citing_lines()
+        self.assertTrue(all(e.tag() == 'SOUR' for e in lines))
+        self.assertTrue('BIRT' in [e.parent_line().tag() for e in lines])
+
+    def test_added(self):
+        """Pointers in lines added to records are indexed"""
+        g = Gedcom(io.BytesIO("0 @I1@ INDI\n1 BIRT\n2 DATE 1900\n0 @I2@ INDI\n1 SOUR @S1@\n"
+                              "0 @S1@ SOUR\n1 TITL Title\n0 TRLR\n"))
+        source = g.get_record('@S1@')
+        birth = g.get_record('@I1@').children_tags('BIRT')[0]
+        citation = Line(2, '', 'SOUR', '@S1@', g.record_dict())
+        citation.add_parent_line(birth)
+        birth.add_child(citation)
+        self.assertEqual(citation.ref(), source.id())
+        self.assertEqual([r.xref() for r in source.citing_records()], ['@I1@', '@I2@'])
+        self.assertTrue(citation in source.citing_lines())
+
+        note = Line(1, '', 'NOTE', '@I1@', g.record_dict())
+        note.add_child(Line(2, '', 'SOUR', '@S1@', g.record_dict()))
+        g.get_record('@I2@').add_child(note)
+        self.assertEqual([r.xref() for r in g.get_record('@I1@').referring_records()], ['@I2@'])
+        self.assertEqual(len(source.citing_lines()), 3)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,13 +1,22 @@
 import unittest
 import os
+import io
+import tempfile
 from gedcom import *
+from matches import *
+
+# Test files shared by all tests
+MCINTYRE = os.path.abspath('test/mcintyre.ged')
+WRIGHT = os.path.abspath('test/wright.ged')
+TGC55CLF = os.path.abspath('test/TGC55CLF.ged')
+TGC55CLF_UTF8 = os.path.abspath('test/TGC55CLF.utf-8.ged')
 
 
 class McIntyreTest(unittest.TestCase):
     """Unit tests for simplepyged using mcintyre.ged."""
 
     def setUp(self):
-        self.g = Gedcom(os.path.abspath('test/mcintyre.ged'))
+        self.g = Gedcom(MCINTYRE)
 
     def test_parser(self):
         """Check if parser collected all records"""
@@ -29,6 +38,436 @@ class McIntyreTest(unittest.TestCase):
             if e.xref() == "@I99@":
                 print e.name()
 
+    def test_record_ids(self):
+        """Records are numbered and pointers are resolved to those numbers"""
+        records = [e for e in self.g.line_list() if e.level() == 0]
+        for (n, record) in enumerate(records):
+            self.assertEqual(record.id(), n)
+            self.assertTrue(self.g.get_record(n) is record)
+        self.assertRaises(KeyError, self.g.get_record, -1)
+        self.assertRaises(KeyError, self.g.get_record, len(records))
+
+        for e in self.g.line_list():
+            if e.tag() in ['FAMS', 'FAMC', 'HUSB', 'WIFE', 'CHIL']:
+                self.assertTrue(self.g.get_record(e.ref()) is self.g.get_record(e.value()))
+            if e.tag() in ['NAME', 'DATE']:
+                self.assertEqual(e.ref(), None)
+
+        self.assertEqual(self.g.dangling_pointers(), [])
+
+
+class DanglingTest(unittest.TestCase):
+    """Unit tests for pointers to records which do not exist."""
+
+    def setUp(self):
+        self.g = Gedcom(io.BytesIO("0 @I1@ INDI\n1 FAMS @F1@\n1 FAMC @F9@\n0 @F1@ FAM\n1 HUSB @I1@\n1 NOTE @N1@\n0 TRLR\n"))
+
+    def test_dangling(self):
+        """Dangling pointers are reported"""
+        self.assertEqual([e.value() for e in self.g.dangling_pointers()], ['@F9@', '@N1@'])
+        self.assertEqual(self.g.get_individual('@I1@').parent_families(), [])
+
+    def test_trailing_spaces(self):
+        """Trailing spaces are dropped from values, except in CONC lines"""
+        g = Gedcom(io.BytesIO("0 @I1@ INDI \n1 NAME A /B/ \n1 FAMS @F1@ \n1 BIRT\n2 DATE 1 JAN 1900 \n"
+                              "1 NOTE a \n2 CONC b \n0 @F1@ FAM\n1 HUSB @I1@ \n0 TRLR\n"))
+        i = g.get_individual('@I1@')
+        self.assertEqual(g.dangling_pointers(), [])
+        self.assertEqual([f.xref() for f in i.families()], ['@F1@'])
+        self.assertEqual(g.get_family('@F1@').husband(), i)
+        self.assertEqual(i.birth_year(), 1900)
+        self.assertEqual(i.children_tags('NOTE')[0].full_value(), u'a b ')
+
+
+class WriterTest(unittest.TestCase):
+    """Unit tests for writing of GEDCOM files."""
+
+    def test_round_trip(self):
+        """Parsing and writing wright.ged gives the same bytes, but for trailing spaces outside of CONC text"""
+        path = WRIGHT
+        g = Gedcom(path)
+
+        lines = open(path, 'rb').read().split('\r\n')
+        conc = [len(l.split()) > 1 and l.split()[1] == 'CONC' for l in lines] + [False]
+        expected = [l if conc[n] or conc[n + 1] else l.rstrip() for (n, l) in enumerate(lines)]
+
+        out = io.BytesIO()
+        g.write(out, newline='\r\n')
+        self.assertEqual(out.getvalue(), '\r\n'.join(expected))
+
+        (fd, copy) = tempfile.mkstemp(suffix='.ged')
+        os.close(fd)
+        try:
+            g.write(copy, newline='\r\n')
+            self.assertEqual(open(copy, 'rb').read(), out.getvalue())
+        finally:
+            os.remove(copy)
+
+    def test_character_set(self):
+        """CHAR line of the header follows the output encoding, so written files can be read back"""
+        path = TGC55CLF
+        g = Gedcom(path)
+        names = [i.name() for i in g.individual_list()]
+
+        for (encoding, char) in [('utf-8', u'UTF-8'), ('utf-16', u'UNICODE')]:
+            out = io.BytesIO()
+            g.write(out, encoding=encoding)
+            out.seek(0)
+            copy = Gedcom(out)
+            self.assertEqual([e.value() for e in copy.line_list() if e.tag() == 'CHAR'], [char])
+            self.assertEqual([i.name() for i in copy.individual_list()], names)
+
+        out = io.BytesIO()
+        g.extract('@I9@', out, ancestors=0, descendants=0)
+        out.seek(0)
+        self.assertEqual(Gedcom(out).get_record('@I9@').name(), g.get_record('@I9@').name())
+
+        self.assertRaises(ValueError, g.write, io.BytesIO(), encoding='koi8-r')
+
+    def test_long_values(self):
+        """Long values and line breaks are written as CONC and CONT lines"""
+        note = Line(1, '', 'NOTE', u'word ' * 100 + u'\nsecond line\n', {})
+        out = io.StringIO()
+        note.write_to(out)
+        lines = out.getvalue().split(u'\n')[:-1]
+
+        self.assertTrue(len(lines) > 2)
+        self.assertTrue(all(len(l) < 255 for l in lines))
+        self.assertTrue(all(l.startswith(u'2 CONC ') for l in lines[1:-2]))
+        self.assertEqual(lines[-2:], [u'2 CONT second line', u'2 CONT'])
+
+        value = lines[0][len(u'1 NOTE '):] + u''.join(l[len(u'2 CONC '):] for l in lines[1:-2])
+        self.assertEqual(value, u'word ' * 100)
+        self.assertEqual(note.gedcom(), u'\n'.join(lines))
+
+
+class DropTest(unittest.TestCase):
+    """Unit tests for Gedcom(keep_line_list=False, keep_parent_links=False)"""
+
+    def setUp(self):
+        self.g = Gedcom(MCINTYRE)
+        self.lean = Gedcom(MCINTYRE, keep_line_list=False, keep_parent_links=False)
+
+    def test_line_list(self):
+        """Line list is collected from the tree when it is not kept"""
+        self.assertEqual(self.lean._line_list, None)
+        self.assertEqual([(e.level(), e.tag(), e.value()) for e in self.lean.line_list()],
+                         [(e.level(), e.tag(), e.value()) for e in self.g.line_list()])
+
+    def test_parent_links(self):
+        """Lines without parent links still work as before"""
+        self.assertTrue(all(e.parent_line() is None for e in self.lean.line_list()))
+        for (a, b) in zip(self.g.individual_list(), self.lean.individual_list()):
+            self.assertEqual([p and p.xref() for p in a.parents()], [p and p.xref() for p in b.parents()])
+            self.assertEqual([c.xref() for c in a.children()], [c.xref() for c in b.children()])
+
+        out = io.BytesIO()
+        self.lean.write(out)
+        reference = io.BytesIO()
+        self.g.write(reference)
+        self.assertEqual(out.getvalue(), reference.getvalue())
+
+    def test_memory(self):
+        """Dropped structures take no memory"""
+        self.assertTrue(self.lean.memory_report().total < self.g.memory_report().total * 0.9)
+        self.assertTrue(self.lean.freeze().frozen())
+
+
+class SelectTest(unittest.TestCase):
+    """Unit tests for Gedcom(record_types=..., tags=..., keep_skipped=...)"""
+
+    def setUp(self):
+        self.g = Gedcom(TGC55CLF_UTF8)
+
+    def test_record_types(self):
+        """Only records of given types are parsed"""
+        g = Gedcom(TGC55CLF_UTF8, record_types=['INDI', 'FAM'])
+        self.assertEqual(set(e.tag() for e in g.line_list() if e.level() == 0), set(['INDI', 'FAM']))
+        self.assertEqual([i.xref() for i in g.individual_list()], [i.xref() for i in self.g.individual_list()])
+        self.assertEqual([f.xref() for f in g.family_list()], [f.xref() for f in self.g.family_list()])
+        for (a, b) in zip(g.individual_list(), self.g.individual_list()):
+            self.assertEqual(a.name(), b.name())
+            self.assertEqual([p and p.xref() for p in a.parents()], [p and p.xref() for p in b.parents()])
+
+    def test_tags(self):
+        """Lines with other tags are skipped with their sub-lines"""
+        g = Gedcom(TGC55CLF_UTF8, tags=['NAME', 'FAMC', 'FAMS', 'HUSB', 'WIFE', 'CHIL'])
+        tags = set(e.tag() for e in g.line_list() if e.level() > 0)
+        self.assertEqual(tags - set(['CONC', 'CONT']), set(['NAME', 'FAMC', 'FAMS', 'HUSB', 'WIFE', 'CHIL']))
+        for (a, b) in zip(g.individual_list(), self.g.individual_list()):
+            self.assertEqual(a.name(), b.name())
+            self.assertEqual([c.xref() for c in a.children()], [c.xref() for c in b.children()])
+
+    def test_keep_skipped(self):
+        """Skipped records and lines are kept as text and written unchanged"""
+        reference = io.BytesIO()
+        self.g.write(reference)
+        for options in ({'record_types': ['INDI', 'FAM']}, {'tags': ['NAME', 'SEX']},
+                        {'record_types': ['INDI'], 'tags': ['NAME', 'FAMS']}):
+            g = Gedcom(TGC55CLF_UTF8, keep_skipped=True, **options)
+            out = io.BytesIO()
+            g.write(out)
+            # skipped lines keep trailing spaces, which parsed lines lose
+            self.assertEqual([l.rstrip() for l in out.getvalue().split('\n')],
+                             [l.rstrip() for l in reference.getvalue().split('\n')])
+
+        g = Gedcom(TGC55CLF_UTF8, record_types=['INDI', 'FAM'], keep_skipped=True)
+        notes = [e for e in g.line_list() if e.tag() == 'NOTE' and e.level() == 0]
+        self.assertEqual(len(notes), 35)
+        self.assertTrue(all(isinstance(n, RawRecord) and n.children_lines() == [] for n in notes))
+        # pointers to skipped records are resolved
+        pointers = [e for e in g.line_list() if e.ref() is not None]
+        self.assertTrue(any(isinstance(g.get_record(e.ref()), RawRecord) for e in pointers))
+        for e in pointers:
+            self.assertEqual(g.get_record(e.ref()).xref(), e.value())
+        self.assertTrue(set(e.value() for e in g.dangling_pointers()) <=
+                        set(e.value() for e in self.g.dangling_pointers()))
+        self.assertEqual(len(g.individual_list()), len(self.g.individual_list()))
+
+
+class UpdateTest(unittest.TestCase):
+    """Unit tests for Gedcom.update_from()"""
+
+    def setUp(self):
+        self.source = open(WRIGHT, 'rb').read()
+
+    def _edited(self):
+        """Return wright.ged with one record changed, one removed and one added"""
+        records = self.source.split('\r\n0 ')
+        self.assertTrue(records[5].startswith('@I8@ INDI'))
+        records[5] = records[5].replace('NAME Olive', 'NAME Olivia', 1)
+        self.assertTrue(records[10].startswith('@I21@ INDI'))
+        del records[10]
+        records.insert(-1, '@I999@ INDI\r\n1 NAME Newly /Added/\r\n1 FAMC @F1@')
+        return '\r\n0 '.join(records)
+
+    def _summary(self, g):
+        return [(i.xref(), i.name(), [p and p.xref() for p in i.parents()],
+                 [c.xref() for c in i.children()]) for i in g.individual_list()]
+
+    def test_unchanged(self):
+        """Nothing is parsed again if the file did not change"""
+        g = Gedcom(WRIGHT)
+        people = list(g.individual_list())
+        self.assertEqual(g.update_from(WRIGHT), ([], [], []))
+        self.assertTrue(all(a is b for (a, b) in zip(people, g.individual_list())))
+
+    def test_update(self):
+        """Changed, added and removed records are brought up to date"""
+        g = Gedcom(WRIGHT)
+        before = dict((i.xref(), i) for i in g.individual_list())
+        edited = self._edited()
+
+        (added, changed, removed) = g.update_from(io.BytesIO(edited))
+        self.assertEqual([r.xref() for r in added], ['@I999@'])
+        self.assertEqual([r.xref() for r in changed], ['@I8@'])
+        self.assertEqual([r.xref() for r in removed], ['@I21@'])
+        self.assertEqual(changed[0].id(), before['@I8@'].id())
+        self.assertRaises(KeyError, g.get_record, removed[0].id())
+
+        fresh = Gedcom(io.BytesIO(edited))
+        self.assertEqual(self._summary(g), self._summary(fresh))
+        self.assertEqual([(e.level(), e.tag(), e.value()) for e in g.line_list()],
+                         [(e.level(), e.tag(), e.value()) for e in fresh.line_list()])
+        self.assertEqual([e.value() for e in g.dangling_pointers()],
+                         [e.value() for e in fresh.dangling_pointers()])
+        self.assertEqual(g.get_individual('@I999@').parent_families(), [g.get_family('@F1@')])
+        self.assertEqual([(r.xref(), e.tag()) for (r, e) in g.record_dict().referrers(g.get_family('@F1@'))],
+                         [(r.xref(), e.tag()) for (r, e) in fresh.record_dict().referrers(fresh.get_family('@F1@'))])
+
+        untouched = [i for i in g.individual_list() if i.xref() not in ('@I8@', '@I999@')]
+        self.assertTrue(all(i is before[i.xref()] for i in untouched))
+
+        # the same file again changes nothing
+        self.assertEqual(g.update_from(io.BytesIO(edited)), ([], [], []))
+
+        # back to the original file, without a list of lines
+        lean = Gedcom(io.BytesIO(edited), keep_line_list=False)
+        lean.update_from(WRIGHT)
+        self.assertEqual(self._summary(lean), self._summary(Gedcom(WRIGHT)))
+
+    def test_invalid(self):
+        """An invalid record leaves the tree as it was"""
+        g = Gedcom(WRIGHT)
+        reference = io.BytesIO()
+        g.write(reference)
+        invalid = self._edited().replace('NAME Olivia', 'NAME\r\nOlivia', 1)
+
+        self.assertRaises(GedcomParseError, g.update_from, io.BytesIO(invalid))
+        out = io.BytesIO()
+        g.write(out)
+        self.assertEqual(out.getvalue(), reference.getvalue())
+        self.assertEqual(g.get_record('@I8@').id(), 5)
+        self.assertRaises(KeyError, g.get_record, '@I999@')
+
+
+class ExtractTest(unittest.TestCase):
+    """Unit tests for Gedcom.closure() and Gedcom.extract()"""
+
+    def setUp(self):
+        self.g = Gedcom(TGC55CLF_UTF8)
+
+    def test_closure(self):
+        """Relatives, their families and records they point to are included"""
+        records = self.g.closure('@I12@', ancestors=1, descendants=0, spouses=False)
+        self.assertEqual([r.xref() or r.tag() for r in records],
+                         ['HEAD', '@SUBMISSION@', '@SUBMITTER@', '@I12@', '@I9@', '@I15@', '@F5@',
+                          '@N1@', '@N18@', '@N23@', '@N36@', '@M1@'])
+        self.assertEqual([r.id() for r in records], sorted(r.id() for r in records))
+
+    def test_extract(self):
+        """Extracted file has no dangling pointers"""
+        out = io.BytesIO()
+        count = self.g.extract(self.g.get_record('@I9@'), out, ancestors=0, descendants=1)
+        out.seek(0)
+        g = Gedcom(out)
+        self.assertEqual(count, len([e for e in g.line_list() if e.level() == 0]))
+        self.assertEqual(g.dangling_pointers(), [])
+        children = set(c.xref() for c in self.g.get_record('@F5@').children())
+        self.assertEqual(children, set(c.xref() for c in g.get_record('@F5@').children()))
+        self.assertEqual(set(i.xref() for i in g.individual_list()), children | set(['@I9@', '@I15@']))
+
+
+class ProfileTest(unittest.TestCase):
+    """Unit tests for Gedcom(profile=...)"""
+
+    def test_load_stats(self):
+        """Loading can be profiled, and the statistics passed to a hook"""
+        path = MCINTYRE
+        self.assertEqual(Gedcom(path).load_stats(), None)
+
+        received = []
+        g = Gedcom(path, profile=received.append)
+        stats = g.load_stats()
+        self.assertEqual(received, [stats])
+
+        self.assertEqual(stats.lines, len(g.line_list()))
+        self.assertEqual(stats.bytes, os.path.getsize(path))
+        self.assertEqual(stats.records['Individual'], len(g.individual_list()))
+        self.assertEqual(stats.records['Family'], len(g.family_list()))
+        self.assertTrue(all(p.seconds >= 0 for p in stats.phases.values()))
+        self.assertTrue(sum(p.seconds for p in stats.phases.values()) <= stats.seconds)
+        self.assertTrue(stats.phases['build'].containers >= len(g.line_list()))
+        self.assertEqual(stats.phases['tokenize'].containers, None)
+
+        self.assertEqual(stats.as_dict()['phases']['init']['seconds'], stats.phases['init'].seconds)
+        self.assertTrue('tokenize' in stats.report())
+
+
+class MemoryTest(unittest.TestCase):
+    """Unit tests for Gedcom.memory_report()"""
+
+    def test_memory_report(self):
+        """Memory is broken down by category, record type and tag"""
+        g = Gedcom(MCINTYRE)
+        report = g.memory_report()
+
+        self.assertEqual(report.lines, len(g.line_list()))
+        self.assertEqual(sum(report.categories.values()), report.total)
+        self.assertEqual(sum(sum(c.values()) for c in report.types.values()),
+                         report.total - report.categories['record_dict'] - report.categories['line_list'])
+        self.assertTrue(report.types['Individual']['lines'] > report.types['Family']['lines'])
+        self.assertTrue(report.categories['events'] > 0)
+        self.assertTrue(report.tags['NAME'] > 0)
+        self.assertTrue('Individual' in str(report))
+
+    def test_line_list_kept(self):
+        """Lines are counted by walking the records, whether the line list is kept or not"""
+        kept = Gedcom(MCINTYRE)
+        walked = Gedcom(MCINTYRE, keep_line_list=False)
+        self.assertTrue(kept.keeps_line_list())
+        self.assertFalse(walked.keeps_line_list())
+        self.assertEqual([r.xref() for r in walked.records()], [r.xref() for r in kept.records()])
+        self.assertEqual(walked.memory_report().lines, kept.memory_report().lines)
+        self.assertTrue(walked.memory_report().categories['line_list'] < kept.memory_report().categories['line_list'])
+
+    def test_shared_strings(self):
+        """Strings shared by a frozen tree are counted once"""
+        before = Gedcom(MCINTYRE).memory_report()
+        after = Gedcom(MCINTYRE).freeze().memory_report()
+        self.assertTrue(after.categories['strings'] < before.categories['strings'])
+        self.assertTrue(after.categories['children'] < before.categories['children'])
+
+
+def _query(g):
+    """ Run queries which touch every individual of g """
+    for i in g.individual_list():
+        i.parents()
+        i.children()
+        list(i.iter_ancestors())
+    MatchList(g.individual_list()).criteria_match("birthrange=1800-1900")
+
+
+class FrozenTest(unittest.TestCase):
+    """Unit tests for Gedcom.freeze()"""
+
+    def test_read_only(self):
+        """Queries of a frozen tree do not write into it"""
+        g = Gedcom(MCINTYRE).freeze()
+        self.assertTrue(g.frozen())
+
+        state = [(e, dict(vars(e))) for e in g.line_list()]
+
+        # changes of other trees must not invalidate frozen caches
+        other = Gedcom(MCINTYRE)
+        other.individual_list()[0].add_child(Line(1, '', 'NOTE', 'changed', other.record_dict()))
+
+        _query(g)
+        for i in g.individual_list():
+            try:
+                i.marriage_years()
+            except ValueError:
+                pass
+            i.common_ancestor(g.individual_list()[0])
+        for r in g.record_dict().values():
+            r.content_hash()
+
+        for (e, attributes) in state:
+            self.assertEqual(sorted(vars(e)), sorted(attributes))
+            self.assertTrue(all(vars(e)[k] is v for (k, v) in attributes.items()))
+
+        mary = g.get_individual('@P405366386@')
+        self.assertRaises(TypeError, mary.add_child, Line(1, '', 'NOTE', '', g.record_dict()))
+        self.assertEqual(mary.father().name(), ('Thomas Clyde', 'Hern'))
+
+    def test_guarantees(self):
+        """Lines and lists of a frozen tree are tuples, and equal strings are shared"""
+        g = Gedcom(MCINTYRE)
+        self.assertTrue(g.freeze() is g)
+        self.assertTrue(g.freeze() is g)
+
+        self.assertTrue(all(isinstance(e.children_lines(), tuple) for e in g.line_list()))
+        for items in (g.line_list(), g.individual_list(), g.family_list(), g.dangling_pointers()):
+            self.assertTrue(isinstance(items, tuple))
+        self.assertTrue(all(isinstance(refs, tuple) for refs in g.record_dict().backlinks.values()))
+        for i in g.individual_list():
+            self.assertTrue(isinstance(i.parent_families(), tuple))
+            self.assertTrue(isinstance(i.families(), tuple))
+        for f in g.family_list():
+            self.assertTrue(isinstance(f.children(), tuple))
+
+        names = [e.tag() for e in g.line_list() if e.tag() == 'NAME']
+        self.assertTrue(all(t is names[0] for t in names))
+        pointers = [e.value() for e in g.line_list() if e.tag() == 'FAMS' and e.value() == '@F4@']
+        self.assertTrue(len(pointers) > 1)
+        self.assertTrue(all(v is pointers[0] for v in pointers))
+
+    def test_changes(self):
+        """Lines can not be added to a frozen tree, lookups keep working"""
+        g = Gedcom(MCINTYRE).freeze()
+        mary = g.get_individual('@P405366386@')
+        self.assertRaises(TypeError, mary.add_child, Line(1, '', 'NOTE', '', g.record_dict()))
+        self.assertRaises(TypeError, mary.children_lines()[0].add_child, Line(2, '', 'NOTE', '', g.record_dict()))
+        self.assertRaises(TypeError, g.update_from, MCINTYRE)
+
+        self.assertTrue(g.get_record(mary.xref()) is mary)
+        self.assertTrue(g.get_record(mary.id()) is mary)
+        self.assertEqual(mary.father().name(), ('Thomas Clyde', 'Hern'))
+        self.assertEqual([f.xref() for f in mary.families()], ['@F4@'])
+        self.assertTrue(mary in g.get_family('@F5@').children())
+        self.assertEqual(len(MatchList(g.individual_list()).criteria_match("surname=McIntyre")),
+                         len(MatchList(Gedcom(MCINTYRE).individual_list()).criteria_match("surname=McIntyre")))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+import os
+from gedcom import *
+from stats import *
+
+
+class StatsTest(unittest.TestCase):
+    """Unit tests for stats.py using wright.ged"""
+
+    def setUp(self):
+        self.g = Gedcom(os.path.abspath('test/wright.ged'))
+
+    def test_statistics(self):
+        """Aggregates agree with loops of their own"""
+        individuals = self.g.individual_list()
+        result = self.g.statistics()
+        self.assertEqual(sorted(result), sorted(DEFAULT))
+
+        self.assertEqual(result['sex']['M'], len([i for i in individuals if i.sex() == 'M']))
+        self.assertEqual(result['sex']['M'] + result['sex']['F'] + result['sex'][None], len(individuals))
+        self.assertEqual(result['surnames']['Wright'], len([i for i in individuals if i.surname() == 'Wright']))
+        self.assertEqual(sum(result['births'].values()), len([i for i in individuals if i.birth_year() != -1]))
+        self.assertEqual(result['births'].get(1950), len([i for i in individuals if 1950 <= i.birth_year() < 1960]))
+        self.assertEqual(sum(result['children'].values()), len(self.g.family_list()))
+        self.assertEqual(result['children'][3], len([f for f in self.g.family_list() if len(f.children()) == 3]))
+
+        ages = [i.death_year() - i.birth_year() for i in individuals
+                if i.birth_year() != -1 and i.death_year() >= i.birth_year()]
+        self.assertEqual(result['lifespans']['count'], len(ages))
+        self.assertAlmostEqual(result['lifespans']['mean'], float(sum(ages)) / len(ages))
+
+        missing = result['missing']
+        self.assertEqual(missing['total'], len(individuals))
+        self.assertEqual(missing['counts']['parents'], len([i for i in individuals if not i.parent_families()]))
+        self.assertAlmostEqual(missing['rates']['birth_year'],
+                               float(len([i for i in individuals if i.birth_year() == -1])) / len(individuals))
+
+    def test_options(self):
+        """Aggregates can be chosen and configured"""
+        result = statistics(self.g, ['sex', Births(width = 100)])
+        self.assertEqual(sorted(result), ['births', 'sex'])
+        self.assertEqual(sum(result['births'].values()), sum(self.g.statistics(['births'])['births'].values()))
+        self.assertTrue(all(year % 100 == 0 for year in result['births']))
+
+    def test_merge(self):
+        """Aggregates of parts of a tree merge into aggregates of the whole"""
+        individuals = self.g.individual_list()
+        half = len(individuals) // 2
+        parts = []
+        for chunk in (individuals[:half], individuals[half:]):
+            aggregates = [AGGREGATES[name]() for name in DEFAULT]
+            aggregate(aggregates, chunk)
+            parts.append(aggregates)
+        for (a, b) in zip(*parts):
+            a.merge(b)
+        whole = [AGGREGATES[name]() for name in DEFAULT]
+        aggregate(whole, individuals)
+        self.assertEqual([a.result() for a in parts[0]], [a.result() for a in whole])
+
+        self.assertEqual(self.g.statistics(processes = 2), self.g.statistics())
+
+if __name__ == '__main__':
+    unittest.main()
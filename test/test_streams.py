@@ -0,0 +1,134 @@
+import unittest
+import os
+import io
+import gzip
+import bz2
+import shutil
+import tempfile
+import codecs
+from gedcom import *
+import streams
+
+
+class CompressionTest(unittest.TestCase):
+    """Unit tests for streams.py using mcintyre.ged."""
+
+    def setUp(self):
+        self.path = os.path.abspath('test/mcintyre.ged')
+        self.g = Gedcom(self.path)
+        out = io.BytesIO()
+        self.g.write(out, newline='\r\n')
+        self.raw = out.getvalue()
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def check(self, g):
+        self.assertEqual(len(g.record_dict()), len(self.g.record_dict()))
+        self.assertEqual(len(g.line_list()), len(self.g.line_list()))
+        out = io.BytesIO()
+        g.write(out, newline='\r\n')
+        self.assertTrue(out.getvalue() == self.raw)
+
+    def test_gzip(self):
+        """Reading gzip files written by gzip module and by Gedcom.write()"""
+        path = os.path.join(self.dir, 'mcintyre.ged.gz')
+        f = gzip.open(path, 'wb')
+        f.write(self.raw)
+        f.close()
+        self.check(Gedcom(path))
+        self.check(Gedcom(open(path, 'rb')))
+
+        copy = os.path.join(self.dir, 'copy.ged.gz')
+        self.g.write(copy, newline='\r\n')
+        self.assertEqual(gzip.open(copy, 'rb').read(), self.raw)
+
+    def test_bz2(self):
+        """Reading and writing bzip2 streams"""
+        self.check(Gedcom(io.BytesIO(bz2.compress(self.raw))))
+
+        out = io.BytesIO()
+        self.g.write(out, newline='\r\n', compression='bz2')
+        self.assertEqual(bz2.decompress(out.getvalue()), self.raw)
+
+    @unittest.skipIf(streams.lzma is None, "lzma module is not available")
+    def test_xz(self):
+        """Reading and writing xz files"""
+        path = os.path.join(self.dir, 'mcintyre.ged.xz')
+        self.g.write(path, newline='\r\n')
+        self.assertTrue(open(path, 'rb').read().startswith('\xfd7zXZ'))
+        self.check(Gedcom(path))
+
+    def test_concatenated(self):
+        """Concatenated gzip streams are read one after another"""
+        half = self.raw.index('0 @P405342543@')
+        data = io.BytesIO()
+        for part in [self.raw[:half], self.raw[half:]]:
+            f = gzip.GzipFile(fileobj=data, mode='wb')
+            f.write(part)
+            f.close()
+        self.check(Gedcom(io.BytesIO(data.getvalue())))
+
+    def test_reader(self):
+        """Reading plain data in small chunks"""
+        streams.CHUNK_SIZE = 7
+        try:
+            reader = streams.open_input(io.BytesIO(self.raw))
+            self.assertEqual(''.join(reader), self.raw)
+        finally:
+            streams.CHUNK_SIZE = 64 * 1024
+
+
+class EncodingTest(unittest.TestCase):
+    """Unit tests for detection of character encoding."""
+
+    def test_detect(self):
+        """Byte order mark wins over CHAR line of the header"""
+        self.assertEqual(streams.detect_encoding('0 HEAD\r\n1 CHAR ANSEL\r\n0 TRLR'), ('ansel', 0))
+        self.assertEqual(streams.detect_encoding('0 HEAD\n\t1 CHAR ANSI\n0 TRLR'), ('cp1252', 0))
+        self.assertEqual(streams.detect_encoding('0 HEAD\n0 @N1@ NOTE\n1 CHAR ANSEL'), ('utf-8', 0))
+        self.assertEqual(streams.detect_encoding('\xef\xbb\xbf0 HEAD\n1 CHAR ANSEL'), ('utf-8', 3))
+        self.assertEqual(streams.detect_encoding(u'0 HEAD\n'.encode('utf-16-le')), ('utf-16-le', 0))
+        self.assertEqual(streams.detect_encoding(u'0 HEAD\n'.encode('utf-16')), ('utf-16-le', 2))
+
+    def test_lines(self):
+        """Lines are split on every kind of GEDCOM terminator, also across chunks"""
+        data = u'0 HEAD\r\n1 CHAR UTF-8\n0 @N1@ NOTE \u0161\r0 TRLR\r\n'.encode('utf-8')
+        expected = [u'0 HEAD', u'1 CHAR UTF-8', u'0 @N1@ NOTE \u0161', u'0 TRLR']
+        self.assertEqual(list(streams.decode_lines(streams.open_input(io.BytesIO(data)))), expected)
+
+        streams.CHUNK_SIZE = 1
+        try:
+            self.assertEqual(list(streams.decode_lines(streams.open_input(io.BytesIO(data)))), expected)
+        finally:
+            streams.CHUNK_SIZE = 64 * 1024
+
+    def test_utf16(self):
+        """UTF-16 files with and without byte order mark"""
+        text = open(os.path.abspath('test/mcintyre.ged'), 'rb').read().decode('ascii')
+        for encoding in ['utf-16', 'utf-16-be', 'utf-16-le']:
+            g = Gedcom(io.BytesIO(text.encode(encoding)))
+            self.assertEqual(len(g.individual_list()), 41)
+
+    def test_bom(self):
+        """UTF-8 file with byte order mark"""
+        g = Gedcom(os.path.abspath('test/GedcomWithBOM.ged'))
+        self.assertEqual(g.line_list()[0].tag(), 'HEAD')
+
+    def test_ansel(self):
+        """ANSEL codec"""
+        text = u'M\xfcller \u0141\xf3d\u017a \xa9'
+        data = text.encode('ansel')
+        self.assertEqual(data, 'M\xe8uller \xa1\xe2od\xe2z \xc3')
+        self.assertEqual(data.decode('ansel'), text)
+        self.assertRaises(UnicodeDecodeError, '\x80'.decode, 'ansel')
+        self.assertEqual('a\x80'.decode('ansel', 'replace'), u'a\ufffd')
+
+        decoder = codecs.getincrementaldecoder('ansel')()
+        self.assertEqual(decoder.decode('ab\xe8'), u'ab')
+        self.assertEqual(decoder.decode('u', True), u'\xfc')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import os
+import io
+from gedcom import *
+import synthetic
+
+
+class SyntheticTest(unittest.TestCase):
+    """Unit tests for synthetic.py"""
+
+    def generate(self, **options):
+        out = io.BytesIO()
+        synthetic.write(out, **options)
+        return out.getvalue()
+
+    def test_size(self):
+        """Generated files have requested number of individuals and no broken links"""
+        for size in (1, 10, 1000):
+            g = Gedcom(io.BytesIO(self.generate(individuals = size)))
+            self.assertEqual(len(g.individual_list()), size)
+            self.assertEqual(list(g.dangling_pointers()), [])
+            self.assertEqual(g.find_cycles(), [])
+
+        g = Gedcom(io.BytesIO(self.generate(individuals = 1000, generations = 5)))
+        self.assertTrue(g.family_graph().statistics()['generations'] >= 5)
+
+    def test_deterministic(self):
+        """Same seed gives the same file"""
+        self.assertEqual(self.generate(seed = 1), self.generate(seed = 1))
+        self.assertNotEqual(self.generate(seed = 1), self.generate(seed = 2))
+
+    def test_options(self):
+        """Dates, notes, sources and pedigree collapse follow the options"""
+        data = self.generate(individuals = 500, date_formats = ('about',), notes = 1.0, sources = 0.0)
+        g = Gedcom(io.BytesIO(data))
+        for i in g.individual_list():
+            self.assertTrue(i.birth().date.startswith('ABT '))
+            self.assertEqual(len(i.children_tags('NOTE')), 1)
+            self.assertEqual(i.birth().source, None)
+
+        g = Gedcom(io.BytesIO(self.generate(individuals = 2000, collapse = 0.5)))
+        collapsed = [f for f in g.family_list()
+                     if f.husband().parent_families() and f.wife().parent_families()]
+        self.assertTrue(len(collapsed) > 0)
+
+    def test_line_length(self):
+        """Long notes are broken into CONC lines which GEDCOM allows"""
+        data = self.generate(individuals = 300, notes = 1.0)
+        lines = data.decode('utf-8').split(u'\n')
+        self.assertTrue(max(len(line) for line in lines) < 255)
+        self.assertTrue(any(line.startswith(u'2 CONC ') for line in lines))
+
+        for i in Gedcom(io.BytesIO(data)).individual_list():
+            for paragraph in i.children_tags('NOTE')[0].full_value().split(u'\n'):
+                self.assertTrue(all(word in synthetic.WORDS for word in paragraph.split(u' ')))
+
+    def test_compressed(self):
+        """Files can be compressed while they are written"""
+        data = self.generate(individuals = 100, compression = 'gzip')
+        self.assertTrue(data.startswith('\x1f\x8b'))
+        self.assertEqual(len(Gedcom(io.BytesIO(data)).individual_list()), 100)
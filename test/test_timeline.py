@@ -0,0 +1,59 @@
+import unittest
+import os
+from gedcom import *
+from timeline import Timeline, date_range, date_key
+from places import _events
+
+
+class TimelineTest(unittest.TestCase):
+    """Unit tests for timeline.py using wright.ged"""
+
+    def setUp(self):
+        self.g = Gedcom(os.path.abspath('test/wright.ged'))
+        self.records = self.g.individual_list() + self.g.family_list()
+
+    def test_dates(self):
+        """Dates are turned into sortable keys"""
+        self.assertEqual(date_range('1850'), (18500000, 18501231))
+        self.assertEqual(date_range('mar 1850'), (18500300, 18500331))
+        self.assertEqual(date_range('3 MAR 1850'), (18500303, 18500303))
+        self.assertEqual(date_key('ABT 1850'), 18500000)
+        self.assertEqual(date_key('BET 1850 AND 1855'), 18500000)
+        self.assertEqual(date_key('FROM 3 MAR 1750/51 TO 1760'), 17500303)
+        self.assertEqual(date_key('INT 1850 (a guess)'), 18500000)
+        self.assertEqual(date_key('(unknown)'), None)
+        self.assertEqual(date_key(None), None)
+
+    def test_events(self):
+        """Events of a period come in the order of dates"""
+        timeline = self.g.timeline()
+        dated = [(r, e) for r in self.records for e in _events(r) if date_key(e.date) is not None]
+        self.assertEqual(len(timeline), len(dated))
+        self.assertEqual(len(timeline) + len(timeline.undated()), sum(len(_events(r)) for r in self.records))
+
+        found = list(timeline.events(1950, 1959))
+        self.assertEqual(sorted(id(e) for (k, r, e) in found),
+                         sorted(id(e) for (r, e) in dated if 1950 <= date_key(e.date) // 10000 <= 1959))
+        self.assertEqual([k for (k, r, e) in found], sorted(k for (k, r, e) in found))
+        self.assertTrue(all(e in _events(r) for (k, r, e) in found))
+
+        burials = list(timeline.events(1950, 1999, ['BURI', 'DEAT']))
+        self.assertEqual([k for (k, r, e) in burials], sorted(k for (k, r, e) in burials))
+        self.assertEqual(set(e.tag for (k, r, e) in burials), set(['BURI', 'DEAT']))
+        self.assertEqual(len(burials), timeline.count(1950, 1999, ['BURI', 'DEAT']))
+        self.assertEqual(list(timeline.events(1950, 1999, 'NONE')), [])
+
+        self.assertEqual(len(list(timeline.events('1 JAN 1950', 'DEC 1959'))), len(found))
+        self.assertEqual(timeline.first()[0], min(date_key(e.date) for (r, e) in dated))
+
+    def test_histogram(self):
+        """Events are counted by period"""
+        timeline = Timeline(self.records)
+        histogram = timeline.histogram(1900, 1999, 10, 'BIRT')
+        self.assertEqual([year for (year, count) in histogram], range(1900, 2000, 10))
+        self.assertEqual(sum(count for (year, count) in histogram), timeline.count(1900, 1999, 'BIRT'))
+        self.assertEqual(histogram[5][1], len(list(timeline.events(1950, 1959, 'BIRT'))))
+        self.assertEqual(timeline.count(), len(timeline))
+
+if __name__ == '__main__':
+    unittest.main()